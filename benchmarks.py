@@ -0,0 +1,1403 @@
+#!/usr/bin/env python3
+"""
+benchmarks.py
+
+Micro-benchmarks for the schools.py pipeline, run against synthetic feeds
+shaped like the /backend-api/schools response.
+
+The `suite` benchmark times the main stages end to end on a feed with the
+real API's irregularities (nested region/location objects, alternative
+field names from CANDIDATE_PATHS, list/dict/JSON-string/plain-string
+contacts) and can record the results for comparison between runs.
+
+Usage:
+ python benchmarks.py prepare_rows --size 50000
+ python benchmarks.py suite --sizes 4000 100000 --json bench_results.json
+ python benchmarks.py suite --sizes 4000 100000 --compare bench_results.json
+"""
+
+from typing import Any, Callable, Dict, Iterator, List, Sequence, Tuple
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import itertools
+import json
+import os
+import pickle
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+
+import schools
+
+REGIONS = ["Nəsimi", "Nizami", "Xaçmaz", "Quba", "Cəlilabad", "Ağdam", "Lerik", "Sabunçu"]
+SCHOOL_TYPES = ["Məktəb", "Lisey", "Gimnaziya", "Məktəb-Lisey", "Xüsusi sinif", "Filial"]
+SCHOOL_KINDS = ["Tam orta", "Ümumi orta", "İbtidai"]
+SUBJECTIONS = ["Bakı Şəhəri üzrə Təhsil İdarəsi", "Quba Regional Təhsil İdarəsi", "Şəki Regional Təhsil İdarəsi"]
+
+# Feed variety for feed_record (fractions of records)
+NESTED_SHARE = 0.25   # region / location / image as nested objects
+RENAMED_SHARE = 0.25  # flat keys renamed to another CANDIDATE_PATHS spelling
+CONTACT_SHAPES = (("list", 0.7), ("dict", 0.1), ("json", 0.1), ("plain", 0.1))
+# Flat alternative spellings only; dotted paths are produced by the nested variant
+RENAMABLE = {
+    field: [p for p in paths if "." not in p and p != field]
+    for field, paths in schools.CANDIDATE_PATHS.items()
+    if field not in schools.CONTACT_COLUMNS
+}
+
+SUITE_REPEAT_LIMIT = 100_000          # above this each stage runs once instead of best-of-3
+SUITE_MATERIALIZE_LIMIT = 1_000_000   # above this the suite streams the feed (chunked export)
+SUITE_XLSX_LIMIT = 200_000            # XLSX timing is skipped above this
+REGRESSION_THRESHOLD = 1.10
+RESULTS: List[Dict[str, Any]] = []
+
+
+def synthetic_record(i: int, rng: random.Random) -> Dict[str, Any]:
+    region = rng.randrange(len(REGIONS))
+    stype = rng.randrange(len(SCHOOL_TYPES))
+    kind = rng.randrange(len(SCHOOL_KINDS))
+    subj = rng.randrange(len(SUBJECTIONS))
+    contacts = [{"id": 50000 + i * 3, "value": f"0124{i % 1000000:06d}", "typeId": 1}]
+    if rng.random() < 0.8:
+        contacts.append({"id": 50001 + i * 3, "value": f"{i}mekteb@edu.gov.az", "typeId": 3})
+    has_coords = rng.random() < 0.1
+    return {
+        "id": i,
+        "name": f"{i} nömrəli tam orta ümumtəhsil məktəbi",
+        "address": f"{REGIONS[region]}, küç. {i % 300}",
+        "contacts": contacts,
+        "hasJurnal": rng.random() < 0.11,
+        "hasMeeting": rng.random() < 0.08,
+        "imageToken": f"{i:08x}-4827-8671-fa843126288e.jpeg" if rng.random() < 0.3 else None,
+        "lat": round(rng.uniform(38.4, 41.9), 6) if has_coords else 0,
+        "lng": round(rng.uniform(44.8, 50.6), 6) if has_coords else 0,
+        "regionId": 1000000 + region,
+        "regionName": REGIONS[region],
+        "schoolKind": SCHOOL_KINDS[kind],
+        "schoolKindId": 20000000 + kind,
+        "schoolType": SCHOOL_TYPES[stype],
+        "schoolTypeId": 20000100 + stype,
+        "siteUrl": f"https://mekteb{i}.edu.az/" if rng.random() < 0.13 else None,
+        "subjection": SUBJECTIONS[subj],
+        "subjectionId": 1000100 + subj,
+        "utisCode": 138000000 + i,
+    }
+
+
+def synthetic_records(n: int, seed: int = 0) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    return [synthetic_record(i, rng) for i in range(n)]
+
+
+def contact_shape(contacts: List[Dict[str, Any]], rng: random.Random) -> Any:
+    shape = rng.choices([name for name, _ in CONTACT_SHAPES], [w for _, w in CONTACT_SHAPES])[0]
+    if shape == "dict":
+        return contacts[0]
+    if shape == "json":
+        return json.dumps(contacts, ensure_ascii=False)
+    if shape == "plain":
+        return ";".join(c["value"] for c in contacts)
+    return contacts
+
+
+def feed_record(i: int, rng: random.Random) -> Dict[str, Any]:
+    """
+    synthetic_record with the irregularities the resolver has to handle:
+    some records nest region/location/image, some use alternative field
+    names, and contacts come as a list, a single dict, a JSON string or a
+    plain "a;b" string.
+    """
+    rec = synthetic_record(i, rng)
+    rec["contacts"] = contact_shape(rec["contacts"], rng)
+    roll = rng.random()
+    if roll < NESTED_SHARE:
+        rec["region"] = {"id": rec.pop("regionId"), "name": rec.pop("regionName")}
+        rec["location"] = {"address": rec.pop("address"), "latitude": rec.pop("lat"), "longitude": rec.pop("lng")}
+        token = rec.pop("imageToken")
+        if token is not None:
+            rec["image"] = {"token": token}
+    elif roll < NESTED_SHARE + RENAMED_SHARE:
+        for field in list(rec):
+            alternatives = RENAMABLE.get(field)
+            if alternatives and rng.random() < 0.5:
+                rec[rng.choice(alternatives)] = rec.pop(field)
+    return rec
+
+
+def iter_feed(n: int, seed: int = 0) -> Iterator[Dict[str, Any]]:
+    rng = random.Random(seed)
+    return (feed_record(i, rng) for i in range(n))
+
+
+def feed_records(n: int, seed: int = 0) -> List[Dict[str, Any]]:
+    return list(iter_feed(n, seed))
+
+
+def record(bench: str, stage: str, size: int, seconds: float, **extra: Any) -> None:
+    """Keep a result for --json / --compare and print it."""
+    RESULTS.append({"bench": bench, "stage": stage, "size": size, "seconds": seconds,
+                    "per_second": size / seconds if seconds > 0 else None, **extra})
+    print(f"[bench] {stage:<28}: {seconds:8.3f}s ({size / seconds if seconds > 0 else 0:,.0f} rec/s)")
+
+
+def timed(fn: Callable[[], Any], repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def peak_memory(fn: Callable[[], Any]) -> Tuple[float, int]:
+    """Return (seconds, peak traced bytes) for a single call of fn."""
+    tracemalloc.start()
+    try:
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return elapsed, peak
+
+
+@contextmanager
+def stub_server(handle: Callable[[BaseHTTPRequestHandler], None]) -> Iterator[str]:
+    """
+    Run a local HTTP server on an ephemeral port; every GET is passed to
+    `handle`. Yields the base URL.
+    """
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            handle(self)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def send_body(handler: BaseHTTPRequestHandler, body: bytes, status: int = 200, chunk_size: int = 256 * 1024) -> None:
+    handler.send_response(status)
+    handler.send_header("Content-Type", "application/json")
+    handler.send_header("Content-Length", str(len(body)))
+    handler.end_headers()
+    for i in range(0, len(body), chunk_size):
+        handler.wfile.write(body[i:i + chunk_size])
+
+
+def bench_prepare_rows(size: int) -> None:
+    records = synthetic_records(size)
+    probe = timed(lambda: schools.prepare_rows(records, use_plan=False))
+    planned = timed(lambda: schools.prepare_rows(records, use_plan=True))
+    if schools.prepare_rows(records, use_plan=False) != schools.prepare_rows(records, use_plan=True):
+        raise RuntimeError("planned prepare_rows output differs from full probe")
+    print(f"[bench] prepare_rows probe   : {probe:.3f}s ({size / probe:,.0f} rec/s)")
+    print(f"[bench] prepare_rows planned : {planned:.3f}s ({size / planned:,.0f} rec/s)")
+    print(f"[bench] speedup: {probe / planned:.2f}x")
+
+    # column resolution alone, without contacts normalization and flatten
+    columns = [c for c in schools.REQUESTED_COLUMNS if c not in schools.CONTACT_COLUMNS]
+    plan = schools.compile_plan(schools.infer_key_signature(records))
+    probe = timed(lambda: [[schools.resolve_field(r, c) for c in columns] for r in records])
+    planned = timed(lambda: [[schools.resolve_planned(r, *plan[c]) for c in columns] for r in records])
+    print(f"[bench] resolve only probe   : {probe:.3f}s")
+    print(f"[bench] resolve only planned : {planned:.3f}s ({probe / planned:.2f}x)")
+
+
+def bench_contacts(size: int) -> None:
+    import school_contacts
+
+    records = synthetic_records(size)
+    ids = [r["id"] for r in records]
+    raw_values = [r["contacts"] for r in records]
+    for contacts in raw_values[::3]:
+        # packed duplicate, as in the real feed
+        contacts.append({"id": None, "value": ";".join(c["value"] for c in contacts), "typeId": 3})
+    n_contacts = sum(len(c) for c in raw_values)
+    per_record = timed(lambda: [schools.normalize_contacts_field(v) for v in raw_values])
+    batch = timed(lambda: school_contacts.normalize_batch(ids, raw_values))
+    table, columns = school_contacts.normalize_batch(ids, raw_values)
+    odd = [[{"id": 1, "value": 'a]b["c"@x.az', "typeId": 3, "note": [1, [2, {"x": "]"}]]}],
+           '[{"id": 2, "value": "ü\\\\\\"q@x.az", "typeId": 3}]', '{"value": "Ağdam {məktəb}"}',
+           "a@x.az; b@y.az", "[not json", None, 17, [["nested"]], [{"value": "😀@x.az"}, "555 12 34"]]
+    _, odd_columns = school_contacts.normalize_batch(list(range(len(odd))), odd)
+    expected = [schools.normalize_contacts_field(v)[3] for v in raw_values + odd]
+    if columns["contacts_json"] + odd_columns["contacts_json"] != expected:
+        raise RuntimeError("batch contacts_json differs from normalize_contacts_field")
+    emitted = sum(len(schools.normalize_contacts_field(v)[0].split(";")) for v in raw_values)
+    print(f"[bench] per-record normalize : {per_record:.3f}s ({n_contacts / per_record:,.0f} contacts/s)")
+    print(f"[bench] batch normalize      : {batch:.3f}s ({n_contacts / batch:,.0f} contacts/s, "
+          f"{per_record / batch:.2f}x)")
+    print(f"[bench] values kept: {len(table):,} in the long table vs {emitted:,} joined per record")
+
+    rows = timed(lambda: schools.prepare_rows(records), repeat=1)
+    rows_batch = timed(lambda: schools.prepare_rows_batch(records), repeat=1)
+    print(f"[bench] prepare_rows {rows:.3f}s, prepare_rows_batch {rows_batch:.3f}s")
+
+
+def bench_stream(size: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        raw_path = os.path.join(tmp, "raw_response.json")
+        for n in (size, size * 4):
+            body = json.dumps({"data": synthetic_records(n)}, ensure_ascii=False).encode("utf-8")
+            with stub_server(lambda h: send_body(h, body)) as url:
+                def buffered():
+                    root = schools.fetch_json(url)
+                    with open(raw_path, "w", encoding="utf-8") as fh:
+                        json.dump(root, fh, ensure_ascii=False, indent=2)
+                    return len(schools.extract_records(root))
+
+                def streamed():
+                    return sum(1 for _ in schools.fetch_stream(url, raw_path))
+
+                got = list(schools.fetch_stream(url, raw_path))
+                if got != schools.extract_records(schools.fetch_json(url)) or os.path.getsize(raw_path) != len(body):
+                    raise RuntimeError("streamed feed does not match the served body")
+                b_time, b_peak = peak_memory(buffered)
+                s_time, s_peak = peak_memory(streamed)
+            print(f"[bench] {n} records, {len(body) / 1e6:.1f} MB body")
+            print(f"[bench]   buffered : {b_time:.2f}s, peak {b_peak / 1e6:.1f} MB")
+            print(f"[bench]   streamed : {s_time:.2f}s, peak {s_peak / 1e6:.1f} MB")
+        # a lower-priority "items" array ahead of "data": extract_records takes "data"
+        root = {"total": size, "items": synthetic_records(10, seed=1), "data": synthetic_records(size)}
+        body = json.dumps(root, ensure_ascii=False).encode("utf-8")
+        with stub_server(lambda h: send_body(h, body)) as url:
+            if list(schools.fetch_stream(url, raw_path)) != schools.extract_records(root):
+                raise RuntimeError("streamed feed picked a different RECORD_KEYS entry than extract_records")
+
+
+def paged_feed_handler(records: List[Dict[str, Any]], latency: float, fail_every: int,
+                       with_total: bool = True, max_page_size: int = 0,
+                       fail_status: int = 503) -> Callable[[BaseHTTPRequestHandler], None]:
+    """
+    Serve `records` with page/pageSize or offset/limit query arguments. Every
+    `fail_every`-th page answers `fail_status` on its first request. With
+    `max_page_size` larger page sizes are cut down to it and pages past the
+    end answer 404, as some listing APIs do.
+    """
+    failed = set()
+    lock = threading.Lock()
+
+    def handle(h: BaseHTTPRequestHandler) -> None:
+        query = parse_qs(urlsplit(h.path).query)
+        if schools.OFFSET_PARAM in query:
+            limit = int(query[schools.LIMIT_PARAM][0])
+            offset = int(query[schools.OFFSET_PARAM][0])
+        else:
+            limit = int(query[schools.PAGE_SIZE_PARAM][0])
+            offset = (int(query[schools.PAGE_PARAM][0]) - schools.PAGE_START) * limit
+        if max_page_size:
+            limit = min(limit, max_page_size)
+            if offset >= len(records):
+                send_body(h, b'{"error": "page out of range"}', status=404)
+                return
+        page = offset // limit
+        time.sleep(latency)
+        with lock:
+            fail = fail_every and page % fail_every == fail_every - 1 and page not in failed
+            if fail:
+                failed.add(page)
+        if fail:
+            send_body(h, b'{"error": "unavailable"}', status=fail_status)
+            return
+        payload: Dict[str, Any] = {"data": records[offset:offset + limit]}
+        if with_total:
+            payload["total"] = len(records)
+        send_body(h, json.dumps(payload, ensure_ascii=False).encode("utf-8"))
+
+    return handle
+
+
+def bench_paginate(size: int) -> None:
+    records = synthetic_records(size)
+    page_size = 200
+    pages = -(-size // page_size)
+    for with_total in (True, False):
+        for workers in (1, 8):
+            handler = paged_feed_handler(records, latency=0.02, fail_every=10, with_total=with_total)
+            with stub_server(handler) as url:
+                start = time.perf_counter()
+                got = schools.fetch_pages(url, page_size=page_size, workers=workers, backoff=0.05)
+                elapsed = time.perf_counter() - start
+            if got != records:
+                raise RuntimeError("paginated fetch returned records out of order or incomplete")
+            label = "total" if with_total else "probe"
+            print(f"[bench] {label} workers={workers}: {pages} pages in {elapsed:.2f}s ({pages / elapsed:.1f} pages/s)")
+    cap = page_size // 2
+    for with_total in (True, False):
+        handler = paged_feed_handler(records, latency=0.02, fail_every=0, with_total=with_total, max_page_size=cap)
+        with stub_server(handler) as url:
+            start = time.perf_counter()
+            got = schools.fetch_pages(url, page_size=page_size, workers=8, backoff=0.05)
+            elapsed = time.perf_counter() - start
+        if got != records:
+            raise RuntimeError(f"paginated fetch lost records when the server capped pages at {cap}")
+        label = "total" if with_total else "probe"
+        print(f"[bench] {label} capped at {cap}: {len(got)} records in {elapsed:.2f}s")
+    handler = paged_feed_handler(records, latency=0.0, fail_every=3, with_total=False, fail_status=429)
+    with stub_server(handler) as url:
+        if schools.fetch_pages(url, page_size=page_size, workers=8, backoff=0.05) != records:
+            raise RuntimeError("paginated fetch lost records to a 429")
+    handler = paged_feed_handler(records, latency=0.0, fail_every=3, with_total=False, fail_status=403)
+    with stub_server(handler) as url:
+        try:
+            got = schools.fetch_pages(url, page_size=page_size, workers=8, backoff=0.05)
+        except requests.HTTPError:
+            pass
+        else:
+            raise RuntimeError(f"a 403 mid-listing ended the fetch at {len(got)} of {size} records")
+    print("[bench] 429 mid-listing retried, 403 mid-listing raised")
+
+
+@contextmanager
+def output_paths(tmp: str) -> Iterator[None]:
+    """Point schools.OUT_CSV / OUT_XLSX / OUT_PARQUET into `tmp` for the duration."""
+    saved = schools.OUT_CSV, schools.OUT_XLSX, schools.OUT_PARQUET
+    schools.OUT_CSV = os.path.join(tmp, "schools.csv")
+    schools.OUT_XLSX = os.path.join(tmp, "schools.xlsx")
+    schools.OUT_PARQUET = os.path.join(tmp, "schools.parquet")
+    try:
+        yield
+    finally:
+        schools.OUT_CSV, schools.OUT_XLSX, schools.OUT_PARQUET = saved
+
+
+def bench_incremental(size: int) -> None:
+    import school_state
+
+    records = synthetic_records(size)
+    with tempfile.TemporaryDirectory() as tmp, output_paths(tmp):
+        db_path = os.path.join(tmp, "state.sqlite")
+        log_path = os.path.join(tmp, "changes.jsonl")
+        full = timed(lambda: schools.save_outputs(schools.prepare_rows(records)), repeat=1)
+        first = timed(lambda: school_state.run_incremental(records, db_path, log_path), repeat=1)
+        unchanged = timed(lambda: school_state.run_incremental(records, db_path, log_path), repeat=1)
+        appended = records + synthetic_records(10, seed=1)
+        for i, rec in enumerate(appended[size:]):
+            rec["id"] = size + i
+        added = timed(lambda: school_state.run_incremental(appended, db_path, log_path), repeat=1)
+        with school_state.open_state(db_path) as conn:
+            full_csv = schools.build_frame(school_state.load_rows(conn)).to_csv(index=False)
+        with open(schools.OUT_CSV, encoding="utf-8", newline="") as fh:
+            if fh.read() != full_csv:
+                raise RuntimeError("appended CSV differs from a full export of the same rows")
+        modified = [dict(rec) for rec in appended]
+        for rec in modified[:: max(1, size // 10)]:
+            rec["hasJurnal"] = not rec["hasJurnal"]
+        changed = timed(lambda: school_state.run_incremental(modified, db_path, log_path), repeat=1)
+        with school_state.open_state(db_path) as conn:
+            stored = school_state.load_rows(conn)
+        if stored != schools.prepare_rows(modified):
+            raise RuntimeError("state store rows differ from a full prepare_rows")
+    print(f"[bench] full export          : {full:.2f}s")
+    print(f"[bench] incremental, 1st run : {first:.2f}s")
+    print(f"[bench] incremental, no diff : {unchanged:.2f}s")
+    print(f"[bench] incremental, 10 added: {added:.2f}s")
+    print(f"[bench] incremental, ~10 mod : {changed:.2f}s")
+
+
+def bench_columnar(size: int) -> None:
+    import pandas as pd
+    import school_data
+
+    if not school_data.have_pyarrow():
+        print("[warn] pyarrow is not installed; skipping")
+        return
+    columns = ["regionName", "schoolType", "schoolKind", "subjection", "hasJurnal", "hasMeeting", "lat", "lng"]
+    df = schools.build_frame(schools.prepare_rows(synthetic_records(size)))
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "schools.csv")
+        parquet_path = os.path.join(tmp, "schools.parquet")
+        df.to_csv(csv_path, index=False, encoding="utf-8")
+        school_data.write_parquet(df, parquet_path)
+        print(f"[bench] file size: csv {os.path.getsize(csv_path) / 1e6:.1f} MB, "
+              f"parquet {os.path.getsize(parquet_path) / 1e6:.1f} MB")
+        loaders = {
+            "csv, all columns": lambda: pd.read_csv(csv_path),
+            "csv, usecols": lambda: pd.read_csv(csv_path, usecols=columns),
+            "parquet, all columns": lambda: pd.read_parquet(parquet_path),
+            "parquet, projected": lambda: pd.read_parquet(parquet_path, columns=columns),
+        }
+        for label, load in loaders.items():
+            seconds = timed(load)
+            frame_mb = load().memory_usage(deep=True).sum() / 1e6
+            print(f"[bench] {label:<22}: {seconds * 1000:7.1f} ms, frame {frame_mb:6.1f} MB")
+
+
+def bench_chunked(size: int) -> None:
+    import filecmp
+
+    # XLSX is left out: it is streamed either way (see bench_xlsx)
+    def feed() -> Iterator[Dict[str, Any]]:
+        # generated lazily, like --stream, so only the pipeline's own rows count
+        rng = random.Random(0)
+        return (synthetic_record(i, rng) for i in range(size))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        full_dir, chunk_dir = os.path.join(tmp, "full"), os.path.join(tmp, "chunked")
+        os.makedirs(full_dir)
+        os.makedirs(chunk_dir)
+        schema_path = os.path.join(tmp, "schools_schema.json")
+        with output_paths(full_dir):
+            seconds, peak = peak_memory(lambda: schools.save_outputs(schools.prepare_rows(feed()), write_xlsx=False))
+            print(f"[bench] prepare_rows + save_outputs : {seconds:6.2f}s, peak {peak / 1e6:7.1f} MB")
+        with output_paths(chunk_dir):
+            schools.save_schema(schools.discover_schema(feed()), schema_path)
+            seconds, peak = peak_memory(lambda: schools.save_outputs_chunked(feed(), schools.CHUNK_SIZE, schema_path,
+                                                                               write_xlsx=False))
+            print(f"[bench] save_outputs_chunked ({schools.CHUNK_SIZE}) : {seconds:6.2f}s, peak {peak / 1e6:7.1f} MB")
+        same = filecmp.cmp(os.path.join(full_dir, "schools.csv"), os.path.join(chunk_dir, "schools.csv"), shallow=False)
+        print(f"[bench] CSV byte-identical: {same}")
+        if not same:
+            raise RuntimeError("chunked CSV differs from the full export")
+
+
+def bench_xlsx(size: int) -> None:
+    rows = schools.prepare_rows(synthetic_records(size))
+    df = schools.build_frame(rows)
+    columns = list(df.columns)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "schools.xlsx")
+        writers = {
+            "to_excel (openpyxl)": lambda: df.to_excel(path, index=False, engine="openpyxl"),
+            "write_xlsx_rows": lambda: schools.write_xlsx_rows(([r.get(c) for c in columns] for r in rows), columns, path),
+        }
+        for label, write in writers.items():
+            seconds, peak = peak_memory(write)
+            print(f"[bench] {label:<20}: {seconds:6.2f}s, peak {peak / 1e6:7.1f} MB")
+        with output_paths(tmp):
+            seconds = timed(lambda: schools.save_outputs(rows), repeat=1)
+            print(f"[bench] save_outputs (csv + xlsx in parallel + parquet): {seconds:.2f}s")
+            seconds = timed(lambda: schools.save_outputs(rows, write_xlsx=False), repeat=1)
+            print(f"[bench] save_outputs without xlsx: {seconds:.2f}s")
+
+
+def bench_spatial(size: int) -> None:
+    import numpy as np
+    import spatial_index
+
+    rng = np.random.default_rng(0)
+    lat = rng.uniform(38.4, 41.9, size)
+    lng = rng.uniform(44.8, 50.6, size)
+    q_lat = rng.uniform(38.4, 41.9, 2000)
+    q_lng = rng.uniform(44.8, 50.6, 2000)
+    index = spatial_index.build_index(np.arange(size), lat, lng)
+    if index["tree"] is None:
+        print("[warn] scipy is not installed; the index itself is brute force")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "spatial.pkl")
+        build = timed(lambda: spatial_index.build_index(np.arange(size), lat, lng), repeat=1)
+        spatial_index.save_index(index, path)
+        load = timed(lambda: spatial_index.load_index(path))
+    print(f"[bench] build {build * 1000:.1f} ms, load from disk {load * 1000:.1f} ms")
+    for k in (1, 10):
+        tree = timed(lambda: spatial_index.nearest(index, q_lat, q_lng, k), repeat=1)
+        brute = timed(lambda: spatial_index.brute_force_nearest(index, q_lat, q_lng, k), repeat=1)
+        _, tree_ids = spatial_index.nearest(index, q_lat, q_lng, k)
+        _, brute_pos = spatial_index.brute_force_nearest(index, q_lat, q_lng, k)
+        agree = np.mean(tree_ids[:, 0] == index["ids"][brute_pos[:, 0]]) * 100
+        print(f"[bench] 2000 queries k={k}: index {tree * 1000:.1f} ms, brute force {brute * 1000:.1f} ms "
+              f"({brute / tree:.0f}x), nearest agree {agree:.2f}%")
+    radius = timed(lambda: spatial_index.within(index, q_lat, q_lng, 5.0), repeat=1)
+    print(f"[bench] 2000 radius queries (5 km): {radius * 1000:.1f} ms")
+
+
+GRID_SCATTER_LIMIT = 200_000  # the point-scatter chart 5 is only timed up to this many points
+
+
+def bench_grid(size: int) -> None:
+    import numpy as np
+    import pandas as pd
+    import school_charts
+    import school_grid
+
+    rng = np.random.default_rng(0)
+    lat = rng.uniform(38.4, 41.9, size)
+    lng = rng.uniform(44.8, 50.6, size)
+    lat[:size // 100] = 0  # missing coordinates, as exported
+    flags = {"hasJurnal": rng.random(size) < 0.11, "hasMeeting": rng.random(size) < 0.05}
+    grid = school_grid.bin_points(lat, lng, flags)
+    known = lat != 0
+    west, east, south, north = school_grid.extent(grid)
+    bounds = [[south, north], [west, east]]
+    reference, _, _ = np.histogram2d(lat[known], lng[known], bins=school_grid.GRID_SHAPE, range=bounds)
+    assert int(grid["counts"].sum()) + grid["outside"] == int(known.sum())
+    # bincount and histogram2d can disagree only for points on a cell edge (float rounding)
+    moved = int(np.abs(grid["counts"] - reference).sum()) // 2
+    assert all(int(level["counts"].sum()) == int(grid["counts"].sum()) for level in school_grid.levels(grid).values())
+
+    repeat = 1 if size > SUITE_REPEAT_LIMIT else 3
+    binning = timed(lambda: school_grid.bin_points(lat, lng, flags), repeat=repeat)
+    histogram = timed(lambda: np.histogram2d(lat[known], lng[known], bins=school_grid.GRID_SHAPE, range=bounds),
+                      repeat=repeat)
+    coarsen = timed(lambda: school_grid.levels(grid))
+    record("grid", "bin (bincount, 3 layers)", size, binning, histogram2d_counts_only=histogram)
+    record("grid", "coarsen all levels", size, coarsen)
+    print(f"[bench] np.histogram2d for the counts alone: {histogram * 1000:.1f} ms; "
+          f"{moved} points binned into a neighbouring cell")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "grid.npz")
+        save = timed(lambda: school_grid.save_grid(grid, path))
+        load = timed(lambda: school_grid.load_grid(path))
+        record("grid", "save + load npz", size, save + load, npz_bytes=os.path.getsize(path))
+        data = school_grid.chart_input(grid)
+        school_charts.render_one("05", data, os.path.join(tmp, "grid.png"))  # matplotlib import and font cache
+        render = timed(lambda: school_charts.render_one("05", data, os.path.join(tmp, "grid.png")), repeat=1)
+        record("grid", "render chart 05 (grid)", size, render)
+        if size <= GRID_SCATTER_LIMIT:
+            points = {"points": int(known.sum()), "lat": lat[known].tolist(), "lng": lng[known].tolist(),
+                      "hasJurnal": flags["hasJurnal"][known].astype(int).tolist()}
+            scatter = timed(lambda: school_charts.render_one("05", points, os.path.join(tmp, "scatter.png")),
+                            repeat=1)
+            record("grid", "render chart 05 (scatter)", size, scatter)
+        else:
+            print(f"[bench] scatter render skipped above {GRID_SCATTER_LIMIT} points")
+        frame = pd.DataFrame({"lat": lat, "lng": lng, "hasJurnal": flags["hasJurnal"]})
+        picked = "scatter" if "lat" in school_grid.chart_input(grid, df=frame) else "grid"
+        print(f"[bench] chart_input picks the {picked} for {int(known.sum())} located schools "
+              f"(scatter below {school_grid.SCATTER_MAX_POINTS})")
+
+
+def frame_peak_rss(size: int, mode: str, conn: Any) -> None:
+    """Child process: build the frame one way and report (seconds, RSS growth over the records alone)."""
+    import gc
+    import threading
+    import pipeline_metrics
+
+    records = feed_records(size)
+    gc.collect()
+    base = peak = pipeline_metrics.rss_bytes() or 0
+    done = threading.Event()
+
+    def sample() -> None:
+        nonlocal peak
+        while not done.wait(0.005):
+            peak = max(peak, pipeline_metrics.rss_bytes() or 0)
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    started = time.perf_counter()
+    if mode == "rows":
+        rows = schools.prepare_rows(records)
+        df = schools.build_frame(rows)  # save_outputs keeps the rows alive for the XLSX
+    else:
+        df = schools.prepare_frame(records)
+    seconds = time.perf_counter() - started
+    done.set()
+    sampler.join()
+    peak = max(peak, pipeline_metrics.rss_bytes() or 0)
+    conn.send((seconds, peak - base, int(df.memory_usage(deep=True).sum())))
+
+
+def bench_compact(size: int) -> None:
+    import multiprocessing
+
+    context = multiprocessing.get_context("fork")
+    results = {}
+    for mode in ("rows", "compact"):
+        parent, child = context.Pipe()
+        proc = context.Process(target=frame_peak_rss, args=(size, mode, child))
+        proc.start()
+        results[mode] = parent.recv()
+        proc.join()
+        seconds, grown, frame = results[mode]
+        label = "list of dicts + build_frame" if mode == "rows" else "column builder (prepare_frame)"
+        print(f"[bench] {label:<32}: {seconds:6.2f}s, peak RSS +{grown / 1e6:7.1f} MB over the records, "
+              f"frame {frame / 1e6:.1f} MB")
+    print(f"[bench] peak RSS growth {results['rows'][1] / max(results['compact'][1], 1):.1f}x lower with the builder")
+
+
+def bench_parallel(size: int) -> None:
+    import school_parallel
+
+    records = feed_records(size)
+    serial = timed(lambda: schools.build_frame(schools.prepare_rows(records)), repeat=1)
+    print(f"[bench] serial prepare_rows + build_frame: {serial:.2f}s ({os.cpu_count()} CPU(s) available)")
+    expected = schools.build_frame(schools.prepare_rows(records[:school_parallel.PARALLEL_SHARD_SIZE * 2]))
+    got = school_parallel.prepare_frame_parallel(records[:school_parallel.PARALLEL_SHARD_SIZE * 2], 2)
+    if not expected.equals(got) or list(expected.columns) != list(got.columns):
+        raise RuntimeError("parallel frame differs from the serial build_frame(prepare_rows(...))")
+    print(f"[bench] use_processes({len(records)}, {os.cpu_count()}): "
+          f"{school_parallel.use_processes(len(records), os.cpu_count())}")
+    rows = schools.prepare_rows(records[:school_parallel.PARALLEL_SHARD_SIZE])
+    encode = timed(lambda: school_parallel.encode_rows(rows))
+    data, mixed = school_parallel.encode_rows(rows)
+    print(f"[bench] one shard ({len(rows)} rows): {len(data) / 1e6:.1f} MB as Arrow IPC "
+          f"(pickled dicts {len(pickle.dumps(rows, pickle.HIGHEST_PROTOCOL)) / 1e6:.1f} MB), encode {encode * 1000:.0f} ms")
+    for processes in sorted({1, 2, 4, os.cpu_count() or 1}):
+        t = timed(lambda: school_parallel.prepare_frame_parallel(records, processes), repeat=1)
+        print(f"[bench] {processes} process(es): {t:.2f}s ({serial / t:.2f}x serial)")
+
+
+SEARCH_FIRST_NAMES = ["Eldar", "Həsən", "Nizami", "Səməd", "Cəfər", "Mirzə", "Üzeyir", "Şövkət", "İbadət", "Gülağa"]
+SEARCH_LAST_NAMES = ["Tağızadə", "Əliyev", "Vurğun", "Cabbarlı", "Hacıbəyli", "Ələkbərova", "Nəcəfov", "Məmmədov"]
+SEARCH_STREETS = ["S.Rüstəmov", "H.Əliyev pr.", "Füzuli", "Nizami", "Azadlıq pr.", "Şərifzadə", "Gülüstan qəs."]
+SEARCH_QUERIES = ["164 nömrəli", "Eldar Tağızadə", "Vurğun", "Azadlıq", "Nəsimi 35", "Şövkət Ələkbərova",
+                  "Hacıbəyli adına", "Quba", "Füzuli küç. 12", "Cəfər Cabbarlı 7 nömrəli"]
+
+
+def bench_search(size: int) -> None:
+    import numpy as np
+    import pandas as pd
+    import school_search
+
+    rng = random.Random(0)
+    names = [f"{rng.choice(REGIONS)} rayonu {rng.choice(SEARCH_FIRST_NAMES)} {rng.choice(SEARCH_LAST_NAMES)} "
+             f"adına {i % 400} nömrəli tam orta məktəb" for i in range(size)]
+    addresses = [f"{rng.choice(REGIONS)}, {rng.choice(SEARCH_STREETS)} küç. {rng.randrange(1, 300)}" for _ in range(size)]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, school_search.INDEX_NAME)
+        build = timed(lambda: school_search.write_index(range(size), names, addresses, path), repeat=1)
+        load = timed(lambda: school_search.load_index(path))
+        index = school_search.load_index(path)
+    print(f"[bench] build+save {build * 1000:.1f} ms, load from disk {load * 1000:.1f} ms, "
+          f"{len(index['vocab'])} terms")
+    df = pd.DataFrame({"name": names, "address": addresses})
+
+    def scan(query: str) -> pd.Series:
+        # what callers did before: a case-insensitive substring scan of every row
+        return df["name"].str.contains(query, case=False, regex=False) | \
+            df["address"].str.contains(query, case=False, regex=False)
+
+    scan_total = index_total = 0.0
+    for query in SEARCH_QUERIES:
+        scan_s = timed(lambda: scan(query))
+        index_s = timed(lambda: school_search.search(index, query, limit=20))
+        scan_hits = set(np.flatnonzero(scan(query).to_numpy()).tolist())
+        index_hits = {pos for pos, _ in school_search.search(index, query, limit=None)}
+        recall = len(scan_hits & index_hits) / len(scan_hits) * 100 if scan_hits else 100.0
+        scan_total += scan_s
+        index_total += index_s
+        print(f"[bench] {query!r:<28} scan {scan_s * 1000:8.2f} ms ({len(scan_hits):>6} hits)  "
+              f"index {index_s * 1000:7.2f} ms ({len(index_hits):>6} hits, {recall:5.1f}% of scan hits)")
+    print(f"[bench] {len(SEARCH_QUERIES)} queries: scan {scan_total * 1000:.1f} ms, index {index_total * 1000:.1f} ms "
+          f"({scan_total / index_total:.0f}x)")
+    folded = timed(lambda: school_search.search(index, "eldar tagizade", limit=20))
+    typo = timed(lambda: school_search.search(index, "Tağızdə", limit=20))
+    print(f"[bench] folded query {folded * 1000:.2f} ms, typo (trigram) query {typo * 1000:.2f} ms")
+
+
+SNAPSHOT_RUNS = 10
+SNAPSHOT_CHURN = 0.01  # share of schools whose row changes between runs
+
+
+def directory_size(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(path) for f in files)
+
+
+def bench_snapshots(size: int) -> None:
+    from datetime import timedelta
+    import school_data
+    import school_snapshots
+
+    df = school_data.to_typed_frame(schools.prepare_frame(feed_records(size)))
+    rng = random.Random(0)
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    with tempfile.TemporaryDirectory() as tmp:
+        store = os.path.join(tmp, "snapshots")
+        full = os.path.join(tmp, "full.parquet")
+        school_data.write_parquet(df, full)
+        takes = []
+        for run in range(SNAPSHOT_RUNS):
+            if run:
+                changed = rng.sample(range(size), max(1, int(size * SNAPSHOT_CHURN)))
+                df.loc[changed, "hasJurnal"] = ~df.loc[changed, "hasJurnal"].fillna(False)
+            t0 = time.perf_counter()
+            school_snapshots.take_snapshot(df, store, start + timedelta(days=run))
+            takes.append(time.perf_counter() - t0)
+        stored = directory_size(store)
+        naive = os.path.getsize(full) * SNAPSHOT_RUNS
+        print(f"[bench] {SNAPSHOT_RUNS} snapshots at {SNAPSHOT_CHURN:.0%} churn: store {stored / 1e6:.2f} MB vs "
+              f"{naive / 1e6:.2f} MB as full Parquet copies ({naive / stored:.1f}x smaller); "
+              f"take {min(takes) * 1000:.0f}-{max(takes) * 1000:.0f} ms")
+        record("snapshots", "take", size, sum(takes) / len(takes), store_bytes=stored, naive_bytes=naive)
+        diff_s = timed(lambda: school_snapshots.diff(f"-{SNAPSHOT_RUNS}", "latest", store))
+        result = school_snapshots.diff(f"-{SNAPSHOT_RUNS}", "latest", store)
+        detail_s = timed(lambda: school_snapshots.diff(f"-{SNAPSHOT_RUNS}", "latest", store, columns=True))
+        series_s = timed(lambda: school_snapshots.region_timeseries(store), repeat=1)
+        print(f"[bench] diff first -> last {diff_s * 1000:.1f} ms ({len(result['modified'])} modified), "
+              f"with changed columns {detail_s * 1000:.1f} ms; region time series {series_s * 1000:.0f} ms")
+        record("snapshots", "diff", size, diff_s)
+        record("snapshots", "timeseries", size, series_s)
+
+
+CLI_COMMANDS = [
+    ("stats", ["school_cli.py", "stats"]),
+    ("stats --by schoolType", ["school_cli.py", "stats", "--by", "schoolType"]),
+    ("check_types.py", ["check_types.py"]),
+    ("scrape --help", ["school_cli.py", "scrape", "--help"]),
+    ("export --help", ["school_cli.py", "export", "--help"]),
+    ("analyze --help", ["school_cli.py", "analyze", "--help"]),
+    ("chart --help", ["school_cli.py", "chart", "--help"]),
+]
+# what check_types.py did before the summary file
+LEGACY_TYPE_COUNTS = ("from school_data import load_schools; "
+                      "print(load_schools(columns=['schoolType'])['schoolType'].value_counts())")
+
+
+def cold_start(args: List[str], cwd: str, repeat: int = 5) -> Tuple[float, bool]:
+    """Best wall time of a fresh interpreter running `args`, and whether it imported pandas."""
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        proc = subprocess.run([sys.executable, "-X", "importtime", *args], cwd=cwd, capture_output=True, text=True,
+                              env={**os.environ, "PYTHONPATH": os.path.dirname(os.path.abspath(__file__))})
+        best = min(best, time.perf_counter() - t0)
+    return best, any(line.endswith("| pandas") for line in proc.stderr.splitlines())
+
+
+def bench_cli(size: int) -> None:
+    import school_summary
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    with tempfile.TemporaryDirectory() as tmp, output_paths(tmp):
+        schools.save_frame(schools.prepare_frame(feed_records(size)), write_xlsx=False)
+        for label, args in CLI_COMMANDS:
+            seconds, pandas_loaded = cold_start([os.path.join(here, args[0]), *args[1:]], tmp)
+            print(f"[bench] {label:<24} {seconds * 1000:7.0f} ms{'  (imports pandas)' if pandas_loaded else ''}")
+            record("cli", label, size, seconds)
+        seconds, _ = cold_start(["-c", LEGACY_TYPE_COUNTS], tmp)
+        print(f"[bench] {'type counts via pandas':<24} {seconds * 1000:7.0f} ms  (before: load the export)")
+        record("cli", "type counts via pandas", size, seconds)
+        os.utime(os.path.join(tmp, school_summary.SUMMARY_PATH), (0, 0))
+        seconds, _ = cold_start([os.path.join(here, "school_cli.py"), "stats"], tmp, repeat=1)
+        print(f"[bench] {'stats, stale summary':<24} {seconds * 1000:7.0f} ms  (rebuilds {school_summary.SUMMARY_PATH})")
+        record("cli", "stats, stale summary", size, seconds)
+
+
+IMAGE_DUPLICATE_SHARE = 0.1  # tokens whose bytes equal another token's image
+IMAGE_MISSING_SHARE = 0.05   # tokens answering 404
+IMAGE_LATENCY = 0.02
+
+
+def synthetic_images(n: int, seed: int = 0) -> List[bytes]:
+    """`n` distinct small JPEGs (gradient plus noise, ~20-40 KB each)."""
+    import io
+    import numpy as np
+    from PIL import Image
+
+    rng = np.random.default_rng(seed)
+    ramp = np.linspace(0, 255, 480, dtype=np.float32)
+    out = []
+    for i in range(n):
+        pixels = np.stack([np.add.outer(ramp[:360] * (i % 7 + 1) / 7, ramp) / 2] * 3, axis=-1)
+        pixels += rng.normal(0, 12, pixels.shape)
+        buf = io.BytesIO()
+        Image.fromarray(pixels.clip(0, 255).astype(np.uint8)).save(buf, "JPEG", quality=80)
+        out.append(buf.getvalue())
+    return out
+
+
+def image_feed(size: int) -> Tuple[List[str], Dict[str, bytes]]:
+    """(tokens, token -> body) with IMAGE_DUPLICATE_SHARE shared bodies and IMAGE_MISSING_SHARE 404s."""
+    rng = random.Random(0)
+    tokens = [f"{rng.getrandbits(128):032x}.jpeg" for _ in range(size)]
+    n_missing = int(size * IMAGE_MISSING_SHARE)
+    n_distinct = size - n_missing - int(size * IMAGE_DUPLICATE_SHARE)
+    images = synthetic_images(max(1, n_distinct))
+    bodies = {token: images[i] if i < n_distinct else images[rng.randrange(len(images))]
+              for i, token in enumerate(tokens[:size - n_missing])}
+    return tokens, bodies
+
+
+def image_handler(bodies: Dict[str, bytes], fail_every: int = 50) -> Callable[[BaseHTTPRequestHandler], None]:
+    """Serve /<token>; every `fail_every`-th token answers 503 on its first request."""
+    failed = set()
+    order = {token: i for i, token in enumerate(bodies)}
+    lock = threading.Lock()
+
+    def handle(h: BaseHTTPRequestHandler) -> None:
+        # headers and body go out as two writes; without this Nagle holds the body for the client's delayed ACK
+        h.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        token = h.path.lstrip("/")
+        time.sleep(IMAGE_LATENCY)
+        with lock:
+            fail = token in order and order[token] % fail_every == fail_every - 1 and token not in failed
+            failed.add(token)
+        if token not in bodies or fail:
+            send_body(h, b"", status=404 if token not in bodies else 503)
+            return
+        h.send_response(200)
+        h.send_header("Content-Type", "image/jpeg")
+        h.send_header("Content-Length", str(len(bodies[token])))
+        h.end_headers()
+        h.wfile.write(bodies[token])
+
+    return handle
+
+
+class InterruptingSession:
+    """A session that raises KeyboardInterrupt on its `after`-th request, like Ctrl-C mid-sync."""
+
+    def __init__(self, session: Any, after: int):
+        self.session, self.after, self.calls = session, after, 0
+        self.lock = threading.Lock()
+
+    def get(self, *args: Any, **kwargs: Any) -> Any:
+        with self.lock:
+            self.calls += 1
+            if self.calls == self.after:
+                raise KeyboardInterrupt
+        return self.session.get(*args, **kwargs)
+
+
+def check_image_store(store: str, bodies: Dict[str, bytes]) -> None:
+    import hashlib
+    import school_images
+
+    log = school_images.read_log(store)
+    for token, body in bodies.items():
+        digest, ext, _ = log[token]
+        with open(school_images.object_path(store, digest, ext), "rb") as fh:
+            if hashlib.sha256(fh.read()).hexdigest() != hashlib.sha256(body).hexdigest():
+                raise RuntimeError(f"image store holds the wrong bytes for {token}")
+    distinct = {hashlib.sha256(b).hexdigest() for b in bodies.values()}
+    stored = sum(len(files) for _, _, files in os.walk(os.path.join(store, "objects")))
+    if stored != len(distinct):
+        raise RuntimeError(f"{stored} objects stored for {len(distinct)} distinct images")
+
+
+def image_store_files(store: str) -> Tuple[Dict[str, Any], List[str]]:
+    """A store's token log and its object files, for comparing two syncs of the same feed."""
+    import school_images
+
+    objects = os.path.join(store, "objects")
+    files = sorted(os.path.relpath(os.path.join(root, f), objects) for root, _, names in os.walk(objects) for f in names)
+    return school_images.read_log(store), files
+
+
+DB_ROW_BY_ROW_LIMIT = 5000  # rows inserted one autocommitted statement at a time, for comparison
+DB_QUERIES = [
+    ("adoption by subjection in a region (cube)",
+     "SELECT subjection, SUM(n), SUM(CASE WHEN hasJurnal THEN n ELSE 0 END) * 100.0 / SUM(n) "
+     "FROM cube WHERE regionName = ? GROUP BY subjection", (REGIONS[0],)),
+    ("adoption by subjection in a region (rows)",
+     "SELECT subjectionId, COUNT(*), AVG(hasJurnal) * 100 FROM schools WHERE regionId = ? GROUP BY subjectionId",
+     (1000000,)),
+    ("schools of one type in a region",
+     "SELECT id, name FROM schools WHERE regionId = ? AND schoolTypeId = ?", (1000001, 20000101)),
+    ("school by id", "SELECT * FROM schools WHERE id = ?", (12345,)),
+    ("school by phone", "SELECT school_id FROM contacts WHERE value = ?", ("0124012345",)),
+    ("chart 1 table", "SELECT regionName, schools FROM chart_01_regions LIMIT 20", ()),
+]
+
+
+def bench_database(size: int) -> None:
+    import sqlite3
+    import pandas as pd
+    import school_db
+
+    df = schools.prepare_frame(feed_records(size))
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "schools.csv")
+        db_path = os.path.join(tmp, "schools.sqlite")
+        df.to_csv(csv_path, index=False, encoding="utf-8")
+        load = timed(lambda: school_db.export_database(db_path, csv_path), repeat=1 if size > SUITE_REPEAT_LIMIT else 3)
+        sizes = school_db.write_database(pd.read_csv(csv_path), db_path)
+        record("database", "load (bulk)", size, load, db_bytes=os.path.getsize(db_path), contacts=sizes["contacts"])
+
+        n = min(size, DB_ROW_BY_ROW_LIMIT)
+        columns = school_db.typed_columns(df.head(n))
+        rows = list(zip(*(school_db.column_values(s) for s in columns.values())))
+        conn = sqlite3.connect(os.path.join(tmp, "row_by_row.sqlite"))
+        school_db.create_table(conn, "schools", {col: school_db.sql_type(col) for col in columns})
+        conn.commit()
+        marks = ", ".join("?" for _ in columns)
+
+        def row_by_row() -> None:
+            for row in rows:
+                conn.execute(f"INSERT INTO schools VALUES ({marks})", row)
+                conn.commit()
+
+        one_by_one = timed(row_by_row, repeat=1)
+        conn.close()
+        record("database", "insert row by row", n, one_by_one)
+
+        conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+        for label, sql, params in DB_QUERIES:
+            seconds = timed(lambda: conn.execute(sql, params).fetchall(), repeat=20)
+            print(f"[bench] query {label:<44}: {seconds * 1000:8.3f} ms")
+            RESULTS.append({"bench": "database", "stage": f"query {label}", "size": size, "seconds": seconds})
+        conn.close()
+
+        def pandas_reload() -> None:
+            frame = pd.read_csv(csv_path)
+            frame[frame["regionId"] == 1000000].groupby("subjectionId")["hasJurnal"].agg(["size", "mean"])
+
+        reload_s = timed(pandas_reload, repeat=1 if size > SUITE_REPEAT_LIMIT else 3)
+        print(f"[bench] same question by reloading the CSV in pandas: {reload_s * 1000:8.1f} ms; "
+              f"database {os.path.getsize(db_path) / 1e6:.1f} MB vs CSV {os.path.getsize(csv_path) / 1e6:.1f} MB")
+        RESULTS.append({"bench": "database", "stage": "pandas reload + groupby", "size": size, "seconds": reload_s})
+
+
+def bench_images(size: int) -> None:
+    import schools
+    import school_images
+
+    tokens, bodies = image_feed(size)
+    feed = tokens + tokens[:size // 20]  # the export repeats a few tokens
+    payload = sum(len(b) for b in bodies.values())
+    print(f"[bench] {size} tokens, {len(bodies)} served ({payload / 1e6:.1f} MB), "
+          f"{size - len(bodies)} missing, {IMAGE_LATENCY * 1000:.0f} ms latency")
+    with stub_server(image_handler(bodies)) as url, tempfile.TemporaryDirectory() as tmp:
+        for workers in (1, 8):
+            store = os.path.join(tmp, f"w{workers}")
+            stats = school_images.sync_images(feed, store, url + "/{token}", workers, backoff=0.05)
+            seconds = stats["seconds"]
+            print(f"[bench] workers={workers}: {stats['downloaded']} images in {seconds:.2f}s "
+                  f"({stats['downloaded'] / seconds:.0f} images/s, {stats['bytes'] / seconds / 1e6:.1f} MB/s), "
+                  f"{stats['duplicates']} duplicates = {stats['duplicate_bytes'] / 1e6:.2f} MB saved, "
+                  f"{stats['repeated']} repeated tokens, {stats['missing']} missing")
+            record("images", f"download workers={workers}", stats["downloaded"], seconds,
+                   duplicate_bytes=stats["duplicate_bytes"])
+            check_image_store(store, bodies)
+        baseline = image_store_files(os.path.join(tmp, "w1"))
+        if image_store_files(os.path.join(tmp, "w8")) != baseline:
+            raise RuntimeError("8 workers stored different tokens or objects than the sequential sync")
+
+        store = os.path.join(tmp, "resume")
+        try:
+            school_images.sync_images(feed, store, url + "/{token}", 8, backoff=0.05,
+                                      session=InterruptingSession(schools.make_session(8), size // 2))
+        except KeyboardInterrupt:
+            pass
+        done = len(school_images.read_log(store))
+        stats = school_images.sync_images(feed, store, url + "/{token}", 8, backoff=0.05)
+        check_image_store(store, bodies)
+        if image_store_files(store) != baseline:
+            raise RuntimeError("resumed sync stored different tokens or objects than an uninterrupted one")
+        again = school_images.sync_images(feed, store, url + "/{token}", 8, backoff=0.05)
+        print(f"[bench] interrupted after {done} logged tokens; resume fetched {stats['downloaded']}, "
+              f"skipped {stats['present']} ({stats['present_bytes'] / 1e6:.1f} MB); a third run fetched "
+              f"{again['downloaded']} in {again['seconds'] * 1000:.0f} ms")
+
+        for processes in sorted({1, os.cpu_count() or 1}):
+            shutil.rmtree(os.path.join(tmp, "w8", "thumbs"), ignore_errors=True)
+            start = time.perf_counter()
+            thumbs = school_images.make_thumbnails(os.path.join(tmp, "w8"), (128, 256), processes)
+            elapsed = time.perf_counter() - start
+            print(f"[bench] thumbnails processes={processes}: {thumbs['thumbnails']} in {elapsed:.2f}s "
+                  f"({thumbs['thumbnails'] / elapsed:.0f}/s)")
+            record("images", f"thumbnails processes={processes}", thumbs["thumbnails"], elapsed)
+
+
+QUALITY_DEFECT_SHARE = 0.005  # rows per injected defect kind
+QUALITY_DEFECTS = ("id_duplicate", "utisCode_duplicate", "coords_swapped", "coords_outside_az", "email_format",
+                   "url_format", "phone_repeated", "null_placeholder")
+
+
+def inject_defects(df: Any, rng: random.Random, duplicate_keys: bool = True) -> Dict[str, Any]:
+    """
+    Break QUALITY_DEFECT_SHARE of a chunk's rows per QUALITY_DEFECTS kind,
+    each kind on its own rows; returns the index of the rows broken per kind.
+    Duplicate ids / utisCodes copy those of the first chunk (ids
+    0..len(df)), whose keys are left alone.
+    """
+    k = int(len(df) * QUALITY_DEFECT_SHARE)
+    rows = rng.sample(range(len(df)), k * len(QUALITY_DEFECTS))
+    picked = {kind: df.index[rows[i * k:(i + 1) * k]] for i, kind in enumerate(QUALITY_DEFECTS)}
+    if duplicate_keys:
+        copied = [rng.randrange(len(df)) for _ in range(2 * k)]
+        df.loc[picked["id_duplicate"], "id"] = copied[:k]
+        df.loc[picked["utisCode_duplicate"], "utisCode"] = [138000000 + i for i in copied[k:]]
+    else:
+        picked["id_duplicate"] = picked["utisCode_duplicate"] = df.index[:0]
+    df.loc[picked["coords_swapped"], ["lat", "lng"]] = [[rng.uniform(44.8, 50.6), rng.uniform(38.4, 41.9)]
+                                                        for _ in range(k)]
+    df.loc[picked["coords_outside_az"], ["lat", "lng"]] = [[rng.uniform(51, 60), rng.uniform(10, 30)]
+                                                           for _ in range(k)]
+    df.loc[picked["email_format"], "contacts_emails"] = [f"mekteb{rng.randrange(999)}.mail.ru" for _ in range(k)]
+    df.loc[picked["url_format"], "siteUrl"] = [f"mekteb {rng.randrange(999)}" for _ in range(k)]
+    df.loc[picked["phone_repeated"], "contacts_phones"] = [f"0124{i:06d}|0124{i:06d}" for i in range(k)]
+    df.loc[picked["null_placeholder"], "siteUrl"] = [rng.choice(["-", "yox", " "]) for _ in range(k)]
+    return picked
+
+
+def bench_quality(size: int) -> None:
+    """
+    The school_quality rules on a streamed feed (e.g. --size 1000000): each
+    chunk is normalized into the export's chunk frame, defects are injected
+    and the chunk is validated, so the validation cost is timed against the
+    normalization it rides along with. Each rule must find exactly the rows
+    injected for it plus the other rows that broke it before injection
+    (plain-string contacts land in contacts_emails whole, phones included).
+    """
+    import pandas as pd
+    import school_quality
+
+    rules = {r["rule"]: r for r in school_quality.RULES}
+    rng = random.Random(0)
+    validator = school_quality.new_validator()
+    injected = dict.fromkeys(QUALITY_DEFECTS, 0)
+    expected = dict.fromkeys(QUALITY_DEFECTS, 0)
+    prepare_s = validate_s = 0.0
+    chunks = iter(schools.iter_chunks(schools.iter_prepare_rows(iter_feed(size)), schools.CHUNK_SIZE))
+    for n in itertools.count():
+        t0 = time.perf_counter()
+        chunk = next(chunks, None)
+        if chunk is None:
+            break
+        df = pd.DataFrame(chunk, columns=list(schools.REQUESTED_COLUMNS))
+        prepare_s += time.perf_counter() - t0
+        clean = df.copy()
+        picked = inject_defects(df, rng, duplicate_keys=n > 0)
+        for kind, rows in picked.items():
+            injected[kind] += len(rows)
+            expected[kind] += len(rows)
+            rule = rules[kind]
+            if rule["check"] != "unique":
+                already = school_quality.CHECKS[rule["check"]](clean, rule, {}, {})
+                if isinstance(already, pd.DataFrame):
+                    already = already.any(axis=1)
+                expected[kind] += int(already.drop(rows).sum())
+        expected["coords_outside_az"] += len(picked["coords_swapped"])  # swapped is outside the box too
+        t0 = time.perf_counter()
+        school_quality.validate_batch(validator, df)
+        validate_s += time.perf_counter() - t0
+    t0 = time.perf_counter()
+    result = school_quality.finish_validation(validator)
+    validate_s += time.perf_counter() - t0
+    print(f"[bench] normalize {prepare_s:.2f}s, validate {validate_s:.2f}s "
+          f"({validate_s / prepare_s:.0%} of normalization, {size / validate_s:,.0f} rows/s); "
+          f"{len(result['violations'])} violation rows kept")
+    found = {item["rule"]: item["violations"] for item in result["summary"]}
+    for kind in QUALITY_DEFECTS:
+        print(f"[bench]   {kind:<20} injected {injected[kind]:>7}  expected {expected[kind]:>7}  "
+              f"found {found[kind]:>7}" + ("" if found[kind] == expected[kind] else "  MISMATCH"))
+    record("quality", "validate", size, validate_s, normalize_seconds=prepare_s)
+
+
+DEDUP_COPY_SHARE = 0.01     # schools listed a second time under another id
+DEDUP_OFFICE_SHARE = 0.05   # schools giving a shared office phone / email instead of their own
+DEDUP_CLASS_SHARE = 0.01    # special classes attached to a school: its name, phone and place, another type
+DEDUP_SYLLABLES = ["qa", "ra", "bə", "li", "ço", "xan", "də", "mir", "sa", "ko", "kən", "tü", "zey", "nə", "pa", "şu"]
+# (id, name, region index, schoolTypeId, phone, email, lat, lng): pairs the real export has, fixed;
+# DEDUP_FIXTURE_CLUSTERS are the groups find_duplicates must return for them, every other id stays alone
+DEDUP_FIXTURE: Sequence[Tuple[int, str, int, int, str, str, float, float]] = (
+    # the same school listed twice, the second time with "saylı" and its phone
+    (900001, "Quba rayonu 13 nömrəli tam orta məktəb", 3, 1, "0123350313", "", 0, 0),
+    (900002, "Quba rayonu 13 saylı tam orta məktəb", 3, 1, "+994123350313", "", 0, 0),
+    # a typo and "kəndi" for "kənd", same email
+    (900003, "Lerik rayonu Vəndam kənd tam orta məktəbi", 6, 1, "", "vendam.mekteb@edu.az", 0, 0),
+    (900004, "Lerik rayonu Vəndam kəndi tam orta mektəbi", 6, 1, "", "vendam.mekteb@edu.az", 0, 0),
+    # another number in the same region, sharing an email
+    (900005, "Quba rayonu 20 nömrəli tam orta məktəb", 3, 1, "", "quba.tehsil.2@edu.az", 0, 0),
+    (900006, "Quba rayonu 21 nömrəli tam orta məktəb", 3, 1, "", "quba.tehsil.2@edu.az", 0, 0),
+    # the lower and the upper village, sharing an email
+    (900007, "Xaçmaz rayonu Aşağı Qışlaq kənd tam orta məktəbi", 2, 1, "", "qislaq@edu.az", 0, 0),
+    (900008, "Xaçmaz rayonu Yuxarı Qışlaq kənd tam orta məktəbi", 2, 1, "", "qislaq@edu.az", 0, 0),
+    # a school and its special class: same name, phone and place, another type
+    (900009, "Nəsimi rayonu 55 nömrəli tam orta məktəb", 0, 1, "0124401663", "", 40.3921, 49.8418),
+    (900010, "Nəsimi rayonu 55 nömrəli tam orta məktəb nəzdində xüsusi sinif", 0, 2, "0124401663", "",
+     40.3921, 49.8418),
+    # one village name in two regions, nothing shared
+    (900011, "Cəlilabad rayonu Təzəkənd kənd tam orta məktəbi", 4, 1, "0125550011", "", 0, 0),
+    (900012, "Ağdam rayonu Təzəkənd kənd tam orta məktəbi", 5, 1, "0125550012", "", 0, 0),
+)
+DEDUP_FIXTURE_CLUSTERS: Sequence[Sequence[int]] = ((900001, 900002), (900003, 900004))
+
+
+def dedup_frame(size: int, rng: random.Random) -> Tuple[Any, List[Tuple[int, int]]]:
+    """
+    DEDUP_COLUMNS for `size` schools (one village name per school, person
+    names drawn from small pools so their tokens collide; office phones and
+    emails shared by a handful of schools), DEDUP_COPY_SHARE of them copies of another school
+    with a perturbed name and some of its keys; plus DEDUP_CLASS_SHARE more
+    rows, special classes of a school that must not be linked to it.
+    Returns (frame, [(original id, copy id)]).
+    """
+    import pandas as pd
+
+    copies = int(size * DEDUP_COPY_SHARE)
+    classes = int(size * DEDUP_CLASS_SHARE)
+    originals = size - copies
+
+    def village(i: int) -> str:  # unique per school: i in base len(DEDUP_SYLLABLES), one syllable per digit
+        word = ""
+        while True:
+            i, digit = divmod(i, len(DEDUP_SYLLABLES))
+            word += DEDUP_SYLLABLES[digit]
+            if not i:
+                return (word + "lı").capitalize()
+
+    offices = max(originals // 100, 5)
+    rows: List[Dict[str, Any]] = []
+    for i in range(originals):
+        region = rng.randrange(len(REGIONS))
+        place = village(i)
+        shape = i % 3
+        if shape == 0:
+            name = f"{place} kənd {rng.choice(SEARCH_FIRST_NAMES)} {rng.choice(SEARCH_LAST_NAMES)} adına tam orta məktəb"
+        elif shape == 1:
+            name = f"{REGIONS[region]} rayonu {i} nömrəli tam orta ümumtəhsil məktəbi"
+        else:
+            name = f"{REGIONS[region]} rayonu {place} kənd ibtidai ümumtəhsil məktəbi"
+        office = rng.random() < DEDUP_OFFICE_SHARE
+        has_coords = rng.random() < 0.1
+        rows.append({
+            "id": i, "name": name, "regionId": 1000000 + region, "schoolTypeId": 1, "schoolType": "Məktəb",
+            "lat": round(rng.uniform(38.4, 41.9), 6) if has_coords else 0,
+            "lng": round(rng.uniform(44.8, 50.6), 6) if has_coords else 0,
+            "contacts_phones": f"055{rng.randrange(offices):07d}" if office else f"012{i:07d}",
+            "contacts_emails": (f"office{rng.randrange(offices)}@edu.gov.az" if office
+                                else f"school{i}@edu.az" if rng.random() < 0.8 else ""),
+        })
+    truth: List[Tuple[int, int]] = []
+    for k in range(copies):
+        original = rows[rng.randrange(originals)]
+        name = original["name"]
+        edit = rng.randrange(3)
+        if edit == 0:  # a typo: one letter dropped
+            letters = [j for j, c in enumerate(name) if c.isalpha()]
+            j = rng.choice(letters)
+            name = name[:j] + name[j + 1:]
+        elif edit == 1:
+            name = name.replace("nömrəli", "saylı").replace(" kənd ", " kəndi ").replace("tam orta məktəb", "tam orta ümumtəhsil məktəbi")
+        else:
+            name = name.replace(" rayonu", " r.").replace(" adına", "")
+        copy = dict(original, id=originals + k, name=name)
+        if rng.random() < 0.3:
+            copy["contacts_phones"] = f"050{k:07d}"
+        if rng.random() < 0.5:
+            copy["contacts_emails"] = ""
+        rows.append(copy)
+        truth.append((original["id"], copy["id"]))
+    for k in range(classes):
+        school = rows[rng.randrange(originals)]
+        rows.append(dict(school, id=originals + copies + k, name=f"{school['name']}n nəzdində xüsusi sinif",
+                         schoolTypeId=2, schoolType="Xüsusi sinif"))
+    return pd.DataFrame(rows), truth
+
+
+def check_dedup_fixture() -> None:
+    """find_duplicates on DEDUP_FIXTURE, mixed into a synthetic frame so token statistics are realistic."""
+    import pandas as pd
+    import school_dedup
+
+    background, _ = dedup_frame(2000, random.Random(1))
+    fixture = pd.DataFrame([{
+        "id": i, "name": name, "regionId": 1000000 + region, "schoolTypeId": type_id,
+        "schoolType": "Məktəb" if type_id == 1 else "Xüsusi sinif", "lat": lat, "lng": lng,
+        "contacts_phones": phone, "contacts_emails": email,
+    } for i, name, region, type_id, phone, email, lat, lng in DEDUP_FIXTURE])
+    clusters = school_dedup.find_duplicates(pd.concat([background, fixture], ignore_index=True))["clusters"]
+    cluster = dict(zip(clusters["id"].tolist(), clusters["cluster_id"].tolist()))
+    size = dict(zip(clusters["id"].tolist(), clusters["cluster_size"].tolist()))
+    expected = {i: tuple(group) for group in DEDUP_FIXTURE_CLUSTERS for i in group}
+    for row in DEDUP_FIXTURE:
+        want = expected.get(row[0], (row[0],))
+        got = tuple(other[0] for other in DEDUP_FIXTURE if cluster[other[0]] == cluster[row[0]])
+        if got != want or size[row[0]] != len(want):
+            raise RuntimeError(f"dedup fixture: school {row[0]} clustered with {got} "
+                               f"({size[row[0]]} schools), expected {want}")
+    print(f"[bench] fixture: {len(DEDUP_FIXTURE)} schools clustered as expected "
+          f"({len(DEDUP_FIXTURE_CLUSTERS)} duplicate pairs)")
+
+
+def bench_dedup(size: int) -> None:
+    """
+    school_dedup on a synthetic frame with known copies: time, candidate
+    pairs against the n*(n-1)/2 an all-pairs comparison would score, and
+    the share of copies that end up in their original's cluster.
+    """
+    import school_dedup
+
+    check_dedup_fixture()
+    df, truth = dedup_frame(size, random.Random(0))
+    result = {}
+
+    def run() -> None:
+        result.update(school_dedup.find_duplicates(df))
+
+    seconds = timed(run, repeat=1 if size > SUITE_REPEAT_LIMIT else 3)
+    stats = result["stats"]["total"]
+    cluster = dict(zip(result["clusters"]["id"].tolist(), result["clusters"]["cluster_id"].tolist()))
+    found = sum(cluster[a] == cluster[b] for a, b in truth)
+    copy_pairs = {tuple(sorted(p)) for p in truth}
+    pairs = result["pairs"]
+    other = sum((a, b) not in copy_pairs for a, b in zip(pairs["id_a"].tolist(), pairs["id_b"].tolist()))
+    record("dedup", "find_duplicates", size, seconds, candidates=stats["candidates"], matched=stats["matched"],
+           recall=found / len(truth) if truth else None)
+    print(f"[bench] {stats['candidates']:,} candidate pairs vs {len(df) * (len(df) - 1) // 2:,} all-pairs; "
+          f"{found}/{len(truth)} copies clustered with their original ({found / max(len(truth), 1):.1%}), "
+          f"{other} other matched pairs")
+    for kind in school_dedup.EVIDENCE:
+        s = result["stats"][kind]
+        print(f"[bench]   {kind:<5} {s['pairs']:>9,} pairs from {s['blocks']:>8,} blocks, "
+              f"{s['skipped']:,} blocks over {school_dedup.MAX_BLOCK} skipped")
+
+
+def bench_suite(size: int) -> None:
+    import school_cube
+    import school_data
+
+    repeat = 3 if size <= SUITE_REPEAT_LIMIT else 1
+    stream = size > SUITE_MATERIALIZE_LIMIT
+    with tempfile.TemporaryDirectory() as tmp, output_paths(tmp):
+        if stream:
+            # a list of this many records does not fit in memory: time the streamed path
+            print(f"[info] {size} records: streaming the feed and using the chunked export")
+            # the streamed stages below include generating the feed; this is that share
+            record("suite", "generate feed (stream)", size, timed(lambda: sum(1 for _ in iter_feed(size)), 1))
+            record("suite", "prepare_rows (stream)", size, timed(lambda: sum(1 for _ in schools.iter_prepare_rows(iter_feed(size))), 1))
+            record("suite", "normalize_contacts_field", size,
+                   timed(lambda: [schools.normalize_contacts_field(r["contacts"] if "contacts" in r else None)
+                                  for r in iter_feed(size)], 1))
+            schema_path = os.path.join(tmp, "schools_schema.json")
+            schools.save_schema(schools.discover_schema(iter_feed(size)), schema_path)
+            record("suite", "save_outputs_chunked", size,
+                   timed(lambda: schools.save_outputs_chunked(iter_feed(size), schools.CHUNK_SIZE, schema_path,
+                                                              write_xlsx=False), 1))
+        else:
+            records = feed_records(size)
+            body = json.dumps({"data": records}, ensure_ascii=False)
+            record("suite", "extract_records (json decode)", size,
+                   timed(lambda: schools.extract_records(json.loads(body)), repeat))
+            del body
+            raw_contacts = [schools.raw_contacts_value(r) for r in records]
+            record("suite", "normalize_contacts_field", size,
+                   timed(lambda: [schools.normalize_contacts_field(v) for v in raw_contacts], repeat))
+            record("suite", "prepare_rows", size, timed(lambda: schools.prepare_rows(records), repeat))
+            rows = schools.prepare_rows(records)
+            del records
+            record("suite", "save_outputs (no xlsx)", size,
+                   timed(lambda: schools.save_outputs(rows, write_xlsx=False), 1))
+            if size <= SUITE_XLSX_LIMIT:
+                columns = list(schools.build_frame(rows).columns)
+                record("suite", "write_xlsx_rows", size, timed(
+                    lambda: schools.write_xlsx_rows(([r.get(c) for c in columns] for r in rows), columns,
+                                                    schools.OUT_XLSX), 1))
+            del rows
+
+        import analyze_schools
+        parquet_path = schools.OUT_PARQUET if school_data.have_pyarrow() else os.path.join(tmp, "missing.parquet")
+        load = lambda: school_data.load_schools(analyze_schools.ANALYSIS_COLUMNS, parquet_path, schools.OUT_CSV)
+        record("suite", "analysis: load_schools", size, timed(load, repeat))
+        df = load()
+        record("suite", "analysis: build_cube", size, timed(lambda: school_cube.build_cube(df), repeat))
+        cube = school_cube.build_cube(df)
+
+        def queries() -> None:
+            for dim in school_cube.CUBE_DIMENSIONS[:4]:
+                school_cube.counts(cube, dim)
+            regions = school_cube.counts(cube, "regionName").head(15).index
+            school_cube.flag_rates(cube, "regionName", regions)
+            for measure in school_cube.MEASURES:
+                school_cube.total(cube, measure)
+
+        record("suite", "analysis: cube queries", size, timed(queries, repeat))
+
+
+def run_metadata() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def compare_results(baseline_path: str, threshold: float = REGRESSION_THRESHOLD) -> List[Dict[str, Any]]:
+    """Print current vs baseline per (bench, stage, size); returns the regressions."""
+    with open(baseline_path, "r", encoding="utf-8") as fh:
+        baseline = {(r["bench"], r["stage"], r["size"]): r for r in json.load(fh)["results"]}
+    regressions = []
+    for r in RESULTS:
+        base = baseline.get((r["bench"], r["stage"], r["size"]))
+        if base is None or not base["seconds"]:
+            continue
+        ratio = r["seconds"] / base["seconds"]
+        flag = ""
+        if ratio > threshold:
+            flag = "  REGRESSION"
+            regressions.append({**r, "baseline_seconds": base["seconds"], "ratio": ratio})
+        print(f"[compare] {r['stage']:<28} n={r['size']:<8} {base['seconds']:8.3f}s -> {r['seconds']:8.3f}s "
+              f"({ratio:5.2f}x){flag}")
+    return regressions
+
+
+BENCHMARKS: Dict[str, Callable[[int], None]] = {
+    "chunked": bench_chunked,
+    "cli": bench_cli,
+    "columnar": bench_columnar,
+    "compact": bench_compact,
+    "contacts": bench_contacts,
+    "database": bench_database,
+    "dedup": bench_dedup,
+    "grid": bench_grid,
+    "images": bench_images,
+    "incremental": bench_incremental,
+    "prepare_rows": bench_prepare_rows,
+    "paginate": bench_paginate,
+    "parallel": bench_parallel,
+    "quality": bench_quality,
+    "search": bench_search,
+    "snapshots": bench_snapshots,
+    "spatial": bench_spatial,
+    "stream": bench_stream,
+    "suite": bench_suite,
+    "xlsx": bench_xlsx,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks for the schools pipeline")
+    parser.add_argument("names", nargs="*", help=f"benchmarks to run (default: all of {', '.join(sorted(BENCHMARKS))})")
+    parser.add_argument("--size", type=int, default=20000, help="number of synthetic records")
+    parser.add_argument("--sizes", type=int, nargs="+", metavar="N", help="run at each of these sizes instead (e.g. 4000 5000000)")
+    parser.add_argument("--json", metavar="PATH", help="write recorded results (suite) to this file")
+    parser.add_argument("--compare", metavar="PATH", help="compare recorded results with an earlier --json file")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="slowdown ratio reported as a regression by --compare (exit status 1)")
+    args = parser.parse_args()
+    unknown = [n for n in args.names if n not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(unknown)}")
+    for size in args.sizes or [args.size]:
+        for name in args.names or sorted(BENCHMARKS):
+            print(f"[info] Running {name} with {size} records...")
+            BENCHMARKS[name](size)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump({"meta": run_metadata(), "results": RESULTS}, fh, ensure_ascii=False, indent=2)
+        print(f"[ok] {len(RESULTS)} result(s) -> {args.json}")
+    if args.compare:
+        regressions = compare_results(args.compare, args.threshold)
+        if regressions:
+            print(f"[warn] {len(regressions)} stage(s) slower than {args.threshold:.2f}x the baseline")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
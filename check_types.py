@@ -1,13 +1,7 @@
-import pandas as pd
+# Kept for existing habits: equivalent to `python school_cli.py stats --by schoolType`
 import sys
-import io
 
-# Set UTF-8 encoding for console output
-if sys.platform == 'win32':
-    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+import school_cli
 
-df = pd.read_csv('schools.csv')
-
-print('School Type counts:')
-print(df['schoolType'].value_counts())
-print(f'\nTotal unique types: {df["schoolType"].nunique()}')
+if __name__ == '__main__':
+    school_cli.main(['stats', '--by', 'schoolType'] + sys.argv[1:])
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+pipeline_metrics.py
+
+Per-stage instrumentation for schools.py.
+
+A run (start_run / finish_run) records every `stage(...)` block with its
+wall time, CPU time and peak resident memory, plus any counters the stage
+adds (bytes fetched, retries, records, ...). Code deeper in the pipeline
+adds counters with count(); both are no-ops when no run is active, so
+library callers pay nothing. Each thread keeps its own stack of open stages,
+so a count lands in the calling thread's innermost stage; pool threads with
+no stage of their own (page downloads, image fetches) count towards the
+innermost stage of the thread that started the run.
+
+Peak memory is the highest RSS seen by a background sampler while the stage
+was open (Linux /proc; elsewhere the process high-water mark). Stages that
+overlap (the CSV and the XLSX written in parallel) each see the combined
+footprint; their CPU time is taken per thread.
+
+With a profile directory, hot stages (PROFILED_STAGES) are also run under
+cProfile and a tracemalloc snapshot is taken at their end:
+
+ - <dir>/<stage>.pstats      (python -m pstats <file>)
+ - <dir>/<stage>.tracemalloc (tracemalloc.Snapshot.load)
+
+Outputs:
+ - run_report.json
+ - Prometheus text exposition (optional)
+"""
+
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from contextlib import contextmanager
+from datetime import datetime, timezone
+import cProfile
+import json
+import os
+import re
+import sys
+import threading
+import time
+import tracemalloc
+
+RUN_REPORT = "run_report.json"
+PROFILE_DIR = "profiles"
+PROFILED_STAGES = ("extract_records", "prepare_rows", "contacts", "csv", "xlsx", "parquet", "export_chunked")
+RSS_SAMPLE_INTERVAL = 0.01
+METRIC_PREFIX = "schools"
+
+CURRENT: Optional[Dict[str, Any]] = None
+LOCK = threading.Lock()
+THREAD_STAGES = threading.local()
+
+
+def rss_bytes() -> Optional[int]:
+    """Current resident set size, or the process high-water mark where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm", "rb") as fh:
+            return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def thread_stages() -> List[Dict[str, Any]]:
+    """The calling thread's open stages, innermost last."""
+    try:
+        return THREAD_STAGES.open
+    except AttributeError:
+        THREAD_STAGES.open = []
+        return THREAD_STAGES.open
+
+
+def sample_rss(run: Dict[str, Any]) -> None:
+    rss = rss_bytes()
+    if rss is None:
+        return
+    with LOCK:
+        for rec in run["open"]:
+            if rss > (rec["peak_rss_bytes"] or 0):
+                rec["peak_rss_bytes"] = rss
+
+
+def sampler(run: Dict[str, Any]) -> None:
+    while not run["done"].wait(RSS_SAMPLE_INTERVAL):
+        sample_rss(run)
+
+
+def start_run(profile_dir: Optional[str] = None) -> Dict[str, Any]:
+    """Begin collecting stages; with `profile_dir`, hot stages are profiled into it."""
+    global CURRENT
+    run: Dict[str, Any] = {
+        "started": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "argv": sys.argv[1:],
+        "stages": [],
+        "open": [],
+        "owner_open": thread_stages(),
+        "counters": {},
+        "profile_dir": profile_dir,
+        "wall0": time.perf_counter(),
+        "cpu0": time.process_time(),
+        "done": threading.Event(),
+    }
+    if profile_dir:
+        os.makedirs(profile_dir, exist_ok=True)
+        tracemalloc.start()
+    threading.Thread(target=sampler, args=(run,), name="rss-sampler", daemon=True).start()
+    CURRENT = run
+    return run
+
+
+def count(name: str, value: float = 1) -> None:
+    """Add to a counter on the calling thread's innermost open stage (see module docstring)."""
+    run = CURRENT
+    if run is None:
+        return
+    own = thread_stages()
+    with LOCK:
+        open_stages = own or run["owner_open"]
+        counters = open_stages[-1]["counters"] if open_stages else run["counters"]
+        counters[name] = counters.get(name, 0) + value
+
+
+def clock() -> Tuple[float, float]:
+    return time.perf_counter(), time.process_time()
+
+
+def add_elapsed(prefix: str, started: Tuple[float, float]) -> None:
+    """Accumulate <prefix>_wall_seconds / <prefix>_cpu_seconds since `started` (from clock())."""
+    wall, cpu = clock()
+    count(f"{prefix}_wall_seconds", wall - started[0])
+    count(f"{prefix}_cpu_seconds", cpu - started[1])
+
+
+@contextmanager
+def stage(name: str, per_thread: bool = False, **counters: float) -> Iterator[Dict[str, float]]:
+    """
+    Time the enclosed block as stage `name`; yields its counters dict.
+    per_thread=True measures CPU of the calling thread only (for stages run
+    alongside others).
+    """
+    run = CURRENT
+    if run is None:
+        yield dict(counters)
+        return
+    rec: Dict[str, Any] = {"name": name, "counters": dict(counters), "peak_rss_bytes": rss_bytes()}
+    cpu_clock = time.thread_time if per_thread else time.process_time
+    profiler = None
+    if run["profile_dir"] and name in PROFILED_STAGES:
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # another profiler is already active (overlapping stage)
+            profiler = None
+    if run["profile_dir"] and tracemalloc.is_tracing():
+        tracemalloc.reset_peak()
+    own = thread_stages()
+    with LOCK:
+        run["stages"].append(rec)
+        run["open"].append(rec)
+        own.append(rec)
+    wall0, cpu0 = time.perf_counter(), cpu_clock()
+    try:
+        yield rec["counters"]
+        rec["status"] = "ok"
+    except BaseException:
+        rec["status"] = "failed"
+        raise
+    finally:
+        rec["wall_seconds"] = time.perf_counter() - wall0
+        rec["cpu_seconds"] = cpu_clock() - cpu0
+        sample_rss(run)
+        with LOCK:
+            run["open"].remove(rec)
+            own.remove(rec)
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(os.path.join(run["profile_dir"], f"{name}.pstats"))
+        if run["profile_dir"] and tracemalloc.is_tracing():
+            rec["peak_traced_bytes"] = tracemalloc.get_traced_memory()[1]
+            if name in PROFILED_STAGES:
+                tracemalloc.take_snapshot().dump(os.path.join(run["profile_dir"], f"{name}.tracemalloc"))
+
+
+def stage_report(rec: Dict[str, Any]) -> Dict[str, Any]:
+    out = {k: v for k, v in rec.items() if k != "counters"}
+    out.update(rec["counters"])
+    wall = rec.get("wall_seconds") or 0
+    for key in ("records", "rows", "bytes"):
+        if key in rec["counters"] and wall > 0:
+            out[f"{key}_per_second"] = rec["counters"][key] / wall
+    return out
+
+
+def build_report(run: Dict[str, Any], status: str) -> Dict[str, Any]:
+    return {
+        "started": run["started"],
+        "argv": run["argv"],
+        "status": status,
+        "wall_seconds": time.perf_counter() - run["wall0"],
+        "cpu_seconds": time.process_time() - run["cpu0"],
+        "peak_rss_bytes": max((r["peak_rss_bytes"] or 0 for r in run["stages"]), default=rss_bytes()),
+        "counters": run["counters"],
+        "stages": [stage_report(r) for r in run["stages"]],
+    }
+
+
+def metric_name(name: str) -> str:
+    return re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+def prometheus_text(report: Dict[str, Any]) -> str:
+    """Prometheus text exposition: one gauge family per stage measurement, labelled by stage."""
+    families: Dict[str, List[str]] = {}
+    for rec in report["stages"]:
+        for key, value in rec.items():
+            if key in ("name", "status") or not isinstance(value, (int, float)) or isinstance(value, bool):
+                continue
+            families.setdefault(f"{METRIC_PREFIX}_stage_{metric_name(key)}", []).append(
+                f'{{stage="{rec["name"]}"}} {value:g}' if isinstance(value, float) else f'{{stage="{rec["name"]}"}} {value}')
+    lines = []
+    for key in ("wall_seconds", "cpu_seconds", "peak_rss_bytes"):
+        name = f"{METRIC_PREFIX}_run_{key}"
+        lines += [f"# TYPE {name} gauge", f"{name} {report[key] or 0:g}"]
+    name = f"{METRIC_PREFIX}_run_success"
+    lines += [f"# TYPE {name} gauge", f"{name} {int(report['status'] == 'ok')}"]
+    for name, samples in families.items():
+        lines.append(f"# TYPE {name} gauge")
+        lines += [name + sample for sample in samples]
+    return "\n".join(lines) + "\n"
+
+
+def print_summary(report: Dict[str, Any]) -> None:
+    for rec in report["stages"]:
+        peak = rec.get("peak_rss_bytes")
+        extra = f"  {rec['records_per_second']:,.0f} rec/s" if "records_per_second" in rec else ""
+        print(f"[info] stage {rec['name']:<16} {rec['wall_seconds']:8.3f}s wall {rec['cpu_seconds']:8.3f}s cpu"
+              + (f"  peak RSS {peak / 1e6:7.1f} MB" if peak else "") + extra)
+
+
+def finish_run(report_path: Optional[str] = RUN_REPORT, prometheus_path: Optional[str] = None,
+               status: str = "ok") -> Optional[Dict[str, Any]]:
+    """Stop collecting and write the JSON report (and Prometheus text when a path is given)."""
+    global CURRENT
+    run = CURRENT
+    if run is None:
+        return None
+    CURRENT = None
+    run["done"].set()
+    report = build_report(run, status)
+    if run["profile_dir"] and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    print_summary(report)
+    if report_path:
+        with open(report_path, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, ensure_ascii=False, indent=2)
+        print(f"[ok] Run report -> {report_path}")
+    if prometheus_path:
+        with open(prometheus_path, "w", encoding="utf-8") as fh:
+            fh.write(prometheus_text(report))
+        print(f"[ok] Prometheus metrics -> {prometheus_path}")
+    if run["profile_dir"]:
+        print(f"[ok] Profiles -> {run['profile_dir']}/")
+    return report
@@ -0,0 +1,106 @@
+"""
+response_cache.py
+
+On-disk HTTP response cache used by schools.fetch_json.
+
+Each URL maps to two files in the cache directory:
+ - <sha1(url)>.json.gz    response body, gzip-compressed
+ - <sha1(url)>.meta.json  ETag / Last-Modified validators and fetch time
+
+Entries younger than the TTL are served without a request; older ones are
+revalidated with If-None-Match / If-Modified-Since. The directory is kept
+under a byte budget by evicting the least recently used bodies.
+"""
+
+from typing import Any, Dict, Optional, Tuple
+import gzip
+import hashlib
+import json
+import os
+import time
+
+CACHE_DIR = ".http_cache"
+CACHE_TTL = 3600
+CACHE_MAX_BYTES = 200 * 1024 * 1024
+
+
+def entry_paths(cache_dir: str, url: str) -> Tuple[str, str]:
+    name = hashlib.sha1(url.encode("utf-8")).hexdigest()
+    return os.path.join(cache_dir, f"{name}.json.gz"), os.path.join(cache_dir, f"{name}.meta.json")
+
+
+def load_entry(cache_dir: str, url: str) -> Optional[Tuple[Dict[str, Any], bytes]]:
+    body_path, meta_path = entry_paths(cache_dir, url)
+    try:
+        with open(meta_path, encoding="utf-8") as fh:
+            meta = json.load(fh)
+        with gzip.open(body_path, "rb") as fh:
+            body = fh.read()
+    except (OSError, ValueError):
+        return None
+    os.utime(body_path)  # recency for eviction
+    return meta, body
+
+
+def is_fresh(meta: Dict[str, Any], ttl: float = CACHE_TTL) -> bool:
+    return time.time() - meta.get("fetched_at", 0) < ttl
+
+
+def conditional_headers(meta: Dict[str, Any]) -> Dict[str, str]:
+    headers = {}
+    if meta.get("etag"):
+        headers["If-None-Match"] = meta["etag"]
+    if meta.get("last_modified"):
+        headers["If-Modified-Since"] = meta["last_modified"]
+    return headers
+
+
+def write_atomic(path: str, data: bytes) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as fh:
+        fh.write(data)
+    os.replace(tmp, path)
+
+
+def store_entry(cache_dir: str, url: str, body: bytes, headers: Any, max_bytes: int = CACHE_MAX_BYTES) -> None:
+    os.makedirs(cache_dir, exist_ok=True)
+    body_path, meta_path = entry_paths(cache_dir, url)
+    write_atomic(body_path, gzip.compress(body, compresslevel=6))
+    meta = {
+        "url": url,
+        "etag": headers.get("ETag"),
+        "last_modified": headers.get("Last-Modified"),
+        "fetched_at": time.time(),
+        "size": len(body),
+    }
+    write_atomic(meta_path, json.dumps(meta, ensure_ascii=False).encode("utf-8"))
+    evict(cache_dir, max_bytes, keep=body_path)
+
+
+def touch_entry(cache_dir: str, url: str, meta: Dict[str, Any]) -> None:
+    """Record a successful revalidation (304) so the TTL starts over."""
+    _, meta_path = entry_paths(cache_dir, url)
+    meta = dict(meta, fetched_at=time.time())
+    write_atomic(meta_path, json.dumps(meta, ensure_ascii=False).encode("utf-8"))
+
+
+def evict(cache_dir: str, max_bytes: int = CACHE_MAX_BYTES, keep: Optional[str] = None) -> None:
+    """Drop least recently used entries (by body mtime) until under max_bytes."""
+    bodies = []
+    for name in os.listdir(cache_dir):
+        if name.endswith(".json.gz"):
+            path = os.path.join(cache_dir, name)
+            st = os.stat(path)
+            bodies.append((st.st_mtime, st.st_size, path))
+    total = sum(size for _, size, _ in bodies)
+    for _, size, path in sorted(bodies):
+        if total <= max_bytes:
+            break
+        if path == keep:
+            continue
+        for victim in (path, path[: -len(".json.gz")] + ".meta.json"):
+            try:
+                os.remove(victim)
+            except OSError:
+                pass
+        total -= size
@@ -0,0 +1,349 @@
+"""
+school_charts.py
+
+Chart registry for analyze_schools.py.
+
+Each chart is a render function of a small, picklable input built from the
+aggregation cube (see school_cube.py) plus the style parameters it was
+registered with. render_charts draws them in a process pool with the Agg
+backend and keys every PNG by a hash of (input, style, render source); a
+chart whose key matches the one recorded in charts/.chart_cache.json and
+whose file still exists is skipped.
+"""
+
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import inspect
+import json
+import os
+
+CHART_DIR = "charts"
+CACHE_FILE = ".chart_cache.json"
+DPI = 300
+
+CHARTS: Dict[str, Dict[str, Any]] = {}
+
+
+def chart(chart_id: str, filename: str, **style: Any) -> Callable:
+    """Register a render function under `chart_id` (e.g. "02")."""
+    def register(fn: Callable) -> Callable:
+        CHARTS[chart_id] = {"file": filename, "render": fn, "style": dict(style, dpi=DPI)}
+        return fn
+    return register
+
+
+def chart_key(chart_id: str, data: Any) -> str:
+    spec = CHARTS[chart_id]
+    payload = json.dumps({
+        "id": chart_id,
+        "file": spec["file"],
+        "style": spec["style"],
+        "source": inspect.getsource(spec["render"]),
+        "data": data,
+    }, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def setup_matplotlib():
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    sns.set_style("whitegrid")
+    plt.rcParams['figure.figsize'] = (12, 8)
+    plt.rcParams['font.size'] = 10
+    return plt
+
+
+def render_one(chart_id: str, data: Any, path: str) -> str:
+    """Worker entry point: draw one chart to `path`."""
+    plt = setup_matplotlib()
+    spec = CHARTS[chart_id]
+    spec["render"](plt, data, spec["style"])
+    plt.tight_layout()
+    plt.savefig(path, dpi=spec["style"]["dpi"], bbox_inches='tight')
+    plt.close('all')
+    return path
+
+
+def load_cache(chart_dir: str) -> Dict[str, str]:
+    try:
+        with open(os.path.join(chart_dir, CACHE_FILE), encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_cache(chart_dir: str, cache: Dict[str, str]) -> None:
+    with open(os.path.join(chart_dir, CACHE_FILE), "w", encoding="utf-8") as fh:
+        json.dump(cache, fh, indent=2, sort_keys=True)
+
+
+def render_charts(inputs: Dict[str, Any], only: Optional[Iterable[str]] = None, force: bool = False,
+                  workers: Optional[int] = None, chart_dir: str = CHART_DIR) -> Dict[str, str]:
+    """
+    Render the registered charts present in `inputs` (restricted to `only`).
+    Returns chart id -> "rendered" | "cached".
+    """
+    os.makedirs(chart_dir, exist_ok=True)
+    wanted: List[str] = sorted(only) if only else sorted(inputs)
+    unknown = [c for c in wanted if c not in CHARTS or c not in inputs]
+    if unknown:
+        raise ValueError(f"Unknown chart id(s): {', '.join(unknown)}; available: {', '.join(sorted(CHARTS))}")
+    cache = load_cache(chart_dir)
+    status: Dict[str, str] = {}
+    jobs = {}
+    for chart_id in wanted:
+        path = os.path.join(chart_dir, CHARTS[chart_id]["file"])
+        key = chart_key(chart_id, inputs[chart_id])
+        if not force and cache.get(chart_id) == key and os.path.exists(path):
+            status[chart_id] = "cached"
+            print(f"[SKIP] Chart unchanged: {path}")
+            continue
+        jobs[chart_id] = (key, path)
+    if jobs:
+        with ProcessPoolExecutor(max_workers=workers or min(len(jobs), os.cpu_count() or 1)) as pool:
+            futures = {chart_id: pool.submit(render_one, chart_id, inputs[chart_id], path)
+                       for chart_id, (_, path) in jobs.items()}
+            for chart_id, fut in futures.items():
+                print(f"[DONE] Chart saved: {fut.result()}")
+                cache[chart_id] = jobs[chart_id][0]
+                status[chart_id] = "rendered"
+        save_cache(chart_dir, cache)
+    return status
+
+
+@chart("01", "01_schools_by_region.png", color='#2E86AB', figsize=(14, 10))
+def render_schools_by_region(plt, data, style):
+    labels, values = data["labels"], data["values"]
+    fig, ax = plt.subplots(figsize=style["figsize"])
+    ax.barh(range(len(values)), values, color=style["color"])
+    ax.set_yticks(range(len(values)))
+    ax.set_yticklabels(labels, fontsize=11)
+    ax.set_xlabel('Number of Schools', fontsize=12, fontweight='bold')
+    ax.set_title('Top 20 Regions by Number of Schools', fontsize=14, fontweight='bold', pad=20)
+    ax.invert_yaxis()
+
+    # Add value labels on bars
+    for i, value in enumerate(values):
+        ax.text(value + 5, i, str(value), va='center', fontsize=10, fontweight='bold')
+
+
+@chart("02", "02_schools_by_type.png", palette="Set2", figsize=(14, 10))
+def render_schools_by_type(plt, data, style):
+    import seaborn as sns
+    labels, values, total = data["labels"], data["values"], data["total"]
+    fig, ax = plt.subplots(figsize=style["figsize"])
+    colors = sns.color_palette(style["palette"], len(values))
+
+    # Create horizontal bars
+    ax.barh(range(len(values)), values, color=colors)
+    ax.set_yticks(range(len(values)))
+    ax.set_yticklabels(labels, fontsize=12)
+    ax.set_xlabel('Number of Schools', fontsize=13, fontweight='bold')
+    ax.set_title('Distribution of Schools by Type', fontsize=15, fontweight='bold', pad=20)
+    ax.invert_yaxis()
+
+    # Add value labels and percentages on bars
+    for i, value in enumerate(values):
+        percentage = (value / total) * 100
+        # Position label at the end of bar
+        ax.text(value + 30, i, f'{value} ({percentage:.1f}%)',
+                va='center', fontsize=11, fontweight='bold')
+
+    # Add grid for better readability
+    ax.xaxis.grid(True, linestyle='--', alpha=0.7)
+    ax.set_axisbelow(True)
+
+
+@chart("03", "03_schools_by_kind.png", color='#06A77D', figsize=(12, 8))
+def render_schools_by_kind(plt, data, style):
+    labels, values = data["labels"], data["values"]
+    fig, ax = plt.subplots(figsize=style["figsize"])
+    ax.bar(range(len(values)), values, color=style["color"])
+    ax.set_xticks(range(len(values)))
+    ax.set_xticklabels(labels, rotation=45, ha='right', fontsize=11)
+    ax.set_ylabel('Number of Schools', fontsize=12, fontweight='bold')
+    ax.set_title('Distribution by School Kind (Education Level)', fontsize=14, fontweight='bold', pad=20)
+
+    # Add value labels on bars
+    for i, value in enumerate(values):
+        ax.text(i, value + 10, str(value), ha='center', va='bottom', fontsize=11, fontweight='bold')
+
+
+@chart("04", "04_digital_adoption.png", colors=['#2E86AB', '#A23B72', '#F18F01', '#C73E1D'],
+       enabled='#06A77D', disabled='#D62839', figsize=(16, 7))
+def render_digital_adoption(plt, data, style):
+    import numpy as np
+    features, comparison = data["features"], data["comparison"]
+    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=style["figsize"])
+
+    # Pie chart for digital features
+    wedges, texts, autotexts = ax1.pie(list(features.values()),
+                                       labels=list(features.keys()),
+                                       autopct='%1.1f%%',
+                                       colors=style["colors"],
+                                       startangle=90,
+                                       textprops={'fontsize': 10})
+    for autotext in autotexts:
+        autotext.set_color('white')
+        autotext.set_fontweight('bold')
+
+    ax1.set_title('Digital Features Adoption Overview', fontsize=13, fontweight='bold')
+
+    # Bar chart comparison
+    x = np.arange(len(comparison))
+    width = 0.35
+
+    bars1 = ax2.bar(x - width/2, [comparison['Has E-Journal'][0], comparison['Has Online Meetings'][0]],
+                    width, label='Enabled', color=style["enabled"])
+    bars2 = ax2.bar(x + width/2, [comparison['Has E-Journal'][1], comparison['Has Online Meetings'][1]],
+                    width, label='Disabled', color=style["disabled"])
+
+    ax2.set_ylabel('Number of Schools', fontsize=11, fontweight='bold')
+    ax2.set_title('Digital Features: Enabled vs Disabled', fontsize=13, fontweight='bold')
+    ax2.set_xticks(x)
+    ax2.set_xticklabels(['E-Journal', 'Online Meetings'])
+    ax2.legend()
+
+    # Add value labels
+    for bars in [bars1, bars2]:
+        for bar in bars:
+            height = bar.get_height()
+            ax2.text(bar.get_x() + bar.get_width()/2., height,
+                     f'{int(height)}',
+                     ha='center', va='bottom', fontsize=10, fontweight='bold')
+
+
+@chart("05", "05_geographic_distribution.png", density_cmap='YlOrRd', cmap='RdYlGn', figsize=(20, 8),
+       scatter_figsize=(14, 10))
+def render_geographic_distribution(plt, data, style):
+    import math
+    import numpy as np
+    from matplotlib.colors import LogNorm
+
+    if "lat" in data:
+        # Few points (school_grid.SCATTER_MAX_POINTS): scattering them is cheaper than the grid
+        fig, ax = plt.subplots(figsize=style["scatter_figsize"])
+        scatter = ax.scatter(data["lng"], data["lat"], c=data["hasJurnal"], cmap=style["cmap"],
+                             alpha=0.6, s=50, edgecolors='black', linewidth=0.5)
+        ax.set_xlabel('Longitude', fontsize=12, fontweight='bold')
+        ax.set_ylabel('Latitude', fontsize=12, fontweight='bold')
+        ax.set_title(f'Geographic Distribution of Schools (n={data["points"]})\nColored by E-Journal Adoption',
+                     fontsize=14, fontweight='bold', pad=20)
+        cbar = plt.colorbar(scatter, ax=ax)
+        cbar.set_label('Has E-Journal', fontsize=11, fontweight='bold')
+        cbar.set_ticks([0, 1])
+        cbar.set_ticklabels(['No', 'Yes'])
+        return
+
+    # Cells of school_grid.py, not points: the cost depends on the grid size only
+    extent = data["extent"]
+    aspect = 1 / math.cos(math.radians((extent[2] + extent[3]) / 2))
+    density = np.ma.masked_equal(np.asarray(data["density"]["counts"]), 0)
+    counts = np.asarray(data["adoption"]["counts"])
+    journal = np.ma.masked_where(counts == 0, np.asarray(data["adoption"]["hasJurnal"]) / np.maximum(counts, 1) * 100)
+    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=style["figsize"])
+
+    image = ax1.imshow(density, origin='lower', extent=extent, aspect=aspect, cmap=style["density_cmap"],
+                       norm=LogNorm(vmin=1, vmax=max(int(density.max() or 1), 2)), interpolation='nearest')
+    ax1.set_title(f'Schools per {data["density"]["cell"]:g}° Cell (n={data["points"]})',
+                  fontsize=13, fontweight='bold')
+    cbar = plt.colorbar(image, ax=ax1, shrink=0.8)
+    cbar.set_label('Schools (log scale)', fontsize=11, fontweight='bold')
+
+    image = ax2.imshow(journal, origin='lower', extent=extent, aspect=aspect, cmap=style["cmap"],
+                       vmin=0, vmax=100, interpolation='nearest')
+    ax2.set_title(f'E-Journal Adoption per {data["adoption"]["cell"]:g}° Cell', fontsize=13, fontweight='bold')
+    cbar = plt.colorbar(image, ax=ax2, shrink=0.8)
+    cbar.set_label('Schools with E-Journal (%)', fontsize=11, fontweight='bold')
+
+    for ax in (ax1, ax2):
+        ax.set_xlabel('Longitude', fontsize=12, fontweight='bold')
+        ax.set_ylabel('Latitude', fontsize=12, fontweight='bold')
+        ax.grid(True, alpha=0.3)
+    fig.suptitle('Geographic Distribution of Schools', fontsize=14, fontweight='bold')
+
+
+@chart("06", "06_contact_completeness.png", colors=['#2E86AB', '#06A77D', '#F18F01', '#A23B72', '#D62839'],
+       figsize=(12, 8))
+def render_contact_completeness(plt, data, style):
+    categories, values, total = data["labels"], data["values"], data["total"]
+    fig, ax = plt.subplots(figsize=style["figsize"])
+    bars = ax.barh(categories, values, color=style["colors"])
+    ax.set_xlabel('Number of Schools', fontsize=12, fontweight='bold')
+    ax.set_title('Contact Information Completeness', fontsize=14, fontweight='bold', pad=20)
+
+    # Add value labels and percentages
+    for bar, value in zip(bars, values):
+        percentage = (value / total) * 100
+        ax.text(value + 20, bar.get_y() + bar.get_height()/2,
+                f'{value} ({percentage:.1f}%)',
+                va='center', fontsize=11, fontweight='bold')
+
+
+@chart("07", "07_regional_digital_adoption.png", journal='#2E86AB', meeting='#F18F01', figsize=(14, 10))
+def render_regional_digital_adoption(plt, data, style):
+    import numpy as np
+    regions = data["regions"]
+    fig, ax = plt.subplots(figsize=style["figsize"])
+
+    x = np.arange(len(regions))
+    width = 0.35
+
+    ax.bar(x - width/2, data["journal"], width, label='E-Journal Adoption %', color=style["journal"])
+    ax.bar(x + width/2, data["meeting"], width, label='Online Meeting Adoption %', color=style["meeting"])
+
+    ax.set_ylabel('Adoption Rate (%)', fontsize=12, fontweight='bold')
+    ax.set_xlabel('Region', fontsize=12, fontweight='bold')
+    ax.set_title('Digital Features Adoption by Top 15 Regions', fontsize=14, fontweight='bold', pad=20)
+    ax.set_xticks(x)
+    ax.set_xticklabels(regions, rotation=45, ha='right', fontsize=10)
+    ax.legend(fontsize=11)
+    ax.set_ylim(0, 105)
+
+    # Add grid for better readability
+    ax.yaxis.grid(True, linestyle='--', alpha=0.7)
+    ax.set_axisbelow(True)
+
+
+@chart("08", "08_administrative_subjection.png", palette="Set2", figsize=(14, 10))
+def render_administrative_subjection(plt, data, style):
+    import seaborn as sns
+    labels, values, total = data["labels"], data["values"], data["total"]
+    fig, ax = plt.subplots(figsize=style["figsize"])
+    colors = sns.color_palette(style["palette"], len(values))
+    ax.barh(range(len(values)), values, color=colors)
+    ax.set_yticks(range(len(values)))
+    ax.set_yticklabels(labels, fontsize=11)
+    ax.set_xlabel('Number of Schools', fontsize=12, fontweight='bold')
+    ax.set_title('Schools by Administrative Subjection', fontsize=14, fontweight='bold', pad=20)
+    ax.invert_yaxis()
+
+    # Add value labels
+    for i, value in enumerate(values):
+        percentage = (value / total) * 100
+        ax.text(value + 10, i, f'{value} ({percentage:.1f}%)',
+                va='center', fontsize=10, fontweight='bold')
+
+
+@chart("09", "09_adoption_over_time.png", colors=['#2E86AB', '#F18F01', '#06A77D', '#A23B72'], figsize=(14, 8))
+def render_adoption_over_time(plt, data, style):
+    labels = [t[:10] for t in data["taken_at"]]
+    fig, ax = plt.subplots(figsize=style["figsize"])
+    x = range(len(labels))
+    series = [('E-Journal', data["journal"]), ('Online Meeting', data["meeting"]),
+              ('Has Email', data["email"]), ('Has Phone', data["phone"])]
+    for (label, values), color in zip(series, style["colors"]):
+        ax.plot(x, values, marker='o', linewidth=2, label=label, color=color)
+
+    ax.set_ylabel('Schools (%)', fontsize=12, fontweight='bold')
+    ax.set_xlabel('Snapshot', fontsize=12, fontweight='bold')
+    ax.set_title('Digital Adoption and Contact Completeness Over Time', fontsize=14, fontweight='bold', pad=20)
+    ax.set_xticks(list(x))
+    ax.set_xticklabels(labels, rotation=45, ha='right', fontsize=10)
+    ax.set_ylim(0, 105)
+    ax.legend(fontsize=11)
+    ax.yaxis.grid(True, linestyle='--', alpha=0.7)
+    ax.set_axisbelow(True)
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+school_cli.py
+
+One entry point for the scraper and the analysis scripts.
+
+Subcommands import what they need when they run, so the quick ones stay
+quick:
+ - scrape   fetch the API and write the export (schools.py; requests,
+            pandas once rows are built)
+ - export   rebuild the export from the cached response, no network
+            (schools.py --offline); --xlsx-only etc. pass through
+ - analyze  statistics and every chart (analyze_schools.py; pandas,
+            matplotlib in the render workers)
+ - chart    re-render the given charts (analyze_schools.py --only)
+ - stats    totals and value counts from schools_summary.json (json only;
+            see school_summary.py)
+ - images   download the school photos and thumbnails (school_images.py)
+ - db       build or query the SQLite copy of the export (school_db.py;
+            sqlite3, pandas for build)
+ - grid     busiest cells of the coordinate density grid (school_grid.py;
+            numpy, pandas only when the grid is rebuilt)
+ - dedup    cluster likely duplicate school records (school_dedup.py;
+            numpy, pandas)
+
+Arguments after scrape / export / analyze / chart / images / db / grid / dedup are
+handed to the underlying script unchanged (`python school_cli.py scrape --help`).
+
+Usage:
+ python school_cli.py scrape --cache --snapshot
+ python school_cli.py export --xlsx-only
+ python school_cli.py analyze
+ python school_cli.py chart 02 07 --force
+ python school_cli.py stats
+ python school_cli.py stats --by schoolType
+ python school_cli.py images --workers 16
+ python school_cli.py db query "SELECT * FROM chart_02_types"
+ python school_cli.py grid --cell 0.1 --top 5
+ python school_cli.py dedup --threshold 0.95
+"""
+
+from typing import Any, Dict, List, Optional, Sequence
+import argparse
+import sys
+
+DIMENSION_LABELS: Dict[str, str] = {
+    "regionName": "Region",
+    "schoolType": "School Type",
+    "schoolKind": "School Kind",
+    "subjection": "Subjection",
+}
+TOTAL_LABELS: Dict[str, str] = {
+    "hasJurnal": "E-journal",
+    "hasMeeting": "Online meeting",
+    "has_coords": "Coordinates",
+    "has_email": "Email",
+    "has_phone": "Phone",
+    "has_site": "Website",
+    "has_all_contacts": "Email + phone + website",
+    "missing_contacts": "Missing email or phone",
+}
+
+
+def run_scrape(args: List[str]) -> None:
+    import schools
+
+    schools.main(args)
+
+
+def run_export(args: List[str]) -> None:
+    import schools
+
+    schools.main(args if "--xlsx-only" in args else ["--offline", *args])
+
+
+def run_analyze(args: List[str]) -> None:
+    import analyze_schools
+
+    analyze_schools.main(args)
+
+
+def run_chart(args: List[str]) -> None:
+    import analyze_schools
+
+    ids = [a for a in args if not a.startswith("-")]
+    options = [a for a in args if a.startswith("-")]
+    analyze_schools.main((["--only", *ids] if ids else []) + options)
+
+
+def run_images(args: List[str]) -> None:
+    import school_images
+
+    school_images.main(args)
+
+
+def run_db(args: List[str]) -> None:
+    import school_db
+
+    school_db.main(args)
+
+
+def run_grid(args: List[str]) -> None:
+    import school_grid
+
+    school_grid.main(args)
+
+
+def run_dedup(args: List[str]) -> None:
+    import school_dedup
+
+    school_dedup.main(args)
+
+
+def print_stats(summary: Dict[str, Any], by: Optional[str] = None, top: Optional[int] = None) -> None:
+    total = summary["total"]
+    if by:
+        label = DIMENSION_LABELS.get(by, by)
+        counts = summary["counts"][by]
+        print(f"{label} counts:")
+        width = max((len(k) for k, _ in counts[:top]), default=0)
+        for key, n in counts[:top]:
+            print(f"  {key:<{width}}  {n:>6}  ({n / total * 100:5.1f}%)")
+        print(f"\nTotal unique {label.lower()}s: {len(counts)}")
+        return
+    print(f"Total number of schools: {total}")
+    for dim, label in DIMENSION_LABELS.items():
+        if dim in summary["counts"]:
+            print(f"Number of unique {label.lower()}s: {len(summary['counts'][dim])}")
+    print()
+    for key, label in TOTAL_LABELS.items():
+        n = summary["totals"].get(key, 0)
+        print(f"  {label:<24} {n:>6}  ({n / total * 100 if total else 0:5.1f}%)")
+    print(f"\n(summary generated {summary['generated_at']})")
+
+
+def run_stats(args: List[str]) -> None:
+    import school_summary
+
+    parser = argparse.ArgumentParser(prog="school_cli.py stats", description="Totals and value counts of the export")
+    parser.add_argument("--by", choices=sorted(DIMENSION_LABELS), help="value counts of this column")
+    parser.add_argument("--top", type=int, default=None, help="only the N most frequent values")
+    parser.add_argument("--summary", default=school_summary.SUMMARY_PATH, help="summary file")
+    opts = parser.parse_args(args)
+    print_stats(school_summary.load_summary(opts.summary), opts.by, opts.top)
+
+
+COMMANDS = {
+    "scrape": (run_scrape, "fetch the API and write the export"),
+    "export": (run_export, "rebuild the export from the cached response"),
+    "analyze": (run_analyze, "print statistics and render every chart"),
+    "chart": (run_chart, "re-render the given chart ids"),
+    "stats": (run_stats, "totals and value counts from the summary file"),
+    "images": (run_images, "download school photos and make thumbnails"),
+    "db": (run_db, "build or query the SQLite copy of the export"),
+    "grid": (run_grid, "busiest cells of the coordinate density grid"),
+    "dedup": (run_dedup, "cluster likely duplicate school records"),
+}
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    argv = list(sys.argv[1:] if argv is None else argv)
+    if not argv or argv[0] not in COMMANDS:
+        print("usage: school_cli.py {" + ",".join(COMMANDS) + "} [args...]\n")
+        for name, (_, help_text) in COMMANDS.items():
+            print(f"  {name:<8} {help_text}")
+        sys.exit(0 if argv and argv[0] in ("-h", "--help") else 2)
+    if sys.platform == "win32":
+        import io
+
+        sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding="utf-8")
+    COMMANDS[argv[0]][0](argv[1:])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""
+school_columns.py
+
+Column-oriented row builder for schools.py.
+
+prepare_rows returns one dict per school (22+ keys plus flattened extras)
+and pd.DataFrame(rows) then copies all of it into columns. The builder
+here takes the rows one at a time, keeps nothing per row, and stores each
+column compactly:
+
+ - numbers in array('q') / array('d'), switching to float on the first
+   float as pandas' own inference would;
+ - flags in array('b');
+ - regionName / schoolType / schoolKind / subjection as int32 codes into a
+   table of distinct values (a pandas Categorical at the end);
+ - other strings as UTF-8 Arrow arrays, converted every FLUSH_ROWS rows;
+ - keys outside REQUESTED_COLUMNS (rare extras) as (row position, value)
+   pairs.
+
+A column holding values the typed store cannot represent falls back to a
+plain list. builder_frame hands the arrays to pandas without copying the
+numeric buffers; apart from the categorical columns the frame has the
+dtypes pd.DataFrame(rows) would give it, and it writes the same CSV.
+"""
+
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+FLUSH_ROWS = 16384
+CATEGORY_COLUMNS: Sequence[str] = ("regionName", "schoolType", "schoolKind", "subjection")
+MAX_EXACT_FLOAT_INT = 2 ** 53
+MISSING = float("nan")
+
+
+def new_builder(columns: Sequence[str]) -> Dict[str, Any]:
+    """Builder for rows whose dense columns are `columns`; other keys go to the sparse store."""
+    return {"n": 0, "columns": list(columns), "dense": {col: None for col in columns}, "sparse": {}}
+
+
+def new_store(col: str, value: Any) -> Dict[str, Any]:
+    """A store typed after the first value seen in a dense column."""
+    if isinstance(value, bool):
+        return typed_store("bool", array("b"), bool)
+    if isinstance(value, int) and -2 ** 63 <= value < 2 ** 63:
+        return typed_store("int", array("q"), int)
+    if isinstance(value, float):
+        return typed_store("float", array("d"), float)
+    if isinstance(value, str) and col in CATEGORY_COLUMNS:
+        codes: Dict[str, int] = {}
+        data = array("i")
+
+        def push(value: str) -> None:
+            code = codes.get(value)
+            if code is None:
+                code = codes[value] = len(codes)
+            data.append(code)
+
+        return {"kind": "category", "data": data, "codes": codes, "type": str, "push": push}
+    if isinstance(value, str):
+        pending: List[str] = []
+        return {"kind": "str", "chunks": [], "pending": pending, "type": str, "push": pending.append}
+    return object_store([])
+
+
+def typed_store(kind: str, data: array, typ: type) -> Dict[str, Any]:
+    return {"kind": kind, "data": data, "type": typ, "push": data.append}
+
+
+def object_store(values: List[Any]) -> Dict[str, Any]:
+    return {"kind": "object", "data": values, "type": None, "push": values.append}
+
+
+def store_values(store: Dict[str, Any]) -> List[Any]:
+    """The Python values held by a store (used when a column falls back to a list)."""
+    kind = store["kind"]
+    if kind == "bool":
+        return [bool(v) for v in store["data"]]
+    if kind == "category":
+        categories = list(store["codes"])
+        return [categories[code] for code in store["data"]]
+    if kind == "str":
+        return [v for chunk in store["chunks"] for v in chunk.to_pylist()] + store["pending"]
+    return list(store["data"])
+
+
+def widen(store: Dict[str, Any], value: Any) -> Dict[str, Any]:
+    """The store to use once `value` does not fit: int -> float when exact, else a plain list."""
+    if store["kind"] == "int" and isinstance(value, float) and \
+            all(-MAX_EXACT_FLOAT_INT <= v <= MAX_EXACT_FLOAT_INT for v in store["data"]):
+        return typed_store("float", array("d", store["data"]), float)
+    if store["kind"] == "float" and type(value) is int and -MAX_EXACT_FLOAT_INT <= value <= MAX_EXACT_FLOAT_INT:
+        return store
+    return object_store(store_values(store))
+
+
+def flush_strings(store: Dict[str, Any]) -> None:
+    import pyarrow as pa
+
+    pending = store["pending"]
+    if pending:
+        store["chunks"].append(pa.array(pending, type=pa.string()))
+        pending.clear()
+
+
+def append_row(builder: Dict[str, Any], row: Dict[str, Any]) -> None:
+    """Add one row; it must carry every dense column (prepare_rows rows always do)."""
+    dense, sparse = builder["dense"], builder["sparse"]
+    pos = builder["n"]
+    for col, value in row.items():
+        store = dense.get(col, False)
+        if store is False:
+            entry = sparse.get(col)
+            if entry is None:
+                entry = sparse[col] = (array("q"), [])
+            entry[0].append(pos)
+            entry[1].append(value)
+            continue
+        if store is None:
+            store = dense[col] = new_store(col, value)
+        typ = store["type"]
+        if typ is None or type(value) is typ:
+            try:
+                store["push"](value)
+                continue
+            except OverflowError:
+                pass
+        store = dense[col] = widen(store, value)
+        store["push"](value)
+    builder["n"] = pos + 1
+    if builder["n"] % FLUSH_ROWS == 0:
+        for store in dense.values():
+            if store is not None and store["kind"] == "str":
+                flush_strings(store)
+
+
+def store_length(store: Dict[str, Any]) -> int:
+    if store["kind"] == "str":
+        return sum(len(chunk) for chunk in store["chunks"]) + len(store["pending"])
+    return len(store["data"])
+
+
+def build(rows: Iterable[Dict[str, Any]], columns: Sequence[str]) -> Dict[str, Any]:
+    builder = new_builder(columns)
+    for row in rows:
+        append_row(builder, row)
+    return builder
+
+
+def dense_series(store: Optional[Dict[str, Any]], n: int) -> pd.Series:
+    if store is None:
+        return pd.Series(MISSING, index=range(n), dtype="float64")
+    kind = store["kind"]
+    if kind == "int":
+        return pd.Series(np.frombuffer(store["data"], dtype=np.int64), copy=False)
+    if kind == "float":
+        return pd.Series(np.frombuffer(store["data"], dtype=np.float64), copy=False)
+    if kind == "bool":
+        return pd.Series(np.frombuffer(store["data"], dtype=np.int8).view(np.bool_), copy=False)
+    if kind == "category":
+        codes = np.frombuffer(store["data"], dtype=np.int32)
+        return pd.Series(pd.Categorical.from_codes(codes, categories=list(store["codes"])), copy=False)
+    if kind == "str":
+        import pyarrow as pa
+
+        flush_strings(store)
+        chunks = store["chunks"] or [pa.array([], type=pa.string())]
+        return pa.chunked_array(chunks, type=pa.string()).to_pandas()
+    return pd.Series(store["data"])
+
+
+def sparse_series(positions: array, values: List[Any], n: int) -> pd.Series:
+    """A rare column, typed as pd.DataFrame(rows) types a column most rows lack."""
+    pos = np.frombuffer(positions, dtype=np.int64)
+    kinds = {type(v) for v in values}
+    if kinds == {str}:
+        out = np.full(n, MISSING, dtype=object)
+        out[pos] = values
+        return pd.Series(out, copy=False)
+    if kinds and kinds <= {int, float} and all(-MAX_EXACT_FLOAT_INT <= v <= MAX_EXACT_FLOAT_INT for v in values):
+        out = np.full(n, MISSING)
+        out[pos] = values
+        return pd.Series(out, copy=False)
+    full: List[Any] = [MISSING] * n
+    for p, v in zip(pos.tolist(), values):
+        full[p] = v
+    return pd.Series(full)
+
+
+def builder_frame(builder: Dict[str, Any]) -> pd.DataFrame:
+    """The DataFrame for a filled builder: dense columns first, then the sorted extras."""
+    n = builder["n"]
+    short = [col for col, store in builder["dense"].items() if store is not None and store_length(store) != n]
+    if short or (n and None in builder["dense"].values()):
+        raise ValueError(f"rows without every dense column: {short or [c for c, s in builder['dense'].items() if s is None]}")
+    data = {col: dense_series(store, n) for col, store in builder["dense"].items()}
+    for col in sorted(builder["sparse"]):
+        positions, values = builder["sparse"].pop(col)
+        data[col] = sparse_series(positions, values, n)
+    columns = builder["columns"] + sorted(set(data) - set(builder["columns"]))
+    return pd.DataFrame(data, columns=columns, copy=False)
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+school_contacts.py
+
+Batch contacts normalization for schools.py.
+
+Instead of classifying contacts school by school (normalize_contacts_field),
+every contact of every school is exploded into one long table
+
+    school_id, contact_id, typeId, kind, value
+
+Packed values such as "a@x.az;b@y.az" are split once, each value is
+classified with precompiled regexes over the whole column (email by shape,
+phone by typeId 1 or PHONE_MIN_DIGITS digits) and duplicates within a school
+are dropped (emails compared case-insensitively, phones by their digits).
+The per-school contacts / contacts_phones / contacts_emails columns are then
+derived from the table with a grouped join.
+
+This is for the cleaner columns and the long table, not for speed: on the
+synthetic feed (benchmarks.py contacts) it runs at about 0.7-0.8x the pace of
+the per-record normalizer, as converting the contact dicts dominates both.
+
+Outputs:
+ - schools_contacts.csv (with `python schools.py --batch-contacts`)
+"""
+
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import json
+import re
+
+import numpy as np
+import pandas as pd
+
+OUT_CONTACTS = "schools_contacts.csv"
+PHONE_MIN_DIGITS = 5
+PHONE_TYPE_ID = 1
+EMAIL_TYPE_ID = 3
+VALUE_KEYS: Sequence[str] = ("val", "phone", "email")
+TABLE_COLUMNS: Sequence[str] = ("school_id", "contact_id", "typeId", "kind", "value")
+
+EMAIL_RE = re.compile(r"^[^@\s;]+@[^@\s;]+\.[^@\s;]+$")
+NON_DIGIT_PATTERN = r"[^0-9]+"  # a string, not re.compile, so pyarrow runs it natively
+JSON_ENCODER = json.JSONEncoder(ensure_ascii=False)
+
+
+def contact_items(raw_val: Any) -> Tuple[List[Any], str]:
+    """
+    The contact entries held by one raw `contacts` value, plus the audit
+    string stored in contacts_json. Accepts the same shapes as
+    normalize_contacts_field: list/dict, JSON string, plain "a;b" string.
+    """
+    if raw_val is None:
+        return [], ""
+    if isinstance(raw_val, str):
+        s = raw_val.strip()
+        if s.startswith("[") or s.startswith("{"):
+            try:
+                raw_val = json.loads(s)
+            except ValueError:
+                return [s], s
+        else:
+            return ([s] if s else []), s
+    if isinstance(raw_val, dict):
+        items = [raw_val]
+    elif isinstance(raw_val, list):
+        items = raw_val
+    else:
+        s = str(raw_val)
+        return [s], s
+    try:
+        audit = JSON_ENCODER.encode(items)
+    except (TypeError, ValueError):
+        audit = str(items)
+    return items, audit
+
+
+def columns_arrow(items: List[List[Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Explode with pyarrow when every contact is a {"id", "value", "typeId"}
+    style object: the nested lists are converted in one call and flattened
+    without a Python loop. Returns None (use columns_python) for anything
+    else, or when pyarrow is not installed.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+    except ImportError:
+        return None
+    try:
+        arr = pa.array(items)
+    except (pa.ArrowException, TypeError, ValueError):
+        return None
+    if not pa.types.is_list(arr.type) or not pa.types.is_struct(arr.type.value_type):
+        return None
+    struct = arr.type.value_type
+    names = [struct.field(i).name for i in range(struct.num_fields)]
+    if "value" not in names or not pa.types.is_string(struct.field("value").type):
+        return None
+    flat = arr.flatten()
+    if flat.field("value").null_count:
+        return None
+    type_fields = [flat.field(n) for n in ("typeId", "type") if n in names]
+    if any(not pa.types.is_integer(f.type) for f in type_fields):
+        return None
+    type_ids = pc.coalesce(*type_fields) if type_fields else pa.nulls(len(flat), pa.int64())
+    contact_ids = flat.field("id") if "id" in names and pa.types.is_integer(struct.field("id").type) else pa.nulls(len(flat), pa.int64())
+    return {
+        "row": pc.list_parent_indices(arr).to_numpy().astype(np.int64),
+        "contact_id": pd.array(contact_ids.cast(pa.int64()).to_pandas(), dtype="Int64"),
+        "typeId": pd.array(type_ids.cast(pa.int64()).to_pandas(), dtype="Int64"),
+        "value": pd.Series(flat.field("value").to_pandas(), dtype="string"),
+    }
+
+
+def columns_python(items: List[List[Any]]) -> Dict[str, Any]:
+    entries = [(pos, it if isinstance(it, dict) else {"value": it})
+               for pos, school_items in enumerate(items) for it in school_items]
+    values = [it.get("value") for _, it in entries]
+    if None in values:
+        for i, (_, it) in enumerate(entries):
+            if values[i] is None:
+                values[i] = next((it[k] for k in VALUE_KEYS if k in it), None)
+        kept = [i for i, v in enumerate(values) if v is not None]
+        entries = [entries[i] for i in kept]
+        values = [values[i] for i in kept]
+    contact_ids = [it.get("id") for _, it in entries]
+    type_ids = [it.get("typeId", it.get("type")) for _, it in entries]
+    return {
+        "row": np.asarray([pos for pos, _ in entries], dtype=np.int64),
+        "contact_id": pd.array(pd.to_numeric(pd.Series(contact_ids, dtype=object), errors="coerce"), dtype="Int64"),
+        "typeId": pd.array(pd.to_numeric(pd.Series(type_ids, dtype=object), errors="coerce"), dtype="Int64"),
+        "value": pd.Series([v if isinstance(v, str) else str(v) for v in values], dtype="string"),
+    }
+
+
+def explode_contacts(school_ids: Sequence[Any], raw_values: Sequence[Any]) -> Tuple[pd.DataFrame, List[str]]:
+    """
+    Build the long contacts table for a batch of schools.
+
+    `school_ids` and `raw_values` are aligned per school. Returns the table
+    (with a `row` column holding each school's position in the batch) and the
+    contacts_json audit strings.
+    """
+    items: List[List[Any]] = []
+    audits: List[str] = []
+    for raw_val in raw_values:
+        school_items, audit = contact_items(raw_val)
+        items.append(school_items)
+        audits.append(audit)
+    columns = columns_arrow(items)
+    table = split_packed(pd.DataFrame(columns if columns is not None else columns_python(items)))
+    # drop the blanks left behind by the split
+    table["value"] = table["value"].str.strip()
+    table = table[(table["value"] != "").fillna(False).to_numpy(dtype=bool)]
+
+    school_ids = np.asarray(school_ids, dtype=object)
+    table.insert(0, "school_id", school_ids[table["row"].to_numpy()] if len(table) else [])
+    digits = table["value"].str.replace(NON_DIGIT_PATTERN, "", regex=True)
+    table["kind"] = classify(table["value"], digits, table["typeId"])
+    table = dedupe(table, digits)
+    return table.reset_index(drop=True)[["row", *TABLE_COLUMNS]], audits
+
+
+def split_packed(table: pd.DataFrame) -> pd.DataFrame:
+    """
+    Split packed "a;b" values into one row each, keeping batch order. With
+    pyarrow every value is split in one call and the other columns are
+    repeated by parent index; without it only the rows holding a ';' are
+    exploded.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+    except ImportError:
+        packed = table["value"].str.contains(";", regex=False).to_numpy(dtype=bool)
+        if not packed.any():
+            return table
+        parts = table[packed].assign(value=table["value"][packed].str.split(";")).explode("value")
+        table = pd.concat([table[~packed], parts]).sort_index(kind="stable").reset_index(drop=True)
+        table["value"] = table["value"].astype("string")
+        return table
+    lists = pc.split_pattern(pa.array(table["value"], type=pa.string()), ";")
+    parent = pc.list_parent_indices(lists).to_numpy()
+    out = table.drop(columns="value").iloc[parent].reset_index(drop=True)
+    out["value"] = pd.Series(lists.flatten().to_pandas(), dtype="string")
+    return out[table.columns]
+
+
+def classify(values: pd.Series, digits: pd.Series, type_ids: pd.Series) -> np.ndarray:
+    """'email', 'phone' or 'other' for each value; `digits` is the value with non-digits removed."""
+    is_email = values.str.match(EMAIL_RE).fillna(False).to_numpy(dtype=bool)
+    n_digits = digits.str.len().fillna(0).to_numpy()
+    type_ids = type_ids.fillna(0).to_numpy(dtype=np.int64)
+    return np.select(
+        [is_email, (type_ids == PHONE_TYPE_ID) | (n_digits >= PHONE_MIN_DIGITS), type_ids == EMAIL_TYPE_ID],
+        ["email", "phone", "email"],
+        default="other",
+    )
+
+
+def dedupe(table: pd.DataFrame, digits: pd.Series) -> pd.DataFrame:
+    """Drop repeated values within a school, keeping the first occurrence."""
+    is_phone = (table["kind"] == "phone").to_numpy()
+    norm, _ = pd.factorize(table["value"].str.lower().where(~is_phone, digits))
+    kind, _ = pd.factorize(table["kind"])
+    key = (table["row"].to_numpy() * 3 + kind) * (norm.max(initial=0) + 1) + norm
+    return table[~pd.Series(key).duplicated().to_numpy()]
+
+
+def joined(table: pd.DataFrame, sep: str, n_rows: int) -> List[str]:
+    """
+    sep-join each school's values. The table is in batch order, so groups
+    are contiguous runs of `row`: with pyarrow they become a list array
+    over the value column and are joined in one call.
+    """
+    if table.empty:
+        return [""] * n_rows
+    rows = table["row"].to_numpy()
+    offsets = np.searchsorted(rows, np.arange(n_rows + 1))
+    try:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+    except ImportError:
+        values = table["value"].tolist()
+        return [sep.join(values[start:end]) for start, end in zip(offsets[:-1].tolist(), offsets[1:].tolist())]
+    lists = pa.ListArray.from_arrays(pa.array(offsets, type=pa.int32()), pa.array(table["value"], type=pa.string()))
+    return pc.binary_join(lists, sep).to_pylist()
+
+
+def contact_columns(table: pd.DataFrame, audits: List[str]) -> Dict[str, List[str]]:
+    """Per-school contacts columns, in batch order, derived from the long table."""
+    n_rows = len(audits)
+    kind = table["kind"]
+    return {
+        "contacts": joined(table, ";", n_rows),
+        "contacts_phones": joined(table[kind == "phone"], "|", n_rows),
+        "contacts_emails": joined(table[kind == "email"], ";", n_rows),
+        "contacts_json": audits,
+    }
+
+
+def normalize_batch(school_ids: Sequence[Any], raw_values: Sequence[Any]) -> Tuple[pd.DataFrame, Dict[str, List[str]]]:
+    """Explode, classify and dedupe a batch; returns (table, per-school columns)."""
+    table, audits = explode_contacts(school_ids, raw_values)
+    return table, contact_columns(table, audits)
+
+
+def write_contacts_table(table: pd.DataFrame, path: str = OUT_CONTACTS) -> None:
+    table[list(TABLE_COLUMNS)].to_csv(path, index=False, encoding="utf-8")
@@ -0,0 +1,110 @@
+"""
+school_cube.py
+
+Single-pass aggregation for the analysis scripts.
+
+build_cube groups the dataset once by region x type x kind x subjection x
+hasJurnal x hasMeeting and sums a handful of per-school measures (school
+count, coordinates present, contact completeness). Every chart and printed
+statistic in analyze_schools.py is answered from that cube, so a new chart
+costs a roll-up over a few thousand cells instead of another scan of the
+rows.
+"""
+
+from typing import Any, Dict, List, Sequence
+
+import pandas as pd
+
+from school_quality import has_valid
+
+CUBE_DIMENSIONS: Sequence[str] = ("regionName", "schoolType", "schoolKind", "subjection", "hasJurnal", "hasMeeting")
+MEASURES: Sequence[str] = ("n", "has_coords", "has_email", "has_phone", "has_site", "has_all_contacts", "missing_contacts")
+
+
+def row_measures(df: pd.DataFrame) -> pd.DataFrame:
+    """Per-school 0/1 measures summed by build_cube."""
+    has_coords = (df["lat"] != 0) & (df["lng"] != 0) & df["lat"].notna() & df["lng"].notna()
+    # a contact counts only if the quality rules accept it, so chart 6 and
+    # schools_quality.json agree: blank, placeholder ("-", "yox") and
+    # malformed (".") text is not a contact, though notna() says it is
+    has_email = has_valid(df, "email_format")
+    has_phone = has_valid(df, "phone_format")
+    has_site = has_valid(df, "url_format")
+    return pd.DataFrame({
+        "n": 1,
+        "has_coords": has_coords.fillna(False).astype(int),
+        "has_email": has_email.astype(int),
+        "has_phone": has_phone.astype(int),
+        "has_site": has_site.astype(int),
+        "has_all_contacts": (has_email & has_phone & has_site).astype(int),
+        "missing_contacts": (~has_email | ~has_phone).astype(int),
+    }, index=df.index)
+
+
+def build_cube(df: pd.DataFrame) -> pd.DataFrame:
+    dims = [c for c in CUBE_DIMENSIONS if c in df.columns]
+    frame = pd.concat([df[dims], row_measures(df)], axis=1)
+    return frame.groupby(dims, observed=True, dropna=False, sort=False).sum().reset_index()
+
+
+def select(cube: pd.DataFrame, **filters: Any) -> pd.DataFrame:
+    """Cells matching dimension == value for every keyword."""
+    mask = pd.Series(True, index=cube.index)
+    for dim, value in filters.items():
+        mask &= cube[dim].eq(value).fillna(False).astype(bool)
+    return cube[mask]
+
+
+def total(cube: pd.DataFrame, measure: str = "n", **filters: Any) -> int:
+    cells = select(cube, **filters) if filters else cube
+    return int(cells[measure].sum())
+
+
+def counts(cube: pd.DataFrame, dim: str, measure: str = "n") -> pd.Series:
+    """Equivalent of df[dim].value_counts(), read from the cube."""
+    series = cube.groupby(dim, observed=True, sort=False)[measure].sum()
+    series = series[series > 0].sort_values(ascending=False, kind="stable")
+    series.name = "count"
+    return series.astype(int)
+
+
+def rollup(cube: pd.DataFrame, dim: str, measures: Sequence[str] = MEASURES) -> pd.DataFrame:
+    return cube.groupby(dim, observed=True, sort=False)[list(measures)].sum()
+
+
+def flag_rates(cube: pd.DataFrame, dim: str, keys: Sequence[Any]) -> List[Dict[str, Any]]:
+    """Per-key school count and hasJurnal / hasMeeting adoption rates (%)."""
+    n = rollup(cube, dim, ["n"])["n"]
+    journal = select(cube, hasJurnal=True).groupby(dim, observed=True)["n"].sum()
+    meeting = select(cube, hasMeeting=True).groupby(dim, observed=True)["n"].sum()
+    out = []
+    for key in keys:
+        count = int(n.get(key, 0))
+        out.append({
+            "key": key,
+            "n": count,
+            "journal_rate": journal.get(key, 0) / count * 100 if count else 0.0,
+            "meeting_rate": meeting.get(key, 0) / count * 100 if count else 0.0,
+        })
+    return out
+
+
+def digital_adoption(cube: pd.DataFrame) -> Dict[str, int]:
+    """Chart 4: schools per e-journal / online-meeting combination."""
+    return {
+        "E-Journal System": total(cube, hasJurnal=True),
+        "Online Meeting System": total(cube, hasMeeting=True),
+        "Both Features": total(cube, hasJurnal=True, hasMeeting=True),
+        "No Digital Features": total(cube, hasJurnal=False, hasMeeting=False),
+    }
+
+
+def contact_completeness(cube: pd.DataFrame) -> Dict[str, int]:
+    """Chart 6: schools with each kind of contact information."""
+    return {
+        "Has Email": total(cube, "has_email"),
+        "Has Phone": total(cube, "has_phone"),
+        "Has Website": total(cube, "has_site"),
+        "Has All Contact Info": total(cube, "has_all_contacts"),
+        "Missing Contact Info": total(cube, "missing_contacts"),
+    }
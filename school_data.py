@@ -0,0 +1,145 @@
+"""
+school_data.py
+
+Typed columnar copy of the export and the loader used by the analysis
+scripts.
+
+schools.py writes schools.parquet next to schools.csv with an explicit
+schema: integer ids, float32 coordinates, nullable bool flags and
+dictionary-encoded region/type/kind/subjection names. Empty strings become
+nulls, matching what pd.read_csv makes of them; an id column holding
+anything but numbers is kept as text rather than nulled. load_schools reads
+only the requested columns and falls back to the CSV when no Parquet file
+(or no pyarrow) is available, or when the Parquet file is older than the
+CSV.
+
+Requires:
+ pip install pandas pyarrow
+"""
+
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence
+import os
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+OUT_PARQUET = "schools.parquet"
+CSV_PATH = "schools.csv"
+
+PARQUET_DTYPES: Dict[str, str] = {
+    "id": "Int64",
+    "regionId": "Int64",
+    "schoolKindId": "Int64",
+    "schoolTypeId": "Int64",
+    "subjectionId": "Int64",
+    "utisCode": "Int64",
+    "lat": "float32",
+    "lng": "float32",
+    "hasJurnal": "boolean",
+    "hasMeeting": "boolean",
+    "regionName": "category",
+    "schoolType": "category",
+    "schoolKind": "category",
+    "subjection": "category",
+}
+
+
+def have_pyarrow() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def to_typed_frame(df: "pd.DataFrame") -> "pd.DataFrame":
+    """
+    Apply PARQUET_DTYPES; every other column becomes a nullable string. An
+    Int64 column with non-numeric values becomes a string column instead
+    (with a warning), so no id is lost; unparseable coordinates are nulls.
+    """
+    import pandas as pd
+
+    out = {}
+    for col in df.columns:
+        series = df[col].replace("", None)
+        dtype = PARQUET_DTYPES.get(col, "string")
+        if dtype in ("Int64", "float32"):
+            numbers = pd.to_numeric(series, errors="coerce")
+            bad = numbers.isna() & series.notna()
+            if dtype == "Int64" and bad.any():
+                print(f"[warn] {col}: {int(bad.sum())} non-numeric value(s) such as {series[bad].iloc[0]!r}; "
+                      f"keeping the column as text")
+                series = series.astype("string")
+            else:
+                series = numbers.astype(dtype)
+        elif dtype == "boolean":
+            series = series.where(series.map(lambda v: isinstance(v, bool)), None).astype("boolean")
+        elif dtype == "category":
+            series = series.astype("string").astype("category")
+        else:
+            series = series.astype("string")
+        out[col] = series
+    return pd.DataFrame(out, columns=df.columns)
+
+
+def write_parquet(df: "pd.DataFrame", path: str = OUT_PARQUET) -> bool:
+    if not have_pyarrow():
+        print(f"[warn] pyarrow is not installed; skipping {path}")
+        return False
+    to_typed_frame(df).to_parquet(path, index=False, engine="pyarrow", compression="zstd")
+    return True
+
+
+def arrow_schema(columns: Sequence[str]) -> Any:
+    """
+    The pyarrow schema (with pandas metadata) to_typed_frame produces for
+    `columns`, fixed up front so every chunk of a chunked export matches.
+    Dictionary columns get int32 indices so later chunks may add categories.
+    """
+    import pandas as pd
+    import pyarrow as pa
+
+    empty = to_typed_frame(pd.DataFrame({col: pd.Series([], dtype=object) for col in columns}))
+    schema = pa.Schema.from_pandas(empty, preserve_index=False)
+    for i, field in enumerate(schema):
+        if pa.types.is_dictionary(field.type):
+            schema = schema.set(i, field.with_type(pa.dictionary(pa.int32(), pa.string())))
+    return schema
+
+
+def open_parquet_writer(columns: Sequence[str], path: str = OUT_PARQUET) -> Any:
+    """
+    A pyarrow ParquetWriter for chunked exports (append_parquet), or None
+    when pyarrow is not installed.
+    """
+    if not have_pyarrow():
+        print(f"[warn] pyarrow is not installed; skipping {path}")
+        return None
+    import pyarrow.parquet as pq
+
+    return pq.ParquetWriter(path, arrow_schema(columns), compression="zstd")
+
+
+def append_parquet(writer: Any, df: "pd.DataFrame") -> None:
+    """Write one chunk of rows as a row group."""
+    import pyarrow as pa
+
+    writer.write_table(pa.Table.from_pandas(to_typed_frame(df), schema=writer.schema, preserve_index=False))
+
+
+def load_schools(columns: Optional[Sequence[str]] = None, parquet_path: str = OUT_PARQUET,
+                 csv_path: str = CSV_PATH) -> "pd.DataFrame":
+    """
+    Load the export, reading only `columns` (all when None). The Parquet
+    copy is used unless the CSV is newer (a failed or partial export).
+    """
+    import pandas as pd
+
+    cols: Optional[List[str]] = list(columns) if columns is not None else None
+    if os.path.exists(parquet_path) and have_pyarrow():
+        if os.path.exists(csv_path) and os.path.getmtime(csv_path) > os.path.getmtime(parquet_path):
+            print(f"[warn] {parquet_path} is older than {csv_path}; reading the CSV")
+        else:
+            return pd.read_parquet(parquet_path, columns=cols, engine="pyarrow")
+    return pd.read_csv(csv_path, usecols=cols)
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+school_db.py
+
+SQLite copy of the export for ad-hoc SQL.
+
+The normalized rows go to a typed `schools` table (ids and flags as
+INTEGER, coordinates as REAL) with indexes on id, regionId, schoolTypeId,
+schoolKindId and subjectionId. The contacts are exploded into `contacts`
+(school_id, contact_id, typeId, kind, value; see school_contacts.py),
+indexed by school and by value. Summary tables hold the numbers behind
+each analyze_schools.py chart, plus `cube` (school_cube.build_cube) for
+any other roll-up:
+
+    SELECT subjection, SUM(n) AS schools,
+           SUM(CASE WHEN hasJurnal THEN n ELSE 0 END) * 100.0 / SUM(n) AS journal_rate
+    FROM cube WHERE regionName = 'Nəsimi' GROUP BY subjection
+
+The database is built in a temporary file with one transaction and bulk
+executemany inserts, the indexes are created after the rows are in, and
+the file then replaces the old copy, so readers never see a half-built
+database.
+
+Outputs:
+ - schools.sqlite
+
+Usage:
+ python school_db.py build
+ python school_db.py query "SELECT regionName, schools FROM chart_01_regions LIMIT 5"
+ python school_db.py tables
+ python schools.py --db
+"""
+
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Sequence, Tuple
+from datetime import datetime, timezone
+import argparse
+import os
+import sqlite3
+import sys
+
+import school_data
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+OUT_DB = "schools.sqlite"
+DB_VERSION = 1
+INDEXED_COLUMNS: Sequence[str] = ("id", "regionId", "schoolTypeId", "schoolKindId", "subjectionId")
+REAL_COLUMNS: Sequence[str] = ("lat", "lng")
+CONTACT_TYPES: Dict[str, str] = {
+    "school_id": "INTEGER", "contact_id": "INTEGER", "typeId": "INTEGER", "kind": "TEXT", "value": "TEXT",
+}
+CONTACT_INDEXES: Sequence[Tuple[str, ...]] = (("school_id",), ("value",))
+
+
+def sql_type(col: str) -> str:
+    if col in REAL_COLUMNS:
+        return "REAL"
+    return "INTEGER" if school_data.PARQUET_DTYPES.get(col) in ("Int64", "boolean") else "TEXT"
+
+
+def typed_columns(df: "pd.DataFrame") -> Dict[str, "pd.Series"]:
+    """`df` as SQL-ready columns: to_typed_frame, except coordinates stay float64."""
+    import pandas as pd
+
+    typed = school_data.to_typed_frame(df)
+    for col in REAL_COLUMNS:
+        if col in df.columns:
+            typed[col] = pd.to_numeric(df[col].replace("", None), errors="coerce")
+    return {col: typed[col] for col in typed.columns}
+
+
+def column_values(series: "pd.Series") -> List[Any]:
+    """Python values with None for nulls (sqlite3 binds neither numpy scalars nor pd.NA)."""
+    import pandas as pd
+
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        series = series.astype("string")
+    if pd.api.types.is_bool_dtype(series) or series.dtype == "boolean":
+        series = series.astype("Int64")
+    return series.to_numpy(dtype=object, na_value=None).tolist()
+
+
+def create_table(conn: sqlite3.Connection, name: str, types: Dict[str, str]) -> None:
+    columns = ", ".join(f'"{col}" {sql_type}' for col, sql_type in types.items())
+    conn.execute(f'CREATE TABLE "{name}" ({columns})')
+
+
+def insert_rows(conn: sqlite3.Connection, name: str, columns: Sequence[str], rows: Iterable[Sequence[Any]]) -> None:
+    cols = ", ".join(f'"{col}"' for col in columns)
+    marks = ", ".join("?" for _ in columns)
+    conn.executemany(f'INSERT INTO "{name}" ({cols}) VALUES ({marks})', rows)
+
+
+def insert_frame(conn: sqlite3.Connection, name: str, df: "pd.DataFrame",
+                 types: Optional[Dict[str, str]] = None) -> int:
+    """Create table `name` for `df` (SQL types inferred unless given) and bulk-insert its rows."""
+    import pandas as pd
+
+    if types is None:
+        types = {col: ("INTEGER" if pd.api.types.is_integer_dtype(df[col]) or pd.api.types.is_bool_dtype(df[col])
+                       else "REAL" if pd.api.types.is_float_dtype(df[col]) else "TEXT")
+                 for col in df.columns}
+    create_table(conn, name, types)
+    insert_rows(conn, name, list(df.columns), zip(*(column_values(df[col]) for col in df.columns)))
+    return len(df)
+
+
+def create_index(conn: sqlite3.Connection, table: str, columns: Sequence[str]) -> None:
+    cols = ", ".join(f'"{col}"' for col in columns)
+    conn.execute(f'CREATE INDEX "idx_{table}_{"_".join(columns)}" ON "{table}" ({cols})')
+
+
+def series_table(series: "pd.Series", key: str, total: int) -> "pd.DataFrame":
+    import pandas as pd
+
+    return pd.DataFrame({key: [str(k) for k in series.index], "schools": series.to_numpy(dtype="int64"),
+                         "share": (series.to_numpy() / total * 100).round(2) if total else 0.0})
+
+
+def summary_tables(typed: "pd.DataFrame") -> Dict[str, "pd.DataFrame"]:
+    """The numbers behind charts 1-4 and 6-8, and the cube they are rolled up from."""
+    import pandas as pd
+    from school_cube import build_cube, contact_completeness, counts, digital_adoption, flag_rates
+
+    cube = build_cube(typed)
+    total_schools = int(cube["n"].sum())
+    regions = counts(cube, "regionName")
+    rates = flag_rates(cube, "regionName", list(regions.index))
+
+    def labelled(values: Dict[str, int], key: str) -> "pd.DataFrame":
+        return series_table(pd.Series(values, dtype="int64"), key, total_schools)
+
+    return {
+        "cube": cube,
+        "chart_01_regions": series_table(regions, "regionName", total_schools),
+        "chart_02_types": series_table(counts(cube, "schoolType"), "schoolType", total_schools),
+        "chart_03_kinds": series_table(counts(cube, "schoolKind"), "schoolKind", total_schools),
+        "chart_04_digital": labelled(digital_adoption(cube), "feature"),
+        "chart_06_contacts": labelled(contact_completeness(cube), "category"),
+        "chart_07_regional_adoption": pd.DataFrame({
+            "regionName": [str(r["key"]) for r in rates],
+            "schools": [r["n"] for r in rates],
+            "journal_rate": [round(float(r["journal_rate"]), 2) for r in rates],
+            "meeting_rate": [round(float(r["meeting_rate"]), 2) for r in rates],
+        }),
+        "chart_08_subjections": series_table(counts(cube, "subjection"), "subjection", total_schools),
+    }
+
+
+def write_database(df: "pd.DataFrame", path: str = OUT_DB) -> Dict[str, int]:
+    """
+    Build the database for export frame `df` (any column set; "" is a
+    null). Returns the row count per table.
+    """
+    import pandas as pd
+    import school_contacts
+
+    columns = typed_columns(df)
+    typed = pd.DataFrame(columns)
+    tmp = f"{path}.tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    conn = sqlite3.connect(tmp, isolation_level=None)
+    sizes: Dict[str, int] = {}
+    try:
+        # a fresh file that only becomes visible after os.replace: no journal, no fsync per page
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.execute("BEGIN")
+        create_table(conn, "schools", {col: sql_type(col) for col in columns})
+        insert_rows(conn, "schools", list(columns), zip(*(column_values(s) for s in columns.values())))
+        sizes["schools"] = len(df)
+        for col in INDEXED_COLUMNS:
+            if col in columns:
+                create_index(conn, "schools", [col])
+        if "contacts_json" in df.columns and "id" in df.columns:
+            ids, raw = column_values(typed["id"]), df["contacts_json"].fillna("").tolist()
+            table, _ = school_contacts.explode_contacts(ids, raw)
+            sizes["contacts"] = insert_frame(conn, "contacts", table[list(CONTACT_TYPES)], CONTACT_TYPES)
+            for cols in CONTACT_INDEXES:
+                create_index(conn, "contacts", cols)
+        for name, table in summary_tables(typed).items():
+            sizes[name] = insert_frame(conn, name, table)
+        meta = {"version": DB_VERSION, "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "rows": len(df)}
+        insert_frame(conn, "meta", pd.DataFrame({"key": list(meta), "value": [str(v) for v in meta.values()]}))
+        conn.execute("COMMIT")
+        conn.execute("ANALYZE")
+    finally:
+        conn.close()
+    os.replace(tmp, path)
+    return sizes
+
+
+def export_database(path: str = OUT_DB, csv_path: str = school_data.CSV_PATH) -> Dict[str, int]:
+    """Build the database from the CSV on disk (the Parquet copy stores float32 coordinates)."""
+    import pandas as pd
+
+    sizes = write_database(pd.read_csv(csv_path), path)
+    summaries = [name for name in sizes if name not in ("schools", "contacts")]
+    print(f"[ok] Saved {sizes['schools']} schools, {sizes.get('contacts', 0)} contacts and "
+          f"{len(summaries)} summary tables -> {path}")
+    return sizes
+
+
+def query(sql: str, path: str = OUT_DB, params: Sequence[Any] = ()) -> Tuple[List[str], List[Tuple[Any, ...]]]:
+    """Column names and rows of `sql` against a read-only connection."""
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        cursor = conn.execute(sql, params)
+        return [d[0] for d in cursor.description or ()], cursor.fetchall()
+    finally:
+        conn.close()
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="SQLite copy of the schools export")
+    parser.add_argument("--db", default=OUT_DB, help="database file")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_build = sub.add_parser("build", help="(re)build the database from the export")
+    p_build.add_argument("--csv", default=school_data.CSV_PATH, help="export to load")
+    p_query = sub.add_parser("query", help="run one SQL statement and print the rows (tab-separated)")
+    p_query.add_argument("sql")
+    sub.add_parser("tables", help="list the tables and their row counts")
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        export_database(args.db, args.csv)
+        return
+    if not os.path.exists(args.db):
+        sys.exit(f"[warn] {args.db} not found; run `python school_db.py build` or `python schools.py --db` first")
+    if args.command == "query":
+        names, rows = query(args.sql, args.db)
+        print("\t".join(names))
+        for row in rows:
+            print("\t".join("" if v is None else str(v) for v in row))
+    else:
+        _, tables = query("SELECT name FROM sqlite_master WHERE type = 'table' ORDER BY name", args.db)
+        for (name,) in tables:
+            _, ((n,),) = query(f'SELECT COUNT(*) FROM "{name}"', args.db)
+            print(f"{name}\t{n}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,557 @@
+#!/usr/bin/env python3
+"""
+school_dedup.py
+
+Duplicate and near-duplicate schools in the export.
+
+Comparing every school with every other is quadratic, so candidate pairs
+come from blocking keys: two schools are compared only when they share
+ - name      a distinctive name token (folded as in school_search.py) in
+             the same region
+ - cell      a COORD_CELL-degree coordinate cell (identical coordinates)
+ - phone     a phone number (last PHONE_DIGITS digits)
+ - email     an email address (case-insensitive)
+Blocks with more than MAX_BLOCK schools are skipped. A regional office
+phone on 50 schools, or a name token like "orta", is not evidence, and the
+cap bounds the work at about n * MAX_BLOCK pairs per key. Name tokens in
+more than STOPWORD_SHARE of all names, or REGION_STOPWORD_SHARE of a
+region's names (the region's own name), are generic and ignored
+throughout.
+The same name in two regions is common (village schools) and is not
+blocked on by itself. Every key is also scoped to the school type: a
+school and its own special class ("... nəzdində xüsusi sinif") or branch
+share the name, phone and coordinates but are separate records, so
+schools of different types (or a known and an unknown type) are never
+compared.
+
+Candidate pairs are scored in bulk with numpy. Names are compared by the
+weighted Jaccard similarity of their hashed character-trigram profiles
+(full names, unless the names share too little beyond generic tokens), so
+typos and word order matter little. Names with different school numbers
+("13 nömrəli" vs "20 nömrəli") or village qualifiers ("Aşağı Qışlaq" vs
+"Yuxarı Qışlaq", "Bala Həşimxanlı" vs "Həşimxanlı") have similarity 0. The
+score is the name similarity plus WEIGHTS for each shared phone / email /
+cell, divided by k - 1 for a key shared by k schools (an office phone on
+seven schools says little about any two of them), minus
+OTHER_REGION_PENALTY across regions. With the defaults, pairs with any of
+these reach MATCH_THRESHOLD:
+ - a near-identical name in the same region
+ - a fairly similar name (0.55+) and one key shared by just the two
+ - a weakly similar name (0.2+) and two keys shared by just the two
+Linked pairs' connected components become clusters. A school's cluster_id is the
+smallest id in its cluster, or its own id when it has no duplicate.
+
+On the current export (4,382 schools) this matches 3 pairs, of which 1 is
+a real duplicate (precision 1/3). The real one is 5577/5664, Badamağac
+village school listed again as "Güneyli(Badamağac)". 8381/8384 are two
+Zərdab villages that share an email, and 8897/13990 are two different
+special classes of Xətai school 55. benchmarks.py dedup checks a fixed
+fixture of such cases (DEDUP_FIXTURE) before timing the synthetic feed.
+
+Outputs:
+ - schools_clusters.csv   (id, cluster_id, cluster_size for every school)
+ - schools_duplicates.csv (matched pairs with score, name similarity and shared keys)
+
+Usage:
+ python school_dedup.py
+ python school_dedup.py --threshold 0.95 --top 20
+ python school_cli.py dedup
+
+Requires:
+ pip install numpy pandas
+"""
+
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Tuple
+import argparse
+
+import numpy as np
+
+from school_data import load_schools
+from school_quality import NULL_PLACEHOLDERS, PHONE_MIN_DIGITS
+from school_search import fold
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+OUT_CLUSTERS = "schools_clusters.csv"
+OUT_PAIRS = "schools_duplicates.csv"
+DEDUP_COLUMNS: Sequence[str] = ("id", "name", "regionId", "schoolTypeId", "schoolType", "lat", "lng",
+                                 "contacts_phones", "contacts_emails")
+MAX_BLOCK = 20
+STOPWORD_SHARE = 0.01
+REGION_STOPWORD_SHARE = 0.2  # ... or in more than this share of a region's names (at least REGION_STOPWORD_MIN)
+REGION_STOPWORD_MIN = 5
+COORD_CELL = 0.001          # degrees, about 100 m
+PHONE_DIGITS = 9            # 0124401663 and +994124401663 are the same phone
+NAME_CHUNK = 100_000        # names folded per numpy batch
+PAIR_CHUNK = 200_000        # pairs scored per numpy batch
+PROFILE_SIZE = 128          # trigram hash buckets per name
+FOLD_SIZE = 0x3000          # code points covered by the fold table (Latin, Cyrillic, combining marks)
+EVIDENCE: Sequence[str] = ("name", "cell", "phone", "email")  # bit order of a pair's evidence mask
+WEIGHTS: Dict[str, float] = {"phone": 0.35, "email": 0.35, "cell": 0.35}
+OTHER_REGION_PENALTY = 0.35
+# village name qualifiers: "Aşağı X" and "Yuxarı X" (lower / upper X), or "Bala X" and X, are different villages
+QUALIFIERS: Sequence[str] = ("aşağı", "yuxarı", "bala", "böyük", "kiçik", "yeni", "köhnə")
+MATCH_THRESHOLD = 0.9
+DISTINCTIVE_MIN = 0.5       # below this distinctive-token overlap the full-name similarity is capped
+HASH_BASE = np.uint64(1_000_003)
+SPACE = 32
+
+FOLD_TABLE: Optional[np.ndarray] = None
+
+
+def fold_table() -> np.ndarray:
+    """Code point -> folded code point (school_search.fold), or a space for anything not alphanumeric."""
+    global FOLD_TABLE
+    if FOLD_TABLE is None:
+        table = np.full(FOLD_SIZE, SPACE, dtype=np.uint32)
+        for code in range(FOLD_SIZE):
+            folded = fold(chr(code))
+            if len(folded) == 1 and folded.isalnum():
+                table[code] = ord(folded)
+        FOLD_TABLE = table
+    return FOLD_TABLE
+
+
+def name_codes(names: Sequence[Any]) -> np.ndarray:
+    """
+    Folded names as a (len(names), width + 1) uint32 matrix: one code point
+    per column, separators as spaces, 0 after the end (the extra column
+    guarantees every row ends in one).
+    """
+    text = np.asarray(["" if not isinstance(n, str) else n for n in names], dtype=str)
+    width = max(text.dtype.itemsize // 4, 1)
+    codes = np.zeros((len(text), width + 1), dtype=np.uint32)
+    codes[:, :width] = text.astype(f"U{width}").view(np.uint32).reshape(len(text), width)
+    table = fold_table()
+    folded = np.where(codes < FOLD_SIZE, table[np.minimum(codes, FOLD_SIZE - 1)], codes)
+    folded[codes == 0] = 0
+    return folded
+
+
+def token_hashes(codes: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    (row, hash, start, length, numeric) of every token in a name_codes
+    matrix, start being the position in codes.ravel() and numeric whether
+    the token is a number. No Python loop over names: one
+    polynomial hash per run of non-separator code points, summed with
+    np.add.reduceat.
+    """
+    width = codes.shape[1]
+    flat = codes.ravel()
+    pos = np.flatnonzero((flat != SPACE) & (flat != 0))
+    if not len(pos):
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty.astype(np.uint64), empty, empty, empty.astype(bool)
+    starts = np.ones(len(pos), dtype=bool)
+    starts[1:] = pos[1:] != pos[:-1] + 1
+    first = np.flatnonzero(starts)
+    lengths = np.diff(np.append(first, len(pos)))
+    offset = np.arange(len(pos)) - np.repeat(first, lengths)
+    powers = HASH_BASE ** np.arange(width, dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        hashes = np.add.reduceat(flat[pos].astype(np.uint64) * powers[offset], first)
+    initial = flat[pos[first]]
+    return pos[first] // width, hashes, pos[first], lengths, (initial >= ord("0")) & (initial <= ord("9"))
+
+
+def name_tokens(names: Sequence[Any], chunk: int = NAME_CHUNK) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(row, token hash, numeric) of every distinct token of every name."""
+    rows: List[np.ndarray] = [np.zeros(0, dtype=np.int64)]
+    hashes: List[np.ndarray] = [np.zeros(0, dtype=np.uint64)]
+    numeric: List[np.ndarray] = [np.zeros(0, dtype=bool)]
+    for start in range(0, len(names), chunk):
+        r, h, _, _, num = token_hashes(name_codes(names[start:start + chunk]))
+        rows.append(r + start)
+        hashes.append(h)
+        numeric.append(num)
+    rows_all, hashes_all, numeric_all = np.concatenate(rows), np.concatenate(hashes), np.concatenate(numeric)
+    order = np.lexsort((hashes_all, rows_all))
+    rows_all, hashes_all, numeric_all = rows_all[order], hashes_all[order], numeric_all[order]
+    fresh = np.ones(len(rows_all), dtype=bool)
+    fresh[1:] = (rows_all[1:] != rows_all[:-1]) | (hashes_all[1:] != hashes_all[:-1])
+    return rows_all[fresh], hashes_all[fresh], numeric_all[fresh]
+
+
+def regional_hash(hashes: np.ndarray, regions: np.ndarray) -> np.ndarray:
+    """A token hash scoped to a region code."""
+    with np.errstate(over="ignore"):
+        return hashes ^ (regions.astype(np.uint64) * np.uint64(0x9E3779B97F4A7C15))
+
+
+def stopwords(rows: np.ndarray, hashes: np.ndarray, regions: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Generic name tokens, from the per-row distinct (row, hash) of
+    name_tokens for the names' region codes `regions`: "global" hashes found in more than STOPWORD_SHARE of all
+    names, and "regional" ones (regional_hash) found in more than
+    REGION_STOPWORD_SHARE of a region's names, such as the region's own
+    name.
+    """
+    values, counts = np.unique(hashes, return_counts=True)
+    token_regions = regions[rows]
+    scoped, first, scoped_counts = np.unique(regional_hash(hashes, token_regions), return_index=True,
+                                             return_counts=True)
+    region_sizes = np.bincount(regions)[token_regions[first]]
+    regional = ((scoped_counts > REGION_STOPWORD_SHARE * region_sizes) & (scoped_counts >= REGION_STOPWORD_MIN)
+                & (token_regions[first] > 0))
+    return {"global": values[counts > max(STOPWORD_SHARE * len(regions), 1)], "regional": scoped[regional]}
+
+
+def is_generic(hashes: np.ndarray, regions: np.ndarray, generic: Dict[str, np.ndarray]) -> np.ndarray:
+    """Whether each token (hash, region code of its name) is a stopword."""
+    return np.isin(hashes, generic["global"]) | np.isin(regional_hash(hashes, regions), generic["regional"])
+
+
+def split_values(values: Sequence[Any]) -> Tuple[np.ndarray, "pd.Series"]:
+    """(row, value) for every ";", "|" or "," separated value of a contacts column."""
+    import pandas as pd
+
+    try:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+    except ImportError:
+        parts = pd.Series(values, dtype="object").fillna("").astype(str).str.split(r"[;|,]", regex=True).explode()
+        return parts.index.to_numpy(dtype=np.int64), parts.reset_index(drop=True).astype(str)
+    arr = pa.array(pd.Series(values, dtype="object").where(pd.notna(values), "").astype(str).tolist(), pa.string())
+    lists = pc.split_pattern(pc.replace_substring_regex(arr, "[|,]", ";"), ";")
+    return (pc.list_parent_indices(lists).to_numpy().astype(np.int64),
+            pd.Series(pc.list_flatten(lists).to_pandas(), dtype="object"))
+
+
+def contact_keys(values: Sequence[Any], kind: str) -> Tuple[np.ndarray, np.ndarray]:
+    """(row, key code) of the usable phones or emails in a contacts column."""
+    import pandas as pd
+
+    rows, parts = split_values(values)
+    parts = parts.astype("string").str.strip()
+    if kind == "phone":
+        digits = parts.str.replace(r"\D", "", regex=True)
+        keys = digits.str[-PHONE_DIGITS:]
+        repeated = {d * PHONE_DIGITS for d in "0123456789"}  # 0000000000 and the like
+        usable = (digits.str.len() >= PHONE_MIN_DIGITS) & ~keys.isin(repeated)
+    else:
+        keys = parts.str.lower()
+        usable = keys.str.contains("@", regex=False) & ~keys.isin(NULL_PLACEHOLDERS)
+    usable = usable.fillna(False).to_numpy(dtype=bool)
+    codes, _ = pd.factorize(keys[usable])
+    return rows[usable], codes.astype(np.int64)
+
+
+def cell_keys(lat: Any, lng: Any) -> Tuple[np.ndarray, np.ndarray]:
+    """(row, cell code) for every school with coordinates (0 counts as missing)."""
+    lat = np.asarray(lat, dtype=np.float64)
+    lng = np.asarray(lng, dtype=np.float64)
+    rows = np.flatnonzero(np.isfinite(lat) & np.isfinite(lng) & (lat != 0) & (lng != 0))
+    row_cell = np.floor(lat[rows] / COORD_CELL).astype(np.int64)
+    col_cell = np.floor(lng[rows] / COORD_CELL).astype(np.int64)
+    return rows, row_cell * 1_000_000 + col_cell
+
+
+def block_pairs(rows: np.ndarray, keys: np.ndarray, max_block: int = MAX_BLOCK) -> Dict[str, Any]:
+    """
+    Every pair of rows sharing a key, over the blocks of 2..max_block rows,
+    with the size of the block it came from.
+    The pairs come from comparing the key-sorted rows with the rows d
+    places further on for d < max_block, so the cost is O(n * max_block)
+    rather than quadratic in the largest block.
+    """
+    order = np.lexsort((rows, keys))
+    rows, keys = rows[order], keys[order]
+    if len(rows):
+        fresh = np.ones(len(rows), dtype=bool)
+        fresh[1:] = (keys[1:] != keys[:-1]) | (rows[1:] != rows[:-1])
+        rows, keys = rows[fresh], keys[fresh]
+    _, sizes = np.unique(keys, return_counts=True)
+    big = sizes > max_block
+    keep = np.repeat(~big & (sizes > 1), sizes)
+    rows, keys, entry_sizes = rows[keep], keys[keep], np.repeat(sizes, sizes)[keep]
+    left: List[np.ndarray] = []
+    right: List[np.ndarray] = []
+    block_sizes: List[np.ndarray] = []
+    for d in range(1, min(max_block, int(sizes[~big].max(initial=1)))):
+        same = keys[:-d] == keys[d:]
+        if not same.any():
+            break
+        left.append(rows[:-d][same])
+        right.append(rows[d:][same])
+        block_sizes.append(entry_sizes[:-d][same])
+    a = np.concatenate(left) if left else np.zeros(0, dtype=np.int64)
+    b = np.concatenate(right) if right else np.zeros(0, dtype=np.int64)
+    return {"a": np.minimum(a, b), "b": np.maximum(a, b),
+            "size": np.concatenate(block_sizes) if block_sizes else np.zeros(0, dtype=np.int64),
+            "blocks": int((~big & (sizes > 1)).sum()), "skipped": int(big.sum()), "skipped_rows": int(sizes[big].sum())}
+
+
+def type_codes(df: "pd.DataFrame") -> np.ndarray:
+    """School type code per row (schoolTypeId, else schoolType), 0 where unknown."""
+    import pandas as pd
+
+    for col in ("schoolTypeId", "schoolType"):
+        if col in df.columns:
+            return pd.factorize(df[col].astype(object).where(df[col].notna(), None))[0] + 1
+    return np.zeros(len(df), dtype=np.int64)
+
+
+def candidate_pairs(df: "pd.DataFrame", max_block: int = MAX_BLOCK) -> Dict[str, Any]:
+    """
+    Unique candidate pairs (a < b, row positions, same school type) with an
+    evidence bit mask (EVIDENCE order) and the evidence weight per shared
+    key kind.
+    """
+    import pandas as pd
+
+    n = len(df)
+    keys: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+    names = df["name"].to_numpy(dtype=object) if "name" in df.columns else np.full(n, "", dtype=object)
+    if "regionId" in df.columns:
+        region_codes = pd.factorize(df["regionId"].to_numpy(dtype="float64", na_value=np.nan))[0] + 1
+    else:
+        region_codes = np.zeros(n, dtype=np.int64)  # 0: region unknown
+    token_rows, token_hashes_, numeric = name_tokens(names)
+    # school numbers identify a school however common they are
+    generic = stopwords(token_rows[~numeric], token_hashes_[~numeric], region_codes)
+    distinctive = ~is_generic(token_hashes_, region_codes[token_rows], generic)
+    token_codes = np.unique(token_hashes_[distinctive], return_inverse=True)[1].astype(np.int64)
+    keys["name"] = (token_rows[distinctive],
+                    token_codes * (int(region_codes.max(initial=0)) + 1) + region_codes[token_rows[distinctive]])
+    if "lat" in df.columns and "lng" in df.columns:
+        keys["cell"] = cell_keys(df["lat"].to_numpy(dtype="float64", na_value=np.nan),
+                                 df["lng"].to_numpy(dtype="float64", na_value=np.nan))
+    for kind, col in (("phone", "contacts_phones"), ("email", "contacts_emails")):
+        if col in df.columns:
+            keys[kind] = contact_keys(df[col].to_numpy(dtype=object), kind)
+    # a school and its own special class or branch share all of these; scope every key to the school type
+    types = type_codes(df)
+    keys = {kind: (rows, codes * (int(types.max(initial=0)) + 1) + types[rows]) for kind, (rows, codes) in keys.items()}
+
+    stats: Dict[str, Dict[str, int]] = {}
+    pair_keys: List[np.ndarray] = []
+    pair_kinds: List[np.ndarray] = []
+    pair_sizes: List[np.ndarray] = []
+    for kind, (rows, codes) in keys.items():
+        block = block_pairs(rows, codes, max_block)
+        stats[kind] = {"keys": len(rows), "blocks": block["blocks"], "skipped": block["skipped"],
+                       "skipped_rows": block["skipped_rows"], "pairs": len(block["a"])}
+        pair_keys.append(block["a"].astype(np.int64) * n + block["b"])
+        pair_kinds.append(np.full(len(block["a"]), EVIDENCE.index(kind), dtype=np.int64))
+        pair_sizes.append(block["size"])
+    flat = np.concatenate(pair_keys or [np.zeros(0, dtype=np.int64)])
+    kinds = np.concatenate(pair_kinds or [np.zeros(0, dtype=np.int64)])
+    sizes = np.concatenate(pair_sizes or [np.zeros(0, dtype=np.int64)])
+    order = np.argsort(flat, kind="stable")
+    flat, kinds, sizes = flat[order], kinds[order], sizes[order]
+    unique, starts = np.unique(flat, return_index=True)
+    evidence = np.bitwise_or.reduceat(np.left_shift(1, kinds), starts) if len(unique) else kinds
+    # a key shared by k schools is worth WEIGHTS[kind] / (k - 1) to each of their pairs
+    weights = {}
+    for kind, weight in WEIGHTS.items():
+        values = np.where(kinds == EVIDENCE.index(kind), weight / np.maximum(sizes - 1, 1), 0.0)
+        weights[kind] = np.maximum.reduceat(values, starts) if len(unique) else values
+    return {"a": unique // n if n else unique, "b": unique % n if n else unique, "evidence": evidence,
+            "weights": weights, "region": region_codes, "stopwords": generic, "stats": stats}
+
+
+def trigram_profiles(names: Sequence[Any], regions: np.ndarray,
+                     generic: Optional[Dict[str, np.ndarray]] = None) -> np.ndarray:
+    """
+    (len(names), PROFILE_SIZE) uint8 counts of hashed character trigrams
+    (word-boundary trigrams included). With `generic` (and the names'
+    region codes), stopwords are blanked out unless a name has nothing else.
+    """
+    codes = name_codes(names)
+    rows, hashes, starts, lengths, _ = token_hashes(codes)
+    blank = is_generic(hashes, regions[rows], generic) if generic is not None else np.zeros(len(rows), dtype=bool)
+    has_other = np.zeros(len(codes), dtype=bool)
+    has_other[rows[~blank]] = True
+    blank &= has_other[rows]
+    if blank.any():
+        starts, lengths = starts[blank], lengths[blank]
+        within = np.arange(int(lengths.sum())) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        codes.ravel()[np.repeat(starts, lengths) + within] = SPACE
+
+    letters = np.zeros((len(codes), codes.shape[1] + 2), dtype=bool)
+    letters[:, 1:-1] = (codes != SPACE) & (codes != 0)
+    chars = np.where(letters, np.pad(codes, ((0, 0), (1, 1))), SPACE).astype(np.uint64)
+    # a trigram centred on every letter: "ab" gives " ab" and "ab "
+    r, c = np.nonzero(letters[:, 1:-1])
+    tri = (chars[r, c] * np.uint64(31) + chars[r, c + 1]) * np.uint64(31) + chars[r, c + 2]
+    buckets = (tri % np.uint64(PROFILE_SIZE)).astype(np.int64)
+    counts = np.bincount(r * PROFILE_SIZE + buckets, minlength=len(codes) * PROFILE_SIZE)
+    return np.minimum(counts, 255).astype(np.uint8).reshape(len(codes), PROFILE_SIZE)
+
+
+def profile_similarity(profiles: np.ndarray, ia: np.ndarray, ib: np.ndarray, overlap: bool = False,
+                       chunk: int = PAIR_CHUNK) -> np.ndarray:
+    """
+    Weighted Jaccard of profiles[ia] and profiles[ib] (with `overlap`, the
+    intersection over the smaller profile instead), PAIR_CHUNK pairs at a time.
+    """
+    sims = np.zeros(len(ia), dtype=np.float32)
+    for start in range(0, len(ia), chunk):
+        pa_, pb_ = profiles[ia[start:start + chunk]], profiles[ib[start:start + chunk]]
+        inter = np.minimum(pa_, pb_).sum(axis=1, dtype=np.int32)
+        if overlap:
+            union = np.minimum(pa_.sum(axis=1, dtype=np.int32), pb_.sum(axis=1, dtype=np.int32))
+        else:
+            union = np.maximum(pa_, pb_).sum(axis=1, dtype=np.int32)
+        sims[start:start + chunk] = np.where(union > 0, inter / np.maximum(union, 1), 0)
+    return sims
+
+
+def name_signatures(names: Sequence[Any]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Per name, order-independent hashes of its number tokens and of its
+    QUALIFIERS words (0 when it has none).
+    """
+    rows, hashes, _, _, numeric = token_hashes(name_codes(names))
+    qualifier = np.isin(hashes, token_hashes(name_codes(QUALIFIERS))[1])
+    signatures = []
+    for picked in (numeric, qualifier):
+        signature = np.zeros(len(names), dtype=np.uint64)
+        with np.errstate(over="ignore"):
+            np.add.at(signature, rows[picked], hashes[picked] * np.uint64(0x9E3779B97F4A7C15) + np.uint64(1))
+        signatures.append(signature)
+    return signatures[0], signatures[1]
+
+
+def name_similarity(names: Sequence[Any], regions: np.ndarray, a: np.ndarray, b: np.ndarray,
+                    generic: Dict[str, np.ndarray]) -> np.ndarray:
+    """
+    Similarity of names[a] and names[b], profiled for the candidate rows
+    only: the full-name similarity, capped by the overlap of the
+    distinctive tokens when that is under DISTINCTIVE_MIN (an overlap, not
+    a Jaccard, because a typo in a generic word makes a new "distinctive"
+    token), and 0 when both names carry numbers and they differ, or when
+    their QUALIFIERS differ. So "X kənd tam orta məktəb" vs "Y kənd tam orta
+    məktəb" does not score high. "164 nömrəli məktəb" vs "164 nömrəli
+    məktəbin nəzdində xüsusi sinif" does; those two differ in school type
+    and are never candidates (see candidate_pairs).
+    """
+    used, inverse = np.unique(np.concatenate([a, b]), return_inverse=True)
+    ia, ib = inverse[:len(a)], inverse[len(a):]
+    names = np.asarray(names, dtype=object)
+    chunks = [used[s:s + NAME_CHUNK] for s in range(0, len(used), NAME_CHUNK)]
+    empty = np.zeros((0, PROFILE_SIZE), dtype=np.uint8)
+    full = np.concatenate([trigram_profiles(names[c], regions[c]) for c in chunks] or [empty])
+    distinctive = np.concatenate([trigram_profiles(names[c], regions[c], generic) for c in chunks] or [empty])
+    signatures = [name_signatures(names[c]) for c in chunks]
+    numbers = np.concatenate([n for n, _ in signatures] or [np.zeros(0, dtype=np.uint64)])
+    qualifiers = np.concatenate([q for _, q in signatures] or [np.zeros(0, dtype=np.uint64)])
+
+    sims = profile_similarity(full, ia, ib)
+    guard = profile_similarity(distinctive, ia, ib, overlap=True)
+    sims = np.where(guard >= DISTINCTIVE_MIN, sims, np.minimum(sims, guard))
+    sims[(numbers[ia] != 0) & (numbers[ib] != 0) & (numbers[ia] != numbers[ib])] = 0
+    sims[qualifiers[ia] != qualifiers[ib]] = 0
+    return sims
+
+
+def score_pairs(similarity: np.ndarray, weights: Dict[str, np.ndarray], same_region: np.ndarray) -> np.ndarray:
+    score = similarity.astype(np.float64)
+    for values in weights.values():
+        score = score + values
+    return score - OTHER_REGION_PENALTY * ~same_region
+
+
+def connected_components(n: int, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Component label (smallest row position) of every row, by min-label propagation with pointer jumping."""
+    labels = np.arange(n, dtype=np.int64)
+    while len(a):
+        low = np.minimum(labels[a], labels[b])
+        before = labels.copy()
+        np.minimum.at(labels, a, low)
+        np.minimum.at(labels, b, low)
+        labels = labels[labels]
+        if np.array_equal(labels, before):
+            break
+    return labels
+
+
+def find_duplicates(df: "pd.DataFrame", threshold: float = MATCH_THRESHOLD,
+                    max_block: int = MAX_BLOCK) -> Dict[str, Any]:
+    """
+    Cluster the schools of `df` (DEDUP_COLUMNS; missing ones are not used).
+    Returns {"clusters": DataFrame(id, cluster_id, cluster_size), "pairs":
+    DataFrame of matched pairs, "stats": per blocking key counts}.
+    """
+    import pandas as pd
+
+    n = len(df)
+    ids = df["id"].to_numpy() if "id" in df.columns else np.arange(n)
+    candidates = candidate_pairs(df, max_block)
+    a, b, evidence = candidates["a"], candidates["b"], candidates["evidence"]
+    names = df["name"].to_numpy(dtype=object) if "name" in df.columns else np.full(n, "", dtype=object)
+    region = candidates["region"]
+    similarity = name_similarity(names, region, a, b, candidates["stopwords"])
+    scores = score_pairs(similarity, candidates["weights"], (region[a] == region[b]) & (region[a] > 0))
+    matched = scores >= threshold
+
+    labels = connected_components(n, a[matched], b[matched])
+    sizes = np.bincount(labels, minlength=n)[labels]
+    # cluster id: the smallest school id in the cluster
+    order = np.lexsort((ids, labels))
+    first = np.ones(n, dtype=bool)
+    first[1:] = labels[order][1:] != labels[order][:-1]
+    smallest = np.empty(n, dtype=ids.dtype)
+    smallest[labels[order][first]] = ids[order][first]
+    clusters = pd.DataFrame({"id": ids, "cluster_id": smallest[labels], "cluster_size": sizes})
+
+    am, bm, ev = a[matched], b[matched], evidence[matched]
+    pairs = pd.DataFrame({
+        "id_a": ids[am], "id_b": ids[bm], "score": scores[matched].round(3),
+        "name_similarity": similarity[matched].round(3),
+        "shared": ["+".join(k for i, k in enumerate(EVIDENCE) if bits >> i & 1) for bits in ev.tolist()],
+        "cluster_id": smallest[labels[am]],
+    }).sort_values(["cluster_id", "id_a", "id_b"], kind="stable", ignore_index=True)
+    stats = candidates["stats"]
+    stats["total"] = {"schools": n, "candidates": len(a), "matched": int(matched.sum()),
+                      "clusters": int((np.bincount(labels, minlength=n) > 1).sum()),
+                      "duplicated_schools": int((sizes > 1).sum())}
+    return {"clusters": clusters, "pairs": pairs, "stats": stats}
+
+
+def print_summary(result: Dict[str, Any], df: Optional["pd.DataFrame"] = None, top: int = 10) -> None:
+    stats = result["stats"]
+    total = stats["total"]
+    for kind in EVIDENCE:
+        if kind in stats:
+            s = stats[kind]
+            print(f"[info] {kind:<5} {s['keys']:>8} keys, {s['blocks']:>7} blocks, {s['pairs']:>8} pairs"
+                  f" ({s['skipped']} blocks over {MAX_BLOCK} schools skipped, {s['skipped_rows']} keys)")
+    print(f"[info] {total['candidates']} candidate pairs (vs {total['schools'] * (total['schools'] - 1) // 2} "
+          f"all-pairs), {total['matched']} matched")
+    print(f"[ok] {total['duplicated_schools']} schools in {total['clusters']} duplicate clusters")
+    if df is None or not top:
+        return
+    names = dict(zip(df["id"].tolist(), df["name"].tolist())) if "name" in df.columns else {}
+    for cluster_id, group in list(result["pairs"].groupby("cluster_id", sort=False))[:top]:
+        members = sorted(set(group["id_a"]) | set(group["id_b"]))
+        print(f"  cluster {cluster_id} ({', '.join(sorted(set('+'.join(group['shared']).split('+'))))}):")
+        for member in members:
+            print(f"    {member}\t{names.get(member, '')}")
+
+
+def write_outputs(result: Dict[str, Any], clusters_path: str = OUT_CLUSTERS, pairs_path: str = OUT_PAIRS) -> None:
+    result["clusters"].to_csv(clusters_path, index=False, encoding="utf-8")
+    result["pairs"].to_csv(pairs_path, index=False, encoding="utf-8")
+    print(f"[ok] Saved {len(result['clusters'])} cluster ids -> {clusters_path}, "
+          f"{len(result['pairs'])} matched pairs -> {pairs_path}")
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Duplicate and near-duplicate schools in the export")
+    parser.add_argument("--threshold", type=float, default=MATCH_THRESHOLD, help="minimum pair score to link")
+    parser.add_argument("--max-block", type=int, default=MAX_BLOCK, help="skip blocking keys shared by more schools")
+    parser.add_argument("--top", type=int, default=10, help="print the first N clusters")
+    parser.add_argument("--clusters", default=OUT_CLUSTERS, help="cluster ids output")
+    parser.add_argument("--pairs", default=OUT_PAIRS, help="matched pairs output")
+    args = parser.parse_args(argv)
+
+    df = load_schools(columns=list(DEDUP_COLUMNS))
+    result = find_duplicates(df, args.threshold, args.max_block)
+    print_summary(result, df, args.top)
+    write_outputs(result, args.clusters, args.pairs)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+school_grid.py
+
+Density grid of the school coordinates.
+
+Points are binned once into a fixed lat/lng grid over Azerbaijan (BASE_CELL
+degrees per cell, the box of school_quality.AZ_BOUNDS) with one bincount
+over the flattened cell index: per cell the number of schools and how many
+of them have each GRID_FLAGS flag. Coarser resolutions (LEVELS) are block
+sums of that base grid, so every resolution comes from the same single pass
+and cells nest exactly. Points outside the box are counted, not binned.
+
+The grid is saved to schools_grid.npz (about 3 KB compressed whatever the
+number of schools) and reused while it is newer than the export. Chart 5
+draws a density heatmap and a per-cell e-journal adoption map from it, so
+its rendering cost depends on the grid size, not on the number of points:
+about 3-3.5s at any size, where the plain scatter of every school grows
+from 1.5s at a few hundred points to 5s at 20,000 and 15s at 100,000.
+Below SCATTER_MAX_POINTS located schools the scatter is the cheaper of the
+two, so chart_input hands the chart the points instead (the current export
+has about 300).
+
+Usage:
+ python school_grid.py --cell 0.1 --top 10
+ python school_cli.py grid --cell 0.05
+
+Requires:
+ pip install numpy pandas
+"""
+
+from typing import TYPE_CHECKING, Any, Dict, Optional, Sequence
+import argparse
+import os
+
+import numpy as np
+
+from school_data import CSV_PATH, OUT_PARQUET, load_schools
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+GRID_PATH = "schools_grid.npz"
+GRID_VERSION = 1
+GRID_ORIGIN = (38.3, 44.7)  # lat, lng of the south-west corner
+BASE_CELL = 0.025           # degrees
+GRID_SHAPE = (160, 256)     # up to 42.3 N, 51.1 E; both divisible by every level
+LEVELS: Sequence[int] = (1, 2, 4, 8, 16)  # coarsening factors: 0.025, 0.05, 0.1, 0.2, 0.4 degrees
+GRID_FLAGS: Sequence[str] = ("hasJurnal", "hasMeeting")
+DENSITY_LEVEL = 2   # chart 5 resolutions: fine for where schools are,
+ADOPTION_LEVEL = 8  # coarse enough for a rate to mean something
+SCATTER_MAX_POINTS = 10_000  # chart 5 scatters fewer located schools than this
+
+
+def bin_points(lat: Any, lng: Any, flags: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    The base grid for points (lat, lng); `flags` maps a name to a boolean
+    array aligned with the points. Missing and 0 coordinates are skipped.
+    """
+    lat = np.asarray(lat, dtype=np.float64)
+    lng = np.asarray(lng, dtype=np.float64)
+    known = np.isfinite(lat) & np.isfinite(lng) & (lat != 0) & (lng != 0)
+    row = np.floor((lat - GRID_ORIGIN[0]) / BASE_CELL)
+    col = np.floor((lng - GRID_ORIGIN[1]) / BASE_CELL)
+    inside = known & (row >= 0) & (row < GRID_SHAPE[0]) & (col >= 0) & (col < GRID_SHAPE[1])
+    cells = row[inside].astype(np.int64) * GRID_SHAPE[1] + col[inside].astype(np.int64)
+    size = GRID_SHAPE[0] * GRID_SHAPE[1]
+    grid: Dict[str, Any] = {
+        "version": GRID_VERSION,
+        "factor": 1,
+        "points": int(known.sum()),
+        "outside": int((known & ~inside).sum()),
+        "counts": np.bincount(cells, minlength=size).astype(np.int32).reshape(GRID_SHAPE),
+    }
+    for name, values in (flags or {}).items():
+        weights = np.asarray(values, dtype=bool)[inside]
+        grid[name] = np.bincount(cells, weights=weights, minlength=size).astype(np.int32).reshape(GRID_SHAPE)
+    return grid
+
+
+def build_grid(df: "pd.DataFrame") -> Dict[str, Any]:
+    """The base grid of an export frame (lat, lng and whichever GRID_FLAGS it has)."""
+    flags = {f: df[f].to_numpy(dtype=bool, na_value=False) for f in GRID_FLAGS if f in df.columns}
+    return bin_points(df["lat"].to_numpy(dtype="float64", na_value=np.nan),
+                      df["lng"].to_numpy(dtype="float64", na_value=np.nan), flags)
+
+
+def array_names(grid: Dict[str, Any]) -> list:
+    return [k for k, v in grid.items() if isinstance(v, np.ndarray)]
+
+
+def coarsen(grid: Dict[str, Any], factor: int) -> Dict[str, Any]:
+    """Sum `factor` x `factor` blocks of the base grid."""
+    if factor == 1:
+        return grid
+    rows, cols = GRID_SHAPE
+    out = {k: v for k, v in grid.items() if not isinstance(v, np.ndarray)}
+    out["factor"] = factor
+    for name in array_names(grid):
+        out[name] = grid[name].reshape(rows // factor, factor, cols // factor, factor).sum(axis=(1, 3))
+    return out
+
+
+def levels(grid: Dict[str, Any], factors: Sequence[int] = LEVELS) -> Dict[int, Dict[str, Any]]:
+    return {f: coarsen(grid, f) for f in factors}
+
+
+def cell_size(grid: Dict[str, Any]) -> float:
+    return BASE_CELL * grid["factor"]
+
+
+def extent(grid: Dict[str, Any]) -> list:
+    """[west, east, south, north] in degrees, for imshow."""
+    return [GRID_ORIGIN[1], GRID_ORIGIN[1] + GRID_SHAPE[1] * BASE_CELL,
+            GRID_ORIGIN[0], GRID_ORIGIN[0] + GRID_SHAPE[0] * BASE_CELL]
+
+
+def rate(grid: Dict[str, Any], flag: str = "hasJurnal") -> np.ndarray:
+    """Per-cell share (%) of schools with `flag`; NaN for empty cells."""
+    counts = grid["counts"]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(counts > 0, grid[flag] / counts * 100, np.nan)
+
+
+def save_grid(grid: Dict[str, Any], path: str = GRID_PATH) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as fh:
+        np.savez_compressed(fh, **{k: np.asarray(v) for k, v in grid.items()})
+    os.replace(tmp, path)
+
+
+def load_grid(path: str = GRID_PATH) -> Optional[Dict[str, Any]]:
+    try:
+        with np.load(path) as data:
+            grid = {k: (data[k] if data[k].ndim else data[k].item()) for k in data.files}
+    except (OSError, ValueError, KeyError):
+        return None
+    return grid if grid.get("version") == GRID_VERSION else None
+
+
+def load_or_build(path: str = GRID_PATH, df: Optional["pd.DataFrame"] = None) -> Dict[str, Any]:
+    """The saved base grid, rebuilt (from `df` when given, else the export) when the export is newer."""
+    sources = [p for p in (OUT_PARQUET, CSV_PATH) if os.path.exists(p)]
+    newest = max((os.path.getmtime(p) for p in sources), default=0)
+    if os.path.exists(path) and os.path.getmtime(path) >= newest:
+        grid = load_grid(path)
+        if grid is not None:
+            return grid
+    if df is None:
+        df = load_schools(columns=["lat", "lng", *GRID_FLAGS])
+    grid = build_grid(df)
+    save_grid(grid, path)
+    return grid
+
+
+def located(df: "pd.DataFrame") -> "pd.DataFrame":
+    """The rows bin_points would place: known, non-zero coordinates."""
+    lat = df["lat"].to_numpy(dtype="float64", na_value=np.nan)
+    lng = df["lng"].to_numpy(dtype="float64", na_value=np.nan)
+    return df[np.isfinite(lat) & np.isfinite(lng) & (lat != 0) & (lng != 0)]
+
+
+def chart_input(grid: Dict[str, Any], density_level: int = DENSITY_LEVEL,
+                adoption_level: int = ADOPTION_LEVEL, df: Optional["pd.DataFrame"] = None) -> Dict[str, Any]:
+    """
+    Chart 5 input: plain lists, so the chart cache can hash them. With `df`
+    and fewer than SCATTER_MAX_POINTS located schools, the points themselves
+    (lat, lng, hasJurnal) for a scatter; the two grid levels otherwise.
+    """
+    if df is not None and grid["points"] < SCATTER_MAX_POINTS:
+        points = located(df)
+        return {
+            "points": len(points),
+            "lat": points["lat"].astype("float64").tolist(),
+            "lng": points["lng"].astype("float64").tolist(),
+            "hasJurnal": points["hasJurnal"].to_numpy(dtype=bool, na_value=False).astype(int).tolist(),
+        }
+    density, adoption = coarsen(grid, density_level), coarsen(grid, adoption_level)
+    return {
+        "extent": extent(grid),
+        "points": grid["points"],
+        "outside": grid["outside"],
+        "density": {"cell": cell_size(density), "counts": density["counts"].tolist()},
+        "adoption": {"cell": cell_size(adoption), "counts": adoption["counts"].tolist(),
+                     "hasJurnal": adoption["hasJurnal"].tolist()},
+    }
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Density grid of the exported coordinates")
+    parser.add_argument("--cell", type=float, default=BASE_CELL * ADOPTION_LEVEL,
+                        help=f"cell size in degrees ({', '.join(f'{BASE_CELL * f:g}' for f in LEVELS)})")
+    parser.add_argument("--top", type=int, default=10, help="print the N busiest cells")
+    parser.add_argument("--grid", default=GRID_PATH, help="saved grid file")
+    args = parser.parse_args(argv)
+
+    factors = {round(BASE_CELL * f, 6): f for f in LEVELS}
+    if round(args.cell, 6) not in factors:
+        parser.error(f"--cell must be one of {', '.join(f'{c:g}' for c in factors)}")
+    base = load_or_build(args.grid)
+    grid = coarsen(base, factors[round(args.cell, 6)])
+    counts = grid["counts"]
+    print(f"[info] {base['points']} schools with coordinates ({base['outside']} outside the grid), "
+          f"{int((counts > 0).sum())} of {counts.size} cells of {args.cell:g} degrees occupied")
+    journal = rate(grid, "hasJurnal") if "hasJurnal" in grid else None
+    for flat in np.argsort(counts, axis=None, kind="stable")[::-1][:args.top]:
+        r, c = np.unravel_index(flat, counts.shape)
+        if not counts[r, c]:
+            break
+        lat = GRID_ORIGIN[0] + (r + 0.5) * args.cell
+        lng = GRID_ORIGIN[1] + (c + 0.5) * args.cell
+        adoption = f"\t{journal[r, c]:5.1f}% e-journal" if journal is not None else ""
+        print(f"{lat:.3f}, {lng:.3f}\t{counts[r, c]} schools{adoption}")
+
+
+if __name__ == "__main__":
+    main()
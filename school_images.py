@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+school_images.py
+
+Downloads the school photos referenced by `imageToken` and makes thumbnails.
+
+Images are fetched by IMAGE_WORKERS threads sharing one pooled keep-alive
+session (schools.make_session) and stored content-addressed:
+
+ - images/objects/<2 hex>/<sha256>.<ext>   one file per distinct image
+ - images/thumbs/<sha256>_<size>.jpg       JPEG thumbnails (Pillow)
+ - images/tokens.tsv                       token -> sha256, ext, bytes
+
+Two tokens with the same bytes share one object. tokens.tsv is appended
+(and flushed) as each download lands and a body is only moved into
+objects/ once complete, so an interrupted sync resumes where it stopped:
+tokens already in the log with their object on disk are not requested
+again. A 404 is logged as missing and not retried on the next run
+(--retry-missing does). Thumbnails are resized in a process pool, once per
+distinct image, and skipped when they already exist.
+
+The download URL is IMAGE_URL with {token} filled in; --image-url
+overrides it.
+
+Usage:
+ python school_images.py
+ python school_images.py --workers 16 --thumb-size 128 256
+ python schools.py --images
+ python school_cli.py images --no-thumbnails
+
+Requires:
+ pip install requests pandas
+ (optional: pillow, for thumbnails)
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+import argparse
+import hashlib
+import os
+import random
+import sys
+import time
+
+import pipeline_metrics
+
+IMAGE_DIR = "images"
+IMAGE_URL = "https://digital.edu.az/backend-api/files/{token}"
+IMAGE_WORKERS = 8
+IMAGE_TIMEOUT = 30
+THUMB_SIZES: Sequence[int] = (256,)
+THUMB_QUALITY = 85
+LOG_NAME = "tokens.tsv"
+MISSING = "-"
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+CONTENT_TYPES = {"image/jpeg": ".jpeg", "image/png": ".png", "image/gif": ".gif", "image/webp": ".webp"}
+
+
+def object_path(store: str, digest: str, ext: str) -> str:
+    return os.path.join(store, "objects", digest[:2], digest + ext)
+
+
+def thumb_path(store: str, digest: str, size: int) -> str:
+    return os.path.join(store, "thumbs", f"{digest}_{size}.jpg")
+
+
+def read_log(store: str = IMAGE_DIR) -> Dict[str, Tuple[str, str, int]]:
+    """token -> (sha256 or MISSING, ext, bytes); later lines win."""
+    entries: Dict[str, Tuple[str, str, int]] = {}
+    try:
+        with open(os.path.join(store, LOG_NAME), encoding="utf-8") as fh:
+            for line in fh:
+                parts = line.rstrip("\n").split("\t")
+                if len(parts) == 4 and parts[3].isdigit():
+                    entries[parts[0]] = (parts[1], parts[2], int(parts[3]))
+    except OSError:
+        pass
+    return entries
+
+
+def token_ext(token: str, content_type: str = "") -> str:
+    ext = os.path.splitext(token)[1].lower()
+    if ext and len(ext) <= 6 and ext[1:].isalnum():
+        return ext
+    return CONTENT_TYPES.get(content_type.split(";")[0].strip().lower(), "")
+
+
+def download(session: Any, url: str, tmp_path: str, backoff: float = 2.0,
+             retries: int = 4) -> Optional[Tuple[str, str, int]]:
+    """
+    Stream `url` into `tmp_path`, hashing as it goes. Returns (sha256,
+    content type, bytes), or None for a 404. Other failures are retried
+    with full-jitter backoff, as schools.fetch_page does.
+    """
+    last_exc = None
+    for attempt in range(1, retries + 1):
+        try:
+            with session.get(url, timeout=IMAGE_TIMEOUT, stream=True) as resp:
+                pipeline_metrics.count("requests")
+                if resp.status_code == 404:
+                    return None
+                resp.raise_for_status()
+                digest, size = hashlib.sha256(), 0
+                with open(tmp_path, "wb") as fh:
+                    for chunk in resp.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                        digest.update(chunk)
+                        fh.write(chunk)
+                        size += len(chunk)
+                return digest.hexdigest(), resp.headers.get("Content-Type", ""), size
+        except Exception as e:
+            last_exc = e
+            pipeline_metrics.count("retries")
+            if attempt == retries:
+                break
+            time.sleep(random.uniform(0, backoff ** attempt))
+    raise RuntimeError(f"Failed to fetch {url} after {retries} attempts: {last_exc}")
+
+
+def unique_tokens(tokens: Iterable[Any]) -> List[str]:
+    return list(dict.fromkeys(t for t in tokens if isinstance(t, str) and t))
+
+
+def record_download(store: str, log_fh: Any, stats: Dict[str, Any], token: str, tmp_path: str, fut: Any) -> None:
+    """Move a finished download into objects/ (unless its content is already there) and log it."""
+    try:
+        result = fut.result()
+    except RuntimeError as e:
+        stats["failed"] += 1
+        print(f"[warn] {e}", file=sys.stderr)
+        return
+    if result is None:
+        stats["missing"] += 1
+        log_fh.write(f"{token}\t{MISSING}\t\t0\n")
+        log_fh.flush()
+        return
+    digest, content_type, size = result
+    ext = token_ext(token, content_type)
+    path = object_path(store, digest, ext)
+    stats["downloaded"] += 1
+    stats["bytes"] += size
+    if os.path.exists(path):
+        stats["duplicates"] += 1
+        stats["duplicate_bytes"] += size
+        os.remove(tmp_path)
+    else:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(tmp_path, path)
+    log_fh.write(f"{token}\t{digest}\t{ext}\t{size}\n")
+    log_fh.flush()
+
+
+def sync_images(tokens: Iterable[Any], store: str = IMAGE_DIR, image_url: str = IMAGE_URL,
+                workers: int = IMAGE_WORKERS, retry_missing: bool = False, session: Any = None,
+                backoff: float = 2.0) -> Dict[str, Any]:
+    """
+    Download every token not yet in the store. Returns the run statistics
+    (downloaded, bytes, seconds, present, present_bytes, duplicates,
+    duplicate_bytes, missing, failed, repeated).
+    """
+    import schools
+
+    tokens = list(tokens)
+    wanted = unique_tokens(tokens)
+    tmp_dir = os.path.join(store, "tmp")
+    os.makedirs(tmp_dir, exist_ok=True)
+    for name in os.listdir(tmp_dir):
+        # bodies of downloads cut off by an interrupted run
+        os.remove(os.path.join(tmp_dir, name))
+    log = read_log(store)
+    stats = {"tokens": len(wanted), "repeated": len([t for t in tokens if isinstance(t, str) and t]) - len(wanted),
+             "downloaded": 0, "bytes": 0, "present": 0, "present_bytes": 0, "duplicates": 0,
+             "duplicate_bytes": 0, "missing": 0, "failed": 0}
+    pending = []
+    for token in wanted:
+        entry = log.get(token)
+        if entry is not None and entry[0] == MISSING and not retry_missing:
+            stats["missing"] += 1
+        elif entry is not None and entry[0] != MISSING and os.path.exists(object_path(store, entry[0], entry[1])):
+            stats["present"] += 1
+            stats["present_bytes"] += entry[2]
+        else:
+            pending.append(token)
+
+    session = session or schools.make_session(workers)
+    start = time.perf_counter()
+    with open(os.path.join(store, LOG_NAME), "a", encoding="utf-8") as log_fh, \
+            ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(download, session, image_url.format(token=token),
+                               os.path.join(tmp_dir, f"{i}.part"), backoff): (i, token)
+                   for i, token in enumerate(pending)}
+        try:
+            for fut in as_completed(futures):
+                i, token = futures[fut]
+                record_download(store, log_fh, stats, token, os.path.join(tmp_dir, f"{i}.part"), fut)
+        except BaseException:
+            # Ctrl-C: drop the queued downloads; everything logged so far is kept
+            pool.shutdown(wait=True, cancel_futures=True)
+            raise
+    stats["seconds"] = time.perf_counter() - start
+    for key in ("downloaded", "bytes", "duplicates", "duplicate_bytes", "missing", "failed"):
+        pipeline_metrics.count(key, stats[key])
+    return stats
+
+
+def make_thumbnail(src: str, dests: Sequence[Tuple[int, str]]) -> int:
+    """Worker: write `src` resized to fit each (size, path). Returns the number written."""
+    from PIL import Image
+
+    try:
+        with Image.open(src) as img:
+            img = img.convert("RGB")
+            for size, path in dests:
+                thumb = img.copy()
+                thumb.thumbnail((size, size))
+                thumb.save(f"{path}.tmp", "JPEG", quality=THUMB_QUALITY, optimize=True)
+                os.replace(f"{path}.tmp", path)
+    except OSError:
+        # not an image Pillow can read (or a truncated one)
+        return 0
+    return len(dests)
+
+
+def make_thumbnails(store: str = IMAGE_DIR, sizes: Sequence[int] = THUMB_SIZES,
+                    processes: Optional[int] = None) -> Dict[str, int]:
+    """Thumbnails for every stored image lacking one, in a process pool."""
+    try:
+        import PIL  # noqa: F401
+    except ImportError:
+        print("[warn] Pillow is not installed; thumbnails skipped (pip install pillow)")
+        return {"thumbnails": 0, "unreadable": 0}
+    os.makedirs(os.path.join(store, "thumbs"), exist_ok=True)
+    objects = {(digest, ext) for digest, ext, _ in read_log(store).values() if digest != MISSING}
+    jobs = []
+    for digest, ext in sorted(objects):
+        dests = [(size, thumb_path(store, digest, size)) for size in sizes
+                 if not os.path.exists(thumb_path(store, digest, size))]
+        if dests and os.path.exists(object_path(store, digest, ext)):
+            jobs.append((object_path(store, digest, ext), dests))
+    written = unreadable = 0
+    if jobs:
+        with ProcessPoolExecutor(max_workers=processes or os.cpu_count() or 1) as pool:
+            results = pool.map(make_thumbnail, [src for src, _ in jobs], [dests for _, dests in jobs],
+                               chunksize=max(1, len(jobs) // (4 * (processes or os.cpu_count() or 1))))
+            for n in results:
+                written += n
+                unreadable += n == 0
+    pipeline_metrics.count("thumbnails", written)
+    return {"thumbnails": written, "unreadable": unreadable}
+
+
+def export_tokens() -> List[str]:
+    from school_data import load_schools
+
+    return unique_tokens(load_schools(columns=["imageToken"])["imageToken"].tolist())
+
+
+def print_report(stats: Dict[str, Any]) -> None:
+    seconds = stats["seconds"]
+    mb = stats["bytes"] / 1e6
+    print(f"[ok] {stats['downloaded']} image(s) downloaded, {mb:.1f} MB in {seconds:.2f}s "
+          f"({mb / seconds if seconds > 0 else 0:.1f} MB/s, {stats['downloaded'] / seconds if seconds > 0 else 0:.1f} images/s)")
+    print(f"[info] {stats['present']} already present ({stats['present_bytes'] / 1e6:.1f} MB not re-fetched), "
+          f"{stats['repeated']} repeated token(s) fetched once, {stats['duplicates']} duplicate image(s) "
+          f"({stats['duplicate_bytes'] / 1e6:.1f} MB saved by content addressing), "
+          f"{stats['missing']} missing, {stats['failed']} failed")
+
+
+def sync_export(store: str = IMAGE_DIR, image_url: str = IMAGE_URL, workers: int = IMAGE_WORKERS,
+                thumb_sizes: Sequence[int] = THUMB_SIZES, retry_missing: bool = False) -> Dict[str, Any]:
+    """Images (and thumbnails, unless thumb_sizes is empty) for the export on disk."""
+    tokens = export_tokens()
+    print(f"[info] Syncing {len(tokens)} image token(s) -> {store}/")
+    with pipeline_metrics.stage("images", tokens=len(tokens)):
+        stats = sync_images(tokens, store, image_url, workers, retry_missing)
+    print_report(stats)
+    if thumb_sizes:
+        with pipeline_metrics.stage("thumbnails"):
+            thumbs = make_thumbnails(store, thumb_sizes)
+        stats.update(thumbs)
+        print(f"[ok] {thumbs['thumbnails']} thumbnail(s) written ({thumbs['unreadable']} unreadable image(s))")
+    return stats
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description="Download school images and make thumbnails")
+    parser.add_argument("--store", default=IMAGE_DIR, help="image directory")
+    parser.add_argument("--image-url", default=IMAGE_URL, help="download URL template with {token}")
+    parser.add_argument("--workers", type=int, default=IMAGE_WORKERS, help="concurrent downloads")
+    parser.add_argument("--thumb-size", type=int, nargs="+", default=list(THUMB_SIZES), metavar="PX",
+                        help="thumbnail bounding box(es) in pixels")
+    parser.add_argument("--no-thumbnails", action="store_true")
+    parser.add_argument("--retry-missing", action="store_true", help="request tokens that answered 404 before")
+    args = parser.parse_args(argv)
+    sync_export(args.store, args.image_url, args.workers, [] if args.no_thumbnails else args.thumb_size,
+                args.retry_missing)
+
+
+if __name__ == "__main__":
+    main()
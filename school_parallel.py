@@ -0,0 +1,180 @@
+"""
+school_parallel.py
+
+Multi-process prepare_rows for large feeds.
+
+The record list is cut into shards of PARALLEL_SHARD_SIZE and each shard is
+normalized by schools.prepare_rows in a worker process. Instead of sending
+the rows back as pickled dicts, a worker turns its shard into columns and
+returns one LZ4-compressed Arrow IPC record batch: a typed array per column
+(string, int64, float64, bool) with nulls for missing values. Only columns holding a
+mix of types travel as plain Python lists. Workers are started with
+"forkserver" where the platform has it (the platform default otherwise),
+never by forking the parent: the pipeline_metrics sampler thread may be
+running, and a fork taken while it holds a lock deadlocks the child. Each
+worker therefore receives its shard's records pickled.
+
+The parent concatenates the shards column by column, in input order, and
+converts them the way pd.DataFrame(rows) would have typed them (int columns
+with gaps become float64, bool columns with gaps object, ...), so the frame
+and the CSV written from it match the serial build_frame(prepare_rows(...)).
+
+Starting the pool and shipping shards costs more than it saves on small
+feeds: benchmarks.py parallel measured 0.75-1.02x the serial path below
+PARALLEL_MIN_ROWS records or with fewer than PARALLEL_MIN_CPUS CPUs, so
+use_processes() is False there and schools.py --processes prepares rows
+in-process instead.
+
+Requires:
+ pip install pandas pyarrow
+"""
+
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import os
+
+import pandas as pd
+
+PARALLEL_SHARD_SIZE = 20_000
+PARALLEL_MIN_ROWS = 2 * PARALLEL_SHARD_SIZE  # fewer rows leave all but one worker idle
+PARALLEL_MIN_CPUS = 2
+MISSING = float("nan")
+IPC_COMPRESSION = "lz4"
+
+
+def arrow_type(values: List[Any]) -> Any:
+    """The Arrow type for a column of Python values, or None when they are mixed."""
+    import pyarrow as pa
+
+    kinds = {type(v) for v in values}
+    kinds.discard(type(None))
+    if kinds == {str}:
+        return pa.string()
+    if kinds == {bool}:
+        return pa.bool_()
+    if kinds == {int}:
+        return pa.int64()
+    if kinds and kinds <= {int, float}:
+        return pa.float64()
+    if not kinds:
+        return pa.null()
+    return None
+
+
+def encode_rows(rows: List[Dict[str, Any]]) -> Tuple[bytes, Dict[str, List[Any]]]:
+    """
+    A shard of rows as (Arrow IPC stream holding the typed columns,
+    {column: values} for the columns Arrow cannot type).
+    """
+    import pyarrow as pa
+
+    columns: Dict[str, None] = {}
+    for row in rows:
+        columns.update(dict.fromkeys(row))
+    arrays, names, mixed = [], [], {}
+    for col in columns:
+        values = [row.get(col) for row in rows]
+        typ = arrow_type(values)
+        if typ is not None:
+            try:
+                arrays.append(pa.array(values, type=typ))
+                names.append(col)
+                continue
+            except (pa.ArrowException, OverflowError):
+                pass
+        # NaN for a missing key, as pd.DataFrame(rows) has it; None stays None
+        mixed[col] = [row.get(col, MISSING) for row in rows]
+    batch = pa.RecordBatch.from_arrays(arrays, names=names) if arrays else pa.RecordBatch.from_pydict({})
+    sink = pa.BufferOutputStream()
+    # sparse extra columns are mostly nulls and offsets; LZ4 shrinks a shard ~5x for ~1 ms per MB
+    options = pa.ipc.IpcWriteOptions(compression=IPC_COMPRESSION if pa.Codec.is_available(IPC_COMPRESSION) else None)
+    with pa.ipc.new_stream(sink, batch.schema, options=options) as writer:
+        writer.write_batch(batch)
+    return sink.getvalue().to_pybytes(), mixed
+
+
+def prepare_shard(records: Sequence[Any]) -> Tuple[int, bytes, Dict[str, List[Any]]]:
+    """Worker: normalize a shard of records and encode it."""
+    import schools
+
+    rows = schools.prepare_rows(records)
+    return (len(rows),) + encode_rows(rows)
+
+
+def decode_shard(n_rows: int, data: bytes, mixed: Dict[str, List[Any]]) -> Tuple[int, Dict[str, Any]]:
+    import pyarrow as pa
+
+    batch = pa.ipc.open_stream(data).read_next_batch()
+    out: Dict[str, Any] = {name: batch.column(i) for i, name in enumerate(batch.schema.names)}
+    out.update(mixed)
+    return n_rows, out
+
+
+def merge_column(parts: List[Any], sizes: List[int]) -> pd.Series:
+    """
+    One column from its per-shard parts (Arrow array, list of values, or
+    None where the shard never had the column), typed as pd.DataFrame(rows)
+    would type it.
+    """
+    import pyarrow as pa
+
+    types = {p.type for p in parts if isinstance(p, pa.Array) and p.type != pa.null()}
+    if types == {pa.int64(), pa.float64()}:
+        types = {pa.float64()}
+    if len(types) <= 1 and all(p is None or isinstance(p, pa.Array) for p in parts):
+        typ = types.pop() if types else pa.null()
+        chunks = [p.cast(typ) if p is not None else pa.nulls(n, typ) for p, n in zip(parts, sizes)]
+        if typ == pa.null():
+            return pd.Series(MISSING, index=range(sum(sizes)), dtype="float64")
+        return pa.chunked_array(chunks, type=typ).to_pandas()
+    values: List[Any] = []
+    for part, n in zip(parts, sizes):
+        if part is None:
+            values.extend([MISSING] * n)
+        else:
+            values.extend(part.to_pylist() if isinstance(part, pa.Array) else part)
+    return pd.Series(values)
+
+
+def shard_bounds(n: int, shard_size: int) -> List[Tuple[int, int]]:
+    return [(start, min(start + shard_size, n)) for start in range(0, n, shard_size)]
+
+
+def use_processes(n_records: int, processes: Optional[int] = None) -> bool:
+    """Whether prepare_frame_parallel can be expected to beat the serial path."""
+    processes = min(processes or os.cpu_count() or 1, os.cpu_count() or 1)
+    return n_records >= PARALLEL_MIN_ROWS and processes >= PARALLEL_MIN_CPUS
+
+
+def mp_context() -> Any:
+    """forkserver where available, else the platform default; never fork (see module docstring)."""
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else None)
+
+
+def prepare_frame_parallel(records: Sequence[Any], processes: Optional[int] = None,
+                           shard_size: int = PARALLEL_SHARD_SIZE) -> pd.DataFrame:
+    """
+    build_frame(prepare_rows(records)), computed in `processes` worker
+    processes (default: one per CPU). Row order and columns are the same.
+    Slower than the serial path on small feeds; see use_processes().
+    """
+    import schools
+
+    records = records if isinstance(records, list) else list(records)
+    processes = processes or os.cpu_count() or 1
+    bounds = shard_bounds(len(records), shard_size)
+    with ProcessPoolExecutor(max_workers=min(processes, max(1, len(bounds))), mp_context=mp_context()) as pool:
+        jobs = [records[start:stop] for start, stop in bounds]
+        decoded = [decode_shard(*result) for result in pool.map(prepare_shard, jobs)]
+
+    sizes = [n for n, _ in decoded]
+    shards = [shard for _, shard in decoded]
+    seen: Dict[str, None] = {}
+    for shard in shards:
+        seen.update(dict.fromkeys(shard))
+    extra_keys = sorted(set(seen) - set(schools.REQUESTED_COLUMNS))
+    columns = list(schools.REQUESTED_COLUMNS) + extra_keys
+    data = {col: merge_column([shard.get(col) for shard in shards], sizes) for col in columns}
+    return pd.DataFrame(data, columns=columns)
@@ -0,0 +1,339 @@
+"""
+school_quality.py
+
+Declarative data-quality rules, checked batch by batch during the export.
+
+Each entry of RULES names a check kind (registered with @check) and its
+parameters; a check takes a batch DataFrame and returns a boolean
+violation mask, evaluated with vectorized pandas string / numeric
+operations. schools.py feeds every chunk it writes (or the built frame in
+VALIDATION_BATCH slices) to validate_batch, so the rules ride along with
+normalization instead of re-reading the export. Uniqueness rules keep just
+the key column of each batch and resolve duplicates in finish_validation.
+
+Outputs (next to schools.csv):
+ - schools_quality.csv   one row per violation: row, id, rule, column, value
+ - schools_quality.json  per-rule violation counts and rates
+
+Counters quality_<rule> are added to the run report (pipeline_metrics).
+"""
+
+from typing import Any, Callable, Dict, List, Optional, Sequence
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+import pipeline_metrics
+
+QUALITY_CSV = "schools_quality.csv"
+QUALITY_JSON = "schools_quality.json"
+VALIDATION_BATCH = 50_000
+MAX_VIOLATION_ROWS = 100_000  # per rule; the counts stay exact beyond it
+
+# Azerbaijan incl. Nakhchivan, with a small margin
+AZ_BOUNDS = {"lat": (38.3, 42.0), "lng": (44.7, 50.9)}
+EMAIL_PATTERN = r"[^@\s;,<>]+@[^@\s;,<>]+\.[A-Za-z]{2,}"
+PHONE_PATTERN = r"\+?[\d(][\d\s\-()]{5,18}\d"
+PHONE_MIN_DIGITS = 7
+URL_PATTERN = r"(?i)(?:https?://)?(?:[\w-]+\.)+[a-z]{2,}(?::\d+)?(?:/\S*)?"
+NULL_PLACEHOLDERS = frozenset({"", "-", "--", "—", "yox", "yoxdu", "yoxdur", "none", "null", "nan", "n/a", "na", "0"})
+
+RULES: List[Dict[str, Any]] = [
+    {"rule": "id_missing", "check": "missing", "column": "id",
+     "description": "school id is missing"},
+    {"rule": "name_missing", "check": "missing", "column": "name",
+     "description": "school name is missing"},
+    {"rule": "id_duplicate", "check": "unique", "column": "id",
+     "description": "id already used by an earlier row"},
+    {"rule": "utisCode_duplicate", "check": "unique", "column": "utisCode",
+     "description": "utisCode already used by an earlier row"},
+    {"rule": "coords_missing", "check": "coords_missing", "columns": ["lat", "lng"],
+     "description": "lat/lng missing or 0"},
+    {"rule": "coords_outside_az", "check": "bounds", "columns": ["lat", "lng"], "bounds": AZ_BOUNDS,
+     "description": "coordinates outside Azerbaijan's bounding box"},
+    {"rule": "coords_swapped", "check": "swapped", "columns": ["lat", "lng"], "bounds": AZ_BOUNDS,
+     "description": "lat and lng look swapped"},
+    {"rule": "email_format", "check": "pattern", "column": "contacts_emails", "separator": ";",
+     "pattern": EMAIL_PATTERN, "description": "a contacts_emails value is not an email address"},
+    {"rule": "phone_format", "check": "pattern", "column": "contacts_phones", "separator": "|",
+     "pattern": PHONE_PATTERN, "min_digits": PHONE_MIN_DIGITS,
+     "description": "a contacts_phones value is not a phone number"},
+    {"rule": "email_repeated", "check": "repeated", "column": "contacts_emails", "separator": ";",
+     "description": "the same email is listed twice for a school"},
+    {"rule": "phone_repeated", "check": "repeated", "column": "contacts_phones", "separator": "|",
+     "description": "the same phone is listed twice for a school"},
+    {"rule": "url_format", "check": "pattern", "column": "siteUrl", "separator": None, "pattern": URL_PATTERN,
+     "description": "siteUrl is not a URL"},
+    {"rule": "null_placeholder", "check": "placeholder",
+     "columns": ["name", "address", "contacts_phones", "contacts_emails", "siteUrl"],
+     "description": "blank or placeholder text ('-', 'yox', ...) where a null is meant"},
+]
+
+CHECKS: Dict[str, Callable[..., Any]] = {}
+
+
+def check(kind: str) -> Callable:
+    """
+    Register a check kind. A check gets (batch, rule, state, cache) and
+    returns a boolean Series over the batch's rows, or a boolean DataFrame
+    with one column per rule column when it can tell which cell is at fault.
+    `state` is the rule's own dict, kept across batches; `cache` is shared
+    by the rules of one batch (see split_values).
+    """
+    def register(fn: Callable) -> Callable:
+        CHECKS[kind] = fn
+        return fn
+    return register
+
+
+def text(series: pd.Series) -> pd.Series:
+    """Values as trimmed strings; nulls and "" both become NA."""
+    s = series.astype("string").str.strip()
+    return s.mask(s == "")
+
+
+def present(series: pd.Series) -> pd.Series:
+    """True where a value is really there: not null, blank or a placeholder like '-' / 'yox'."""
+    s = text(series)
+    return (s.notna() & ~s.str.lower().isin(NULL_PLACEHOLDERS)).fillna(False).astype(bool)
+
+
+def split_values(batch: pd.DataFrame, column: str, separator: Optional[str], cache: Dict[Any, Any]) -> pd.Series:
+    """One trimmed value per row of the result, indexed by the source row; empty pieces dropped."""
+    key = ("split", column, separator)
+    if key not in cache:
+        s = text(batch[column]).dropna()
+        if separator is not None:
+            # most cells hold one value; only the others go through split / explode
+            several = s.str.contains(separator, regex=False).to_numpy(dtype=bool)
+            if several.any():
+                pieces = s[several].str.split(separator, regex=False).explode().str.strip()
+                s = pd.concat([s[~several], pieces[pieces.fillna("") != ""].astype(s.dtype)]).sort_index(kind="stable")
+        cache[key] = s
+    return cache[key]
+
+
+@check("missing")
+def check_missing(batch: pd.DataFrame, rule: Dict[str, Any], state: Dict[str, Any],
+                  cache: Dict[Any, Any]) -> pd.Series:
+    values = batch[rule["column"]]
+    return text(values).isna() if values.dtype == object or pd.api.types.is_string_dtype(values) else values.isna()
+
+
+@check("coords_missing")
+def check_coords_missing(batch: pd.DataFrame, rule: Dict[str, Any], state: Dict[str, Any],
+                         cache: Dict[Any, Any]) -> pd.Series:
+    lat, lng = (pd.to_numeric(batch[c], errors="coerce") for c in rule["columns"])
+    return (lat.isna() | lng.isna() | (lat == 0) | (lng == 0)).fillna(True)
+
+
+def inside(lat: pd.Series, lng: pd.Series, bounds: Dict[str, Any]) -> pd.Series:
+    return lat.between(*bounds["lat"]) & lng.between(*bounds["lng"])
+
+
+@check("bounds")
+def check_bounds(batch: pd.DataFrame, rule: Dict[str, Any], state: Dict[str, Any],
+                 cache: Dict[Any, Any]) -> pd.Series:
+    lat, lng = (pd.to_numeric(batch[c], errors="coerce") for c in rule["columns"])
+    known = lat.notna() & lng.notna() & (lat != 0) & (lng != 0)
+    return (known & ~inside(lat, lng, rule["bounds"])).fillna(False)
+
+
+@check("swapped")
+def check_swapped(batch: pd.DataFrame, rule: Dict[str, Any], state: Dict[str, Any],
+                  cache: Dict[Any, Any]) -> pd.Series:
+    lat, lng = (pd.to_numeric(batch[c], errors="coerce") for c in rule["columns"])
+    return (~inside(lat, lng, rule["bounds"]) & inside(lng, lat, rule["bounds"])).fillna(False)
+
+
+@check("pattern")
+def check_pattern(batch: pd.DataFrame, rule: Dict[str, Any], state: Dict[str, Any],
+                  cache: Dict[Any, Any]) -> pd.Series:
+    values = split_values(batch, rule["column"], rule["separator"], cache)
+    values = values[~values.str.lower().isin(NULL_PLACEHOLDERS)]
+    bad = values.index[~pattern_ok(values, rule)]
+    return pd.Series(batch.index.isin(bad), index=batch.index)
+
+
+def pattern_ok(values: pd.Series, rule: Dict[str, Any]) -> np.ndarray:
+    """Which split values pass a "pattern" rule: its pattern and, if set, its minimum digit count."""
+    ok = values.str.fullmatch(rule["pattern"]).fillna(False)
+    if rule.get("min_digits"):
+        ok &= values.str.replace(r"\D", "", regex=True).str.len() >= rule["min_digits"]
+    return ok.to_numpy(dtype=bool)
+
+
+def has_valid(df: pd.DataFrame, rule_name: str) -> pd.Series:
+    """
+    True where at least one value in the column of "pattern" rule
+    `rule_name` passes it, i.e. holds a contact the quality report accepts.
+    Blank, placeholder ('-', 'yox') and malformed ('.') values do not count.
+    """
+    rule = next(r for r in RULES if r["rule"] == rule_name)
+    values = split_values(df, rule["column"], rule["separator"], {})
+    return pd.Series(df.index.isin(values.index[pattern_ok(values, rule)]), index=df.index)
+
+
+@check("repeated")
+def check_repeated(batch: pd.DataFrame, rule: Dict[str, Any], state: Dict[str, Any],
+                   cache: Dict[Any, Any]) -> pd.Series:
+    values = split_values(batch, rule["column"], rule["separator"], cache)
+    multi = values.index.duplicated(keep=False)  # only rows with several values can repeat one
+    values = values[multi].str.lower()
+    pairs = pd.DataFrame({"row": values.index, "value": values.to_numpy()})
+    return pd.Series(batch.index.isin(pairs.loc[pairs.duplicated(), "row"]), index=batch.index)
+
+
+@check("placeholder")
+def check_placeholder(batch: pd.DataFrame, rule: Dict[str, Any], state: Dict[str, Any],
+                      cache: Dict[Any, Any]) -> pd.DataFrame:
+    longest = max(map(len, NULL_PLACEHOLDERS))
+    cells = {}
+    for col in rule["columns"]:
+        s = batch[col].astype("string").fillna("")
+        stripped = s.str.strip()
+        # only short values can be placeholders; "" itself is how a missing value is written
+        short = stripped[((stripped.str.len() <= longest) & (s != "")).to_numpy(dtype=bool)]
+        cells[col] = pd.Series(batch.index.isin(short.index[short.str.lower().isin(NULL_PLACEHOLDERS)]),
+                               index=batch.index)
+    return pd.DataFrame(cells, index=batch.index)
+
+
+@check("unique")
+def check_unique(batch: pd.DataFrame, rule: Dict[str, Any], state: Dict[str, Any],
+                 cache: Dict[Any, Any]) -> pd.Series:
+    # keys are collected here and resolved across batches in finish_validation
+    state.setdefault("keys", []).append(key_text(batch[rule["column"]]).to_numpy(dtype=object))
+    return pd.Series(False, index=batch.index)
+
+
+def key_text(series: pd.Series) -> pd.Series:
+    """
+    Keys compared as trimmed text (blanks are NA), so ids kept as text are
+    checked too and large ids are not rounded through float64. A float
+    column of whole numbers (ints with a gap) is read as its integers.
+    """
+    if pd.api.types.is_float_dtype(series) and (series.dropna() % 1 == 0).all():
+        series = series.astype("Int64")
+    return text(series)
+
+
+def rule_columns(rule: Dict[str, Any]) -> List[str]:
+    return list(rule.get("columns") or [rule["column"]])
+
+
+def new_validator(rules: Sequence[Dict[str, Any]] = RULES) -> Dict[str, Any]:
+    return {"rules": list(rules), "rows": 0, "counts": {r["rule"]: 0 for r in rules},
+            "state": {r["rule"]: {} for r in rules}, "violations": {r["rule"]: [] for r in rules},
+            "kept": {r["rule"]: 0 for r in rules}}
+
+
+def cell_text(series: pd.Series) -> pd.Series:
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        # numpy's float -> str is C-level; pandas' astype("string") formats value by value
+        return pd.Series(series.to_numpy(dtype="float64").astype(str), index=series.index, dtype="string")
+    return series.astype("string").fillna("")
+
+
+def violation_frame(batch: pd.DataFrame, rule: Dict[str, Any], mask: np.ndarray, offset: int,
+                    cells: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """Violating rows of `batch`; with per-column `cells`, only the offending columns are listed."""
+    cols = rule_columns(rule)
+    picked = pd.DataFrame({c: cell_text(batch.loc[mask, c]) for c in cols})
+    if cells is None:
+        column = ",".join(cols)
+        value = picked[cols[0]] if len(cols) == 1 else picked[cols[0]].str.cat(picked[cols[1:]], sep=",")
+    else:
+        hit = cells.loc[mask, cols]
+        column = pd.Series("", index=picked.index, dtype="string")
+        value = column.copy()
+        for col in cols:
+            sep = column.where(column == "", ",")
+            column = column + (sep + col).where(hit[col], "")
+            value = value + (sep + picked[col]).where(hit[col], "")
+    return pd.DataFrame({
+        "row": np.flatnonzero(mask) + offset,
+        "id": batch.loc[mask, "id"].to_numpy() if "id" in batch.columns else pd.NA,
+        "rule": rule["rule"],
+        "column": column if isinstance(column, str) else column.to_numpy(),
+        "value": value.to_numpy(),
+    })
+
+
+def validate_batch(validator: Dict[str, Any], batch: pd.DataFrame) -> Dict[str, int]:
+    """Check one batch (rows in export order); returns this batch's violation counts."""
+    offset = validator["rows"]
+    found = {}
+    cache: Dict[Any, Any] = {}
+    for rule in validator["rules"]:
+        if not all(c in batch.columns for c in rule_columns(rule)):
+            continue
+        name = rule["rule"]
+        result = CHECKS[rule["check"]](batch, rule, validator["state"][name], cache)
+        cells = result if isinstance(result, pd.DataFrame) else None
+        mask = (result.any(axis=1) if cells is not None else result).to_numpy(dtype=bool)
+        n = int(mask.sum())
+        found[name] = n
+        if not n:
+            continue
+        validator["counts"][name] += n
+        room = MAX_VIOLATION_ROWS - validator["kept"][name]
+        if room > 0:
+            if n > room:
+                mask = mask & (np.cumsum(mask) <= room)
+            validator["violations"][name].append(violation_frame(batch, rule, mask, offset, cells))
+            validator["kept"][name] += min(n, room)
+    validator["rows"] += len(batch)
+    return found
+
+
+def validate_frame(validator: Dict[str, Any], df: pd.DataFrame, batch_size: int = VALIDATION_BATCH) -> None:
+    for start in range(0, len(df), batch_size):
+        validate_batch(validator, df.iloc[start:start + batch_size])
+
+
+def finish_validation(validator: Dict[str, Any]) -> Dict[str, Any]:
+    """Resolve the cross-batch rules; returns {"summary": [...], "violations": DataFrame, "rows": n}."""
+    for rule in validator["rules"]:
+        if rule["check"] != "unique" or not validator["state"][rule["rule"]].get("keys"):
+            continue
+        keys = pd.Series(np.concatenate(validator["state"][rule["rule"]].pop("keys")), dtype="string")
+        dup = (keys.notna() & keys.duplicated()).to_numpy(dtype=bool)
+        name = rule["rule"]
+        validator["counts"][name] += int(dup.sum())
+        rows = np.flatnonzero(dup)[:MAX_VIOLATION_ROWS]
+        if len(rows):
+            values = keys.to_numpy(dtype=object)[rows]
+            validator["violations"][name].append(pd.DataFrame({
+                "row": rows, "id": values if rule["column"] == "id" else pd.NA, "rule": name,
+                "column": rule["column"], "value": values,
+            }))
+    n = validator["rows"]
+    summary = [{"rule": r["rule"], "description": r["description"], "violations": validator["counts"][r["rule"]],
+                "rate": round(validator["counts"][r["rule"]] / n * 100, 3) if n else 0.0}
+               for r in validator["rules"]]
+    for item in summary:
+        pipeline_metrics.count(f"quality_{item['rule']}", item["violations"])
+    frames = [f for r in validator["rules"] for f in validator["violations"][r["rule"]]]
+    table = pd.concat(frames, ignore_index=True) if frames else \
+        pd.DataFrame(columns=["row", "id", "rule", "column", "value"])
+    return {"rows": n, "summary": summary, "violations": table.sort_values(["row", "rule"], kind="stable")}
+
+
+def quality_paths(csv_path: str) -> Dict[str, str]:
+    directory = os.path.dirname(csv_path)
+    return {"csv": os.path.join(directory, QUALITY_CSV), "json": os.path.join(directory, QUALITY_JSON)}
+
+
+def write_report(result: Dict[str, Any], csv_path: str = QUALITY_CSV, json_path: str = QUALITY_JSON) -> None:
+    result["violations"].to_csv(csv_path, index=False, encoding="utf-8")
+    with open(json_path, "w", encoding="utf-8") as fh:
+        json.dump({"rows": result["rows"], "rules": result["summary"]}, fh, ensure_ascii=False, indent=1)
+
+
+def print_summary(result: Dict[str, Any]) -> None:
+    for item in result["summary"]:
+        if item["violations"]:
+            print(f"[warn] {item['rule']:<20} {item['violations']:>8} ({item['rate']:.2f}%)  {item['description']}")
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+school_search.py
+
+Full-text search over school names and addresses.
+
+An inverted index (term -> sorted row positions) is built over
+`name` + `address` when the export is written and pickled next to the CSV
+as schools_search.pkl. Text is folded the Azerbaijani way before
+tokenizing (ə->e, ı/İ->i, ş->s, ç->c, ö->o, ü->u, ğ->g, lower case), so
+"Tağızadə", "Tagizade" and "TAĞIZADƏ" are the same term. Digit runs are
+separate tokens ("№164", "164-cü" -> "164"; leading zeros dropped) and match
+exactly; word tokens also match as prefixes. Words with no exact or prefix
+match fall back to trigram similarity over the vocabulary, which absorbs
+typos ("Tağızdə").
+
+Every query token must match (AND); hits are ranked by the summed
+idf-weighted match quality, with matches only in the address counting
+ADDRESS_WEIGHT of a match in the name.
+
+Usage:
+ python school_search.py "164 nömrəli"
+ python school_search.py "Eldar Tagizade" --limit 5
+
+Requires:
+ pip install numpy pandas
+"""
+
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import argparse
+import bisect
+import os
+import pickle
+import re
+import unicodedata
+
+import numpy as np
+
+INDEX_NAME = "schools_search.pkl"
+INDEX_PATH = INDEX_NAME
+INDEX_VERSION = 1
+SEARCH_FIELDS: Sequence[str] = ("name", "address")
+MIN_PREFIX = 2
+FUZZY_MIN_LENGTH = 3
+FUZZY_MIN_SIMILARITY = 0.4
+PREFIX_WEIGHT = 0.8
+FUZZY_WEIGHT = 0.7
+ADDRESS_WEIGHT = 0.5
+IN_NAME = 1
+
+FOLD = str.maketrans({
+    "ə": "e", "Ə": "e", "ı": "i", "I": "i", "İ": "i", "ş": "s", "Ş": "s", "ç": "c", "Ç": "c",
+    "ö": "o", "Ö": "o", "ü": "u", "Ü": "u", "ğ": "g", "Ğ": "g",
+})
+TOKEN_RE = re.compile(r"[0-9]+|[^\W\d_]+")
+
+
+def fold(text: str) -> str:
+    """Azerbaijani-aware case and diacritic folding."""
+    text = text.translate(FOLD).lower()
+    if text.isascii():
+        return text
+    return "".join(c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c))
+
+
+def tokenize(text: Any) -> List[str]:
+    if not isinstance(text, str) or not text:
+        return []
+    return [(t.lstrip("0") or "0") if t[0].isdigit() else t for t in TOKEN_RE.findall(fold(text))]
+
+
+def trigrams(term: str) -> List[str]:
+    padded = f"  {term} "
+    return sorted({padded[i:i + 3] for i in range(len(padded) - 2)})
+
+
+def build_index(ids: Sequence[Any], names: Sequence[Any], addresses: Sequence[Any]) -> Dict[str, Any]:
+    """Index `names` + `addresses` (aligned with `ids`)."""
+    postings: Dict[str, List[int]] = {}
+    in_name: Dict[str, List[bool]] = {}
+    for pos, (name, address) in enumerate(zip(names, addresses)):
+        name_terms = set(tokenize(name))
+        for term in name_terms | set(tokenize(address)):
+            postings.setdefault(term, []).append(pos)
+            in_name.setdefault(term, []).append(term in name_terms)
+    vocab = sorted(postings)
+    lengths = np.fromiter((len(postings[t]) for t in vocab), dtype=np.int64, count=len(vocab))
+    offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    flat = np.fromiter((p for t in vocab for p in postings[t]), dtype=np.int32, count=int(offsets[-1]))
+    flags = np.fromiter((f for t in vocab for f in in_name[t]), dtype=np.uint8, count=int(offsets[-1]))
+
+    by_gram: Dict[str, List[int]] = {}
+    gram_counts = np.zeros(len(vocab), dtype=np.int32)
+    for term_id, term in enumerate(vocab):
+        if term[0].isdigit():
+            continue
+        grams = trigrams(term)
+        gram_counts[term_id] = len(grams)
+        for gram in grams:
+            by_gram.setdefault(gram, []).append(term_id)
+    grams = sorted(by_gram)
+    gram_offsets = np.zeros(len(grams) + 1, dtype=np.int64)
+    np.cumsum([len(by_gram[g]) for g in grams], out=gram_offsets[1:])
+    return {
+        "version": INDEX_VERSION,
+        "ids": np.asarray(ids),
+        "names": list(names),
+        "addresses": list(addresses),
+        "vocab": vocab,
+        "offsets": offsets,
+        "postings": flat,
+        "fields": flags,
+        "grams": grams,
+        "gram_offsets": gram_offsets,
+        "gram_terms": np.fromiter((t for g in grams for t in by_gram[g]), dtype=np.int32, count=int(gram_offsets[-1])),
+        "gram_counts": gram_counts,
+    }
+
+
+def index_path_for(csv_path: str) -> str:
+    """schools_search.pkl in the directory holding `csv_path`."""
+    return os.path.join(os.path.dirname(csv_path), INDEX_NAME)
+
+
+def save_index(index: Dict[str, Any], path: str = INDEX_PATH) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as fh:
+        pickle.dump({k: v for k, v in index.items() if k != "gram_ids"}, fh, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+
+
+def write_index(ids: Sequence[Any], names: Sequence[Any], addresses: Sequence[Any], path: str = INDEX_PATH) -> int:
+    """Build and save; returns the vocabulary size."""
+    index = build_index(ids, names, addresses)
+    save_index(index, path)
+    return len(index["vocab"])
+
+
+def load_index(path: str = INDEX_PATH) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, "rb") as fh:
+            index = pickle.load(fh)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        return None
+    return index if index.get("version") == INDEX_VERSION else None
+
+
+def load_or_build(path: str = INDEX_PATH) -> Dict[str, Any]:
+    """Load the persisted index, rebuilding it when the export is newer."""
+    from school_data import CSV_PATH, OUT_PARQUET, load_schools
+
+    sources = [p for p in (OUT_PARQUET, CSV_PATH) if os.path.exists(p)]
+    newest = max((os.path.getmtime(p) for p in sources), default=0)
+    if os.path.exists(path) and os.path.getmtime(path) >= newest:
+        index = load_index(path)
+        if index is not None:
+            return index
+    df = load_schools(columns=["id", *SEARCH_FIELDS])
+    index = build_index(df["id"].to_numpy(), df["name"].tolist(), df["address"].tolist())
+    save_index(index, path)
+    return index
+
+
+def term_range(index: Dict[str, Any], prefix: str) -> Tuple[int, int]:
+    """[lo, hi) term ids of the vocabulary entries starting with `prefix`."""
+    vocab = index["vocab"]
+    lo = bisect.bisect_left(vocab, prefix)
+    return lo, bisect.bisect_left(vocab, prefix + "\uffff", lo)
+
+
+def fuzzy_terms(index: Dict[str, Any], token: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Vocabulary terms sharing enough trigrams with `token`: (term ids, Jaccard similarity)."""
+    gram_ids = index.get("gram_ids")
+    if gram_ids is None:
+        gram_ids = index["gram_ids"] = {g: i for i, g in enumerate(index["grams"])}
+    offsets, terms = index["gram_offsets"], index["gram_terms"]
+    query = [gram_ids[g] for g in trigrams(token) if g in gram_ids]
+    if not query:
+        return np.empty(0, np.int64), np.empty(0)
+    hits = np.concatenate([terms[offsets[g]:offsets[g + 1]] for g in query])
+    term_ids, shared = np.unique(hits, return_counts=True)
+    sim = shared / (len(trigrams(token)) + index["gram_counts"][term_ids] - shared)
+    keep = sim >= FUZZY_MIN_SIMILARITY
+    return term_ids[keep], sim[keep]
+
+
+def token_matches(index: Dict[str, Any], token: str, fuzzy: Optional[bool] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Term ids matching one query token and their weights: exact 1.0, prefix
+    PREFIX_WEIGHT, trigram FUZZY_WEIGHT x similarity. fuzzy=None uses
+    trigrams only when nothing matched exactly or by prefix.
+    """
+    vocab = index["vocab"]
+    if token[0].isdigit():
+        pos = bisect.bisect_left(vocab, token)
+        found = pos < len(vocab) and vocab[pos] == token
+        return np.arange(pos, pos + found), np.ones(int(found))
+    term_ids, weights = np.empty(0, np.int64), np.empty(0)
+    if len(token) >= MIN_PREFIX:
+        lo, hi = term_range(index, token)
+        term_ids = np.arange(lo, hi)
+        weights = np.where([vocab[t] == token for t in range(lo, hi)], 1.0, PREFIX_WEIGHT)
+    else:
+        pos = bisect.bisect_left(vocab, token)
+        if pos < len(vocab) and vocab[pos] == token:
+            term_ids, weights = np.array([pos]), np.ones(1)
+    if len(token) >= FUZZY_MIN_LENGTH and (fuzzy or (fuzzy is None and not len(term_ids))):
+        fuzzy_ids, sim = fuzzy_terms(index, token)
+        term_ids = np.concatenate([term_ids, fuzzy_ids])
+        weights = np.concatenate([weights, FUZZY_WEIGHT * sim])
+    return term_ids, weights
+
+
+def token_scores(index: Dict[str, Any], term_ids: np.ndarray, weights: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (sorted row positions, best weighted score) over the postings of
+    `term_ids`. The idf is that of the token's whole match set, so a prefix
+    hit on a rare term does not outrank an exact hit on a common one.
+    """
+    offsets, postings = index["offsets"], index["postings"]
+    if not len(term_ids):
+        return np.empty(0, np.int32), np.empty(0)
+    n_docs = len(index["ids"])
+    lengths = offsets[term_ids + 1] - offsets[term_ids]
+    docs = np.concatenate([postings[offsets[t]:offsets[t + 1]] for t in term_ids])
+    fields = np.concatenate([index["fields"][offsets[t]:offsets[t + 1]] for t in term_ids])
+    scores = np.repeat(weights, lengths) * np.where(fields & IN_NAME, 1.0, ADDRESS_WEIGHT)
+    order = np.lexsort((-scores, docs))
+    docs, scores = docs[order], scores[order]
+    first = np.r_[True, docs[1:] != docs[:-1]]
+    docs, scores = docs[first], scores[first]
+    return docs, scores * np.log1p(n_docs / len(docs))
+
+
+def search(index: Dict[str, Any], query: str, limit: Optional[int] = 20,
+           fuzzy: Optional[bool] = None) -> List[Tuple[int, float]]:
+    """(row position, score) of the rows matching every query token, best first."""
+    tokens = list(dict.fromkeys(tokenize(query)))
+    if not tokens:
+        return []
+    docs: Optional[np.ndarray] = None
+    total = np.empty(0)
+    for token in sorted(tokens, key=len, reverse=True):
+        t_docs, t_scores = token_scores(index, *token_matches(index, token, fuzzy))
+        if docs is None:
+            docs, total = t_docs, t_scores
+        else:
+            docs, left, right = np.intersect1d(docs, t_docs, assume_unique=True, return_indices=True)
+            total = total[left] + t_scores[right]
+        if not len(docs):
+            return []
+    order = np.argsort(-total, kind="stable")[:limit]
+    return [(int(docs[i]), float(total[i])) for i in order]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Search school names and addresses")
+    parser.add_argument("query")
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--fuzzy", action="store_true", help="always add trigram matches, not only for unknown words")
+    parser.add_argument("--index", default=INDEX_PATH, help="persisted index file")
+    args = parser.parse_args()
+
+    index = load_or_build(args.index)
+    for pos, score in search(index, args.query, args.limit, fuzzy=True if args.fuzzy else None):
+        print(f"{index['ids'][pos]}\t{score:6.2f}\t{index['names'][pos]}\t{index['addresses'][pos]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+school_server.py
+
+Read-only HTTP/JSON service over the latest export.
+
+The export (schools.parquet, or schools.csv without pyarrow) is loaded
+once; every row is encoded to JSON up front and hash indexes map each value
+of INDEXED_FIELDS to the sorted row positions holding it, so a query is an
+intersection of a few position arrays plus a join of pre-encoded rows.
+Counts per indexed field are computed at load time.
+
+A watcher thread polls the export and, when a new scrape lands, builds a
+complete new dataset before swapping it in with a single assignment;
+requests already running keep the dataset they started with.
+
+Responses carry an ETag derived from the dataset version and the request,
+are cached per dataset (LRU), and If-None-Match is answered with 304.
+
+Endpoints:
+ - GET /schools?regionId=..&schoolTypeId=..&limit=50&offset=0
+ - GET /schools/<id>
+ - GET /counts            (all indexed fields)
+ - GET /counts/<field>
+ - GET /health
+
+Usage:
+ python school_server.py --port 8000
+ python server_load_test.py --url http://127.0.0.1:8000
+
+Requires:
+ pip install numpy pandas (optional: pyarrow)
+"""
+
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from collections import OrderedDict
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+import argparse
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from school_data import CSV_PATH, OUT_PARQUET, have_pyarrow, load_schools
+
+INDEXED_FIELDS: Sequence[str] = ("id", "utisCode", "regionId", "schoolTypeId", "schoolKindId", "subjectionId")
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 1000
+RESPONSE_CACHE_SIZE = 1024
+RELOAD_INTERVAL = 5.0
+COORDINATE_DECIMALS = 6
+
+STATE: Dict[str, Any] = {"dataset": None}
+
+
+class QueryError(ValueError):
+    """A request the server answers with 400."""
+
+
+def export_source(parquet_path: str = OUT_PARQUET, csv_path: str = CSV_PATH) -> Optional[str]:
+    """The file load_schools would read, or None when there is no export yet."""
+    if os.path.exists(parquet_path) and have_pyarrow():
+        return parquet_path
+    return csv_path if os.path.exists(csv_path) else None
+
+
+def source_version(path: str) -> str:
+    st = os.stat(path)
+    return hashlib.sha1(f"{os.path.abspath(path)}:{st.st_mtime_ns}:{st.st_size}".encode()).hexdigest()[:16]
+
+
+def encode_rows(df: pd.DataFrame) -> List[str]:
+    """One JSON object per row; NA becomes null, coordinates are rounded back from float32."""
+    out = df.copy()
+    for col in out.columns:
+        if out[col].dtype == "float32":
+            out[col] = out[col].astype("float64").round(COORDINATE_DECIMALS)
+    if out.empty:
+        return []
+    return out.to_json(orient="records", lines=True, force_ascii=False).splitlines()
+
+
+def index_key(value: Any) -> str:
+    """Indexes are keyed by the text a query string carries (1000024, not 1000024.0)."""
+    if isinstance(value, (float, np.floating)) and float(value).is_integer():
+        value = int(value)
+    return str(value)
+
+
+def build_index(column: pd.Series) -> Dict[str, np.ndarray]:
+    """value -> ascending row positions, from one factorize and a stable sort."""
+    codes, uniques = pd.factorize(column, use_na_sentinel=True)
+    order = np.argsort(codes, kind="stable")
+    bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+    return {index_key(u): order[bounds[i]:bounds[i + 1]] for i, u in enumerate(uniques)}
+
+
+def build_dataset(path: str) -> Dict[str, Any]:
+    if path.endswith(".parquet"):
+        df = load_schools(parquet_path=path)
+    else:
+        df = load_schools(parquet_path="", csv_path=path)
+    fields = [f for f in INDEXED_FIELDS if f in df.columns]
+    indexes = {f: build_index(df[f]) for f in fields}
+    return {
+        "version": source_version(path),
+        "source": path,
+        "loaded_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "n_rows": len(df),
+        "rows": encode_rows(df),
+        "indexes": indexes,
+        "counts": {f: {k: len(v) for k, v in sorted(idx.items(), key=lambda kv: -len(kv[1]))}
+                   for f, idx in indexes.items()},
+        "cache": OrderedDict(),
+        "cache_lock": threading.Lock(),
+    }
+
+
+def load_dataset(path: Optional[str] = None) -> Dict[str, Any]:
+    path = path or export_source()
+    if path is None:
+        raise FileNotFoundError(f"no export found ({OUT_PARQUET} / {CSV_PATH}); run schools.py first")
+    dataset = build_dataset(path)
+    print(f"[info] Loaded {dataset['n_rows']} rows from {path} (version {dataset['version']})")
+    return dataset
+
+
+def swap_dataset(dataset: Dict[str, Any]) -> None:
+    STATE["dataset"] = dataset
+
+
+def reload_if_changed(path: Optional[str] = None) -> bool:
+    """Load and swap in the export if it changed since the current dataset was built."""
+    path = path or export_source()
+    current = STATE["dataset"]
+    if path is None:
+        return False
+    try:
+        version = source_version(path)
+    except OSError:
+        return False
+    if current is not None and current["version"] == version:
+        return False
+    try:
+        dataset = load_dataset(path)
+    except Exception as e:
+        # a scrape still being written, most likely; keep serving the old data
+        print(f"[warn] Reload of {path} failed, keeping version {current and current['version']}: {e}")
+        return False
+    swap_dataset(dataset)
+    return True
+
+
+def watch(stop: threading.Event, path: Optional[str] = None, interval: float = RELOAD_INTERVAL) -> None:
+    while not stop.wait(interval):
+        reload_if_changed(path)
+
+
+def int_param(params: Dict[str, List[str]], name: str, default: int, upper: Optional[int] = None) -> int:
+    if name not in params:
+        return default
+    try:
+        value = int(params[name][-1])
+    except ValueError:
+        raise QueryError(f"{name} must be an integer")
+    if value < 0:
+        raise QueryError(f"{name} must be >= 0")
+    return min(value, upper) if upper is not None else value
+
+
+def matching_positions(dataset: Dict[str, Any], filters: Dict[str, List[str]]) -> Optional[np.ndarray]:
+    """
+    Row positions matching every filter (several values for one field are
+    OR-ed), or None for no filter. Smallest sets are intersected first.
+    """
+    sets = []
+    for field, values in filters.items():
+        index = dataset["indexes"][field]
+        hits = [index[v] for v in values if v in index]
+        sets.append(np.unique(np.concatenate(hits)) if len(hits) > 1 else (hits[0] if hits else np.empty(0, np.int64)))
+    if not sets:
+        return None
+    sets.sort(key=len)
+    positions = sets[0]
+    for other in sets[1:]:
+        if not len(positions):
+            break
+        positions = np.intersect1d(positions, other, assume_unique=True)
+    return positions
+
+
+def query_schools(dataset: Dict[str, Any], params: Dict[str, List[str]]) -> str:
+    unknown = sorted(set(params) - set(dataset["indexes"]) - {"limit", "offset"})
+    if unknown:
+        raise QueryError(f"unknown filter(s): {', '.join(unknown)}; filterable: {', '.join(dataset['indexes'])}")
+    limit = int_param(params, "limit", DEFAULT_LIMIT, MAX_LIMIT)
+    offset = int_param(params, "offset", 0)
+    filters = {}
+    for field in dataset["indexes"]:
+        if field in params:
+            filters[field] = [v.strip() for value in params[field] for v in value.split(",") if v.strip()]
+    positions = matching_positions(dataset, filters)
+    total = dataset["n_rows"] if positions is None else len(positions)
+    page = range(offset, min(offset + limit, total)) if positions is None else positions[offset:offset + limit].tolist()
+    rows = dataset["rows"]
+    items = ",".join(rows[i] for i in page)
+    return f'{{"total":{total},"offset":{offset},"limit":{limit},"items":[{items}]}}'
+
+
+def route(dataset: Dict[str, Any], path: str, params: Dict[str, List[str]]) -> Tuple[int, str]:
+    """(status, JSON body) for a GET."""
+    parts = [p for p in path.split("/") if p]
+    if parts == ["schools"]:
+        return 200, query_schools(dataset, params)
+    if len(parts) == 2 and parts[0] == "schools":
+        hits = dataset["indexes"].get("id", {}).get(parts[1])
+        if hits is None or not len(hits):
+            return 404, json.dumps({"error": f"no school with id {parts[1]}"})
+        return 200, dataset["rows"][hits[0]]
+    if parts == ["counts"]:
+        return 200, json.dumps(dataset["counts"], ensure_ascii=False)
+    if len(parts) == 2 and parts[0] == "counts":
+        if parts[1] not in dataset["counts"]:
+            return 404, json.dumps({"error": f"no counts for {parts[1]}; available: {', '.join(dataset['counts'])}"})
+        return 200, json.dumps(dataset["counts"][parts[1]], ensure_ascii=False)
+    if parts == ["health"]:
+        return 200, json.dumps({"status": "ok", "rows": dataset["n_rows"], "version": dataset["version"],
+                                "source": dataset["source"], "loaded_at": dataset["loaded_at"]})
+    return 404, json.dumps({"error": f"unknown path {path}"})
+
+
+def cached_response(dataset: Dict[str, Any], target: str) -> Tuple[int, str, bytes]:
+    """(status, etag, body) for a request target, from the dataset's LRU cache when present."""
+    cache, lock = dataset["cache"], dataset["cache_lock"]
+    with lock:
+        hit = cache.get(target)
+        if hit is not None:
+            cache.move_to_end(target)
+            return hit
+    url = urlsplit(target)
+    try:
+        status, body = route(dataset, url.path, parse_qs(url.query))
+    except QueryError as e:
+        status, body = 400, json.dumps({"error": str(e)})
+    data = body.encode("utf-8")
+    etag = '"%s-%s"' % (dataset["version"], hashlib.sha1(data).hexdigest()[:16])
+    entry = (status, etag, data)
+    if status == 200:
+        with lock:
+            cache[target] = entry
+            if len(cache) > RESPONSE_CACHE_SIZE:
+                cache.popitem(last=False)
+    return entry
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive for clients that reuse connections
+    disable_nagle_algorithm = True  # headers and body go out as two writes; don't wait for the ACK
+
+    def do_GET(self):
+        dataset = STATE["dataset"]  # one dataset for the whole request, whatever a reload does
+        status, etag, data = cached_response(dataset, self.path)
+        if status == 200 and etag in (t.strip() for t in self.headers.get("If-None-Match", "").split(",")):
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        if status == 200:
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(host: str = "127.0.0.1", port: int = 8000, path: Optional[str] = None,
+          reload_interval: float = RELOAD_INTERVAL) -> Tuple[ThreadingHTTPServer, threading.Event]:
+    """
+    Load the export and start serving in background threads; returns the
+    server and the event that stops the reload watcher.
+    """
+    swap_dataset(load_dataset(path))
+    server = ThreadingHTTPServer((host, port), QueryHandler)
+    server.daemon_threads = True
+    stop = threading.Event()
+    threading.Thread(target=server.serve_forever, name="school-server", daemon=True).start()
+    if reload_interval > 0:
+        threading.Thread(target=watch, args=(stop, path, reload_interval), name="reload-watcher", daemon=True).start()
+    return server, stop
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Read-only JSON API over the latest schools export")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--export", metavar="PATH", help=f"file to serve (default: {OUT_PARQUET}, else {CSV_PATH})")
+    parser.add_argument("--reload-interval", type=float, default=RELOAD_INTERVAL,
+                        help="seconds between checks for a new export (0 disables hot reload)")
+    args = parser.parse_args()
+
+    server, stop = serve(args.host, args.port, args.export, args.reload_interval)
+    print(f"[ok] Serving on http://{args.host}:{server.server_address[1]}/schools (Ctrl+C to stop)")
+    try:
+        stop.wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
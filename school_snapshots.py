@@ -0,0 +1,419 @@
+#!/usr/bin/env python3
+"""
+school_snapshots.py
+
+Append-only history of the export.
+
+Every snapshot is a manifest of (key, row hash) pairs, one per school.
+Rows are content-addressed by a 64-bit hash of their typed values and
+each distinct row is stored once, in the Parquet partition of the snapshot
+that first saw it. Manifests are stored as deltas against the previous
+snapshot (changed, added and removed keys), with a full manifest every
+MANIFEST_CHAIN snapshots; an unchanged scrape writes no file at all. A
+scrape that changed 50 schools adds 50 rows and a 50-entry delta, so the
+store grows with churn rather than with the number of runs.
+
+Layout (under snapshots/):
+ - catalog.json                    snapshot ids, timestamps, files
+ - manifests/<snapshot id>.parquet key, hash (+ removed, for a delta)
+ - rows/<snapshot id>.parquet      hash + SNAPSHOT_COLUMNS (zstd)
+
+diff compares two manifests only (no row data is read) and can list the
+changed columns of modified schools. region_timeseries computes the
+per-row measures of school_cube once per distinct row and sums them per
+snapshot and region, for the charts.
+
+Usage:
+ python school_snapshots.py take
+ python school_snapshots.py list
+ python school_snapshots.py diff previous latest --columns
+ python school_snapshots.py timeseries --region Nəsimi
+ python schools.py --snapshot
+
+Requires:
+ pip install pandas pyarrow
+"""
+
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+from datetime import datetime, timezone
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+import school_data
+from school_cube import MEASURES, row_measures
+
+SNAPSHOT_DIR = "snapshots"
+CATALOG = "catalog.json"
+KEY_COLUMN = "id"
+SNAPSHOT_COLUMNS: Sequence[str] = (
+    "id", "utisCode", "name", "address", "regionId", "regionName", "schoolTypeId", "schoolType",
+    "schoolKindId", "schoolKind", "subjectionId", "subjection", "hasJurnal", "hasMeeting", "lat", "lng",
+    "contacts", "contacts_phones", "contacts_emails", "siteUrl", "imageToken",
+)
+MEASURE_COLUMNS: Sequence[str] = ("lat", "lng", "contacts_emails", "contacts_phones", "siteUrl")
+MANIFEST_CHAIN = 16  # longest run of delta manifests before a full one is written
+
+
+def load_catalog(store: str = SNAPSHOT_DIR) -> List[Dict[str, Any]]:
+    try:
+        with open(os.path.join(store, CATALOG), encoding="utf-8") as fh:
+            return json.load(fh)["snapshots"]
+    except (OSError, ValueError, KeyError):
+        return []
+
+
+def save_catalog(snapshots: List[Dict[str, Any]], store: str = SNAPSHOT_DIR) -> None:
+    path = os.path.join(store, CATALOG)
+    with open(f"{path}.tmp", "w", encoding="utf-8") as fh:
+        json.dump({"snapshots": snapshots}, fh, ensure_ascii=False, indent=2)
+    os.replace(f"{path}.tmp", path)
+
+
+def snapshot_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """The typed SNAPSHOT_COLUMNS of an export frame (CSV-, Parquet- or prepare_frame-shaped)."""
+    return school_data.to_typed_frame(df[[c for c in SNAPSHOT_COLUMNS if c in df.columns]].reset_index(drop=True))
+
+
+def row_hashes(typed: pd.DataFrame) -> np.ndarray:
+    return pd.util.hash_pandas_object(typed, index=False).to_numpy(dtype=np.uint64)
+
+
+def row_keys(typed: pd.DataFrame, hashes: np.ndarray) -> np.ndarray:
+    """
+    School ids. A row repeating an earlier row's id is keyed by (id,
+    occurrence) and a row without an id by (row hash, occurrence), hashed
+    into the negative int64 range, so inserting or dropping a row does not
+    rekey the rows after it.
+    """
+    ids = typed[KEY_COLUMN] if KEY_COLUMN in typed.columns else pd.Series(pd.NA, index=typed.index, dtype="Int64")
+    missing = ids.isna().to_numpy()
+    if pd.api.types.is_integer_dtype(ids.dtype):
+        keys = ids.fillna(0).to_numpy(dtype=np.int64)
+        unkeyed = missing | ids.duplicated().to_numpy()
+        id_basis = keys.astype(np.uint64)
+    else:
+        # ids kept as text (see school_data.to_typed_frame): every row is keyed by its hashed id
+        keys = np.zeros(len(typed), dtype=np.int64)
+        unkeyed = np.ones(len(typed), dtype=bool)
+        id_basis = pd.util.hash_pandas_object(ids, index=False).to_numpy(dtype=np.uint64)
+    if unkeyed.any():
+        basis = pd.DataFrame({
+            "missing": missing[unkeyed],
+            "basis": np.where(missing, hashes, id_basis)[unkeyed],
+        })
+        basis["occurrence"] = basis.groupby(["missing", "basis"]).cumcount()
+        mixed = pd.util.hash_pandas_object(basis, index=False).to_numpy(dtype=np.uint64)
+        keys[unkeyed] = -1 - (mixed >> np.uint64(1)).astype(np.int64)
+    return keys
+
+
+def stored_hashes(snapshots: List[Dict[str, Any]], store: str = SNAPSHOT_DIR) -> np.ndarray:
+    import pyarrow.parquet as pq
+
+    parts = [pq.read_table(os.path.join(store, s["rows_file"]), columns=["hash"]).column("hash").to_numpy()
+             for s in snapshots if s.get("rows_file")]
+    return np.concatenate(parts) if parts else np.empty(0, dtype=np.uint64)
+
+
+def new_snapshot_id(snapshots: List[Dict[str, Any]], taken_at: datetime) -> str:
+    base = taken_at.strftime("%Y%m%dT%H%M%SZ")
+    taken = {s["id"] for s in snapshots}
+    snapshot_id, n = base, 1
+    while snapshot_id in taken:
+        n += 1
+        snapshot_id = f"{base}-{n}"
+    return snapshot_id
+
+
+def take_snapshot(df: pd.DataFrame, store: str = SNAPSHOT_DIR, taken_at: Optional[datetime] = None) -> Optional[Dict[str, Any]]:
+    """Append `df` (an export frame) as a new snapshot; returns its catalog entry (None without pyarrow)."""
+    if not school_data.have_pyarrow():
+        print("[warn] pyarrow is not installed; snapshots are not recorded")
+        return None
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    os.makedirs(os.path.join(store, "manifests"), exist_ok=True)
+    os.makedirs(os.path.join(store, "rows"), exist_ok=True)
+    snapshots = load_catalog(store)
+    taken_at = taken_at or datetime.now(timezone.utc)
+    snapshot_id = new_snapshot_id(snapshots, taken_at)
+
+    typed = snapshot_frame(df)
+    hashes = row_hashes(typed)
+    manifest = pd.DataFrame({"key": row_keys(typed, hashes), "hash": hashes})
+    parent = snapshots[-1] if snapshots else None
+    delta = manifest_delta(load_manifest(parent, store, snapshots), manifest) if parent else None
+    if delta is not None and delta.empty:
+        # same schools, same rows: share the parent's manifest
+        link = {"manifest": parent["manifest"], "base": parent.get("base"), "depth": parent.get("depth", 0)}
+    elif delta is not None and parent.get("depth", 0) < MANIFEST_CHAIN:
+        link = {"manifest": f"manifests/{snapshot_id}.parquet", "base": parent["id"], "depth": parent.get("depth", 0) + 1}
+        pq.write_table(pa.Table.from_pandas(delta, preserve_index=False), os.path.join(store, link["manifest"]),
+                       compression="zstd")
+    else:
+        link = {"manifest": f"manifests/{snapshot_id}.parquet", "base": None, "depth": 0}
+        pq.write_table(pa.Table.from_pandas(manifest, preserve_index=False), os.path.join(store, link["manifest"]),
+                       compression="zstd")
+
+    fresh = ~np.isin(hashes, stored_hashes(snapshots, store))
+    fresh &= ~pd.Series(hashes).duplicated().to_numpy()
+    rows_file = None
+    if fresh.any():
+        rows_file = f"rows/{snapshot_id}.parquet"
+        new_rows = typed[fresh].reset_index(drop=True)
+        new_rows.insert(0, "hash", hashes[fresh])
+        new_rows.to_parquet(os.path.join(store, rows_file), index=False, engine="pyarrow", compression="zstd")
+
+    entry = {
+        "id": snapshot_id,
+        "taken_at": taken_at.isoformat(timespec="seconds"),
+        "rows": len(typed),
+        "new_rows": int(fresh.sum()),
+        **link,
+        "rows_file": rows_file,
+    }
+    snapshots.append(entry)
+    save_catalog(snapshots, store)
+    return entry
+
+
+def snapshot_export(store: str = SNAPSHOT_DIR) -> Optional[Dict[str, Any]]:
+    """Snapshot the export currently on disk (schools.parquet, else schools.csv)."""
+    entry = take_snapshot(school_data.load_schools(), store)
+    if entry is not None:
+        print(f"[ok] Snapshot {entry['id']}: {entry['rows']} rows, {entry['new_rows']} new -> {store}/")
+    return entry
+
+
+def resolve(snapshot: str, snapshots: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """A catalog entry by id, 'latest', 'previous' or a negative index ('-3')."""
+    if not snapshots:
+        raise ValueError("no snapshots recorded yet")
+    aliases = {"latest": -1, "previous": -2}
+    if snapshot in aliases or snapshot.lstrip("-").isdigit():
+        pos = aliases.get(snapshot, int(snapshot) if snapshot.startswith("-") else None)
+        if pos is not None and -len(snapshots) <= pos < 0:
+            return snapshots[pos]
+    for entry in snapshots:
+        if entry["id"] == snapshot:
+            return entry
+    raise ValueError(f"unknown snapshot {snapshot!r}; have {', '.join(s['id'] for s in snapshots[-5:])} ...")
+
+
+def manifest_delta(old: pd.DataFrame, new: pd.DataFrame) -> pd.DataFrame:
+    """(key, hash, removed) turning manifest `old` into `new`: changed and added keys, then removed ones."""
+    pos = pd.Index(old["key"]).get_indexer(new["key"])
+    old_hashes = old["hash"].to_numpy()
+    touched = (pos < 0) | (old_hashes[np.maximum(pos, 0)] != new["hash"].to_numpy())
+    gone = ~old["key"].isin(new["key"]).to_numpy()
+    return pd.DataFrame({
+        "key": np.concatenate([new["key"].to_numpy()[touched], old["key"].to_numpy()[gone]]),
+        "hash": np.concatenate([new["hash"].to_numpy()[touched], old_hashes[gone]]),
+        "removed": np.r_[np.zeros(int(touched.sum()), bool), np.ones(int(gone.sum()), bool)],
+    })
+
+
+def apply_delta(manifest: pd.DataFrame, delta: pd.DataFrame) -> pd.DataFrame:
+    """The manifest after `delta`: rows keep their place, added schools go at the end."""
+    pos = pd.Index(manifest["key"]).get_indexer(delta["key"])
+    removed = delta["removed"].to_numpy()
+    hashes = manifest["hash"].to_numpy().copy()
+    update = (pos >= 0) & ~removed
+    hashes[pos[update]] = delta["hash"].to_numpy()[update]
+    keep = np.ones(len(manifest), bool)
+    keep[pos[(pos >= 0) & removed]] = False
+    added = delta[(pos < 0) & ~removed]
+    return pd.DataFrame({
+        "key": np.concatenate([manifest["key"].to_numpy()[keep], added["key"].to_numpy()]),
+        "hash": np.concatenate([hashes[keep], added["hash"].to_numpy()]),
+    })
+
+
+def read_manifest(entry: Dict[str, Any], store: str = SNAPSHOT_DIR) -> pd.DataFrame:
+    return pd.read_parquet(os.path.join(store, entry["manifest"]), engine="pyarrow")
+
+
+def load_manifest(entry: Dict[str, Any], store: str = SNAPSHOT_DIR,
+                  snapshots: Optional[List[Dict[str, Any]]] = None) -> pd.DataFrame:
+    """The full (key, hash) manifest of a snapshot, replaying deltas from the last full one."""
+    snapshots = snapshots if snapshots is not None else load_catalog(store)
+    chain = []
+    while entry.get("base"):
+        chain.append(entry)
+        entry = resolve(entry["base"], snapshots)
+    manifest = read_manifest(entry, store)
+    for link in reversed(chain):
+        manifest = apply_delta(manifest, read_manifest(link, store))
+    return manifest
+
+
+def iter_manifests(snapshots: List[Dict[str, Any]], store: str = SNAPSHOT_DIR) -> Iterator[Tuple[Dict[str, Any], pd.DataFrame]]:
+    """(entry, full manifest) for every snapshot, applying each delta once."""
+    manifest, previous = None, None
+    for entry in snapshots:
+        if previous is None or entry["manifest"] != previous["manifest"]:
+            if entry.get("base") and previous is not None and entry["base"] == previous["id"]:
+                manifest = apply_delta(manifest, read_manifest(entry, store))
+            else:
+                manifest = load_manifest(entry, store, snapshots)
+        previous = entry
+        yield entry, manifest
+
+
+def load_rows(hashes: np.ndarray, upto: Dict[str, Any], store: str = SNAPSHOT_DIR,
+              columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    """Stored rows for `hashes` (in that order), reading the partitions written up to snapshot `upto`."""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+
+    snapshots = load_catalog(store)
+    value_set = pa.array(pd.unique(hashes), type=pa.uint64())
+    parts = []
+    for entry in snapshots[:snapshots.index(upto) + 1]:
+        if not entry.get("rows_file"):
+            continue
+        table = pq.read_table(os.path.join(store, entry["rows_file"]),
+                              columns=None if columns is None else ["hash", *columns])
+        parts.append(table.filter(pc.is_in(table.column("hash"), value_set=value_set)).to_pandas())
+    rows = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=["hash", *(columns or [])])
+    return rows.drop_duplicates("hash").set_index("hash").reindex(hashes).reset_index(drop=True)
+
+
+def load_snapshot(snapshot: str, store: str = SNAPSHOT_DIR, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    """A snapshot as a frame (schools in the order they first appeared in the history)."""
+    snapshots = load_catalog(store)
+    entry = resolve(snapshot, snapshots)
+    manifest = load_manifest(entry, store, snapshots)
+    return load_rows(manifest["hash"].to_numpy(), entry, store, columns)
+
+
+def diff(a: str, b: str, store: str = SNAPSHOT_DIR, columns: bool = False) -> Dict[str, Any]:
+    """
+    Schools added, removed and modified between snapshots `a` and `b`
+    (keys only, from the manifests). columns=True also returns a long
+    (key, column, before, after) table for the modified schools.
+    """
+    snapshots = load_catalog(store)
+    entry_a, entry_b = resolve(a, snapshots), resolve(b, snapshots)
+    old = load_manifest(entry_a, store, snapshots)
+    new = load_manifest(entry_b, store, snapshots)
+    out: Dict[str, Any] = {
+        "a": entry_a["id"],
+        "b": entry_b["id"],
+        "added": new.loc[~new["key"].isin(old["key"]), "key"].to_numpy(),
+        "removed": old.loc[~old["key"].isin(new["key"]), "key"].to_numpy(),
+    }
+    both = old.merge(new, on="key", how="inner", suffixes=("_a", "_b"))
+    modified = both[both["hash_a"] != both["hash_b"]]
+    out["modified"] = modified["key"].to_numpy()
+    if columns:
+        later = entry_a if snapshots.index(entry_a) > snapshots.index(entry_b) else entry_b
+        before = load_rows(modified["hash_a"].to_numpy(dtype=np.uint64), later, store)
+        after = load_rows(modified["hash_b"].to_numpy(dtype=np.uint64), later, store)
+        changes = []
+        for col in before.columns.intersection(after.columns):
+            x, y = before[col].astype(object), after[col].astype(object)
+            differs = ~((x == y) | (x.isna() & y.isna())).fillna(False).to_numpy(dtype=bool)
+            if differs.any():
+                changes.append(pd.DataFrame({"key": out["modified"][differs], "column": col,
+                                             "before": x[differs].to_numpy(), "after": y[differs].to_numpy()}))
+        out["changes"] = pd.concat(changes, ignore_index=True) if changes else \
+            pd.DataFrame(columns=["key", "column", "before", "after"])
+    return out
+
+
+def region_timeseries(store: str = SNAPSHOT_DIR, dim: str = "regionName") -> pd.DataFrame:
+    """
+    One row per (snapshot, `dim` value) with the school_cube MEASURES
+    (n, has_coords, has_email, ...) plus hasJurnal / hasMeeting counts.
+    Measures are computed once per distinct stored row.
+    """
+    import pyarrow.parquet as pq
+
+    snapshots = load_catalog(store)
+    wanted = ["hash", dim, "hasJurnal", "hasMeeting", *MEASURE_COLUMNS]
+    parts = [pq.read_table(os.path.join(store, s["rows_file"]), columns=wanted).to_pandas()
+             for s in snapshots if s.get("rows_file")]
+    if not parts:
+        return pd.DataFrame(columns=["snapshot", "taken_at", dim, *MEASURES, "hasJurnal", "hasMeeting"])
+    rows = pd.concat(parts, ignore_index=True).drop_duplicates("hash")
+    measures = row_measures(rows)
+    measures["hasJurnal"] = rows["hasJurnal"].fillna(False).astype(int)
+    measures["hasMeeting"] = rows["hasMeeting"].fillna(False).astype(int)
+    measures[dim] = rows[dim].astype(object)
+    measures.index = pd.Index(rows["hash"].to_numpy(dtype=np.uint64))
+
+    frames = []
+    aggregates: Dict[str, pd.DataFrame] = {}
+    for entry, manifest in iter_manifests(snapshots, store):
+        if entry["manifest"] not in aggregates:
+            hashes = manifest["hash"].to_numpy(dtype=np.uint64)
+            aggregates[entry["manifest"]] = measures.loc[hashes].groupby(dim, dropna=False, sort=True).sum()
+        agg = aggregates[entry["manifest"]].reset_index()
+        agg.insert(0, "taken_at", entry["taken_at"])
+        agg.insert(0, "snapshot", entry["id"])
+        frames.append(agg)
+    return pd.concat(frames, ignore_index=True)
+
+
+def adoption_series(store: str = SNAPSHOT_DIR) -> Optional[Dict[str, Any]]:
+    """National adoption / completeness rates per snapshot (chart 09 input), or None with < 2 snapshots."""
+    series = region_timeseries(store)
+    if series["snapshot"].nunique() < 2:
+        return None
+    totals = series.groupby(["snapshot", "taken_at"], sort=False)[["n", "hasJurnal", "hasMeeting", "has_email", "has_phone"]].sum()
+    rate = lambda col: [round(float(v), 2) for v in totals[col] / totals["n"] * 100]
+    return {
+        "taken_at": [t for _, t in totals.index],
+        "journal": rate("hasJurnal"),
+        "meeting": rate("hasMeeting"),
+        "email": rate("has_email"),
+        "phone": rate("has_phone"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Snapshot history of the schools export")
+    parser.add_argument("--store", default=SNAPSHOT_DIR, help="snapshot directory")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("take", help="snapshot the current export")
+    sub.add_parser("list", help="list snapshots")
+    p_diff = sub.add_parser("diff", help="schools added/removed/modified between two snapshots")
+    p_diff.add_argument("a", nargs="?", default="previous")
+    p_diff.add_argument("b", nargs="?", default="latest")
+    p_diff.add_argument("--columns", action="store_true", help="also list the changed columns")
+    p_ts = sub.add_parser("timeseries", help="per-region measures for every snapshot")
+    p_ts.add_argument("--region", help="only this region")
+    p_ts.add_argument("--csv", metavar="PATH", help="write the table to PATH instead of printing it")
+    args = parser.parse_args()
+
+    if args.command == "take":
+        snapshot_export(args.store)
+    elif args.command == "list":
+        for entry in load_catalog(args.store):
+            print(f"{entry['id']}\t{entry['taken_at']}\t{entry['rows']} rows\t{entry['new_rows']} new")
+    elif args.command == "diff":
+        result = diff(args.a, args.b, args.store, columns=args.columns)
+        print(f"[info] {result['a']} -> {result['b']}: {len(result['added'])} added, "
+              f"{len(result['removed'])} removed, {len(result['modified'])} modified")
+        if args.columns and len(result["changes"]):
+            print(result["changes"].to_string(index=False))
+    else:
+        series = region_timeseries(args.store)
+        if args.region:
+            series = series[series["regionName"] == args.region]
+        if args.csv:
+            series.to_csv(args.csv, index=False, encoding="utf-8")
+            print(f"[ok] {len(series)} rows -> {args.csv}")
+        else:
+            print(series.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
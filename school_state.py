@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+school_state.py
+
+Incremental (delta) mode for schools.py.
+
+Keeps a SQLite state store keyed by school id (falling back to utisCode)
+holding a content hash of every raw record plus its prepared row. Each run
+only sends new or changed records through prepare_rows, appends the
+differences to a change log and brings the outputs up to date:
+
+ - nothing changed            -> outputs are left untouched
+ - schools only appended      -> new rows are appended to schools.csv; the
+                                 XLSX, Parquet copy, search index, summary
+                                 and quality report are rebuilt from the
+                                 stored rows
+ - anything else              -> outputs are rewritten from the stored rows
+                                 (no re-normalization)
+
+Only normalization and the CSV append scale with the size of the delta.
+The XLSX, Parquet copy, search index, summary and quality report have no
+cheap append and are rebuilt from all stored rows whenever anything
+changed, and a modification, removal or move rewrites the CSV too. What
+the delta saves is re-normalizing the unchanged schools (on the synthetic
+feed, a 10-row append takes 55-65% of the time of a full export).
+Appending also requires that the new rows leave every column's inferred
+dtype alone (see schools.stats_schema), so the CSV stays byte-identical
+to a full export. The new state is committed, and the
+change log written, only once the outputs are; a failed export leaves the
+store as it was and the next run retries the same delta.
+
+Outputs:
+ - schools_state.sqlite
+ - schools_changes.jsonl
+ - schools.csv (appended to) / schools.xlsx / schools.parquet (rebuilt)
+ - schools_quality.csv / schools_quality.json (rechecked on every change)
+
+Usage:
+ python schools.py --incremental
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from datetime import datetime, timezone
+import csv
+import hashlib
+import json
+import os
+import sqlite3
+
+import schools
+
+STATE_DB = "schools_state.sqlite"
+CHANGE_LOG = "schools_changes.jsonl"
+KEY_FIELDS = ("id", "utisCode")
+CHANGE_KINDS = ("added", "modified", "removed", "moved")
+
+
+def record_hash(rec: Any) -> str:
+    payload = json.dumps(rec, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def record_key(rec: Any, digest: Optional[str] = None) -> str:
+    if isinstance(rec, dict):
+        for field in KEY_FIELDS:
+            val = schools.resolve_field(rec, field)
+            if val not in ("", None):
+                return f"{field}:{val}"
+    return f"hash:{digest or record_hash(rec)}"
+
+
+def open_state(path: str = STATE_DB) -> sqlite3.Connection:
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS schools ("
+        " key TEXT PRIMARY KEY,"
+        " position INTEGER NOT NULL,"
+        " hash TEXT NOT NULL,"
+        " row TEXT NOT NULL)"
+    )
+    return conn
+
+
+def sync_state(conn: sqlite3.Connection, records: Iterable[Dict[str, Any]]) -> Tuple[Dict[str, List[str]], List[Dict[str, Any]]]:
+    """
+    Diff `records` against the store and write the new state to `conn`
+    without committing it.
+
+    Returns (changes, rows): changes maps each of CHANGE_KINDS to the affected
+    keys, rows are the freshly prepared rows for added + modified records.
+    """
+    known = {key: (position, digest) for key, position, digest in conn.execute("SELECT key, position, hash FROM schools")}
+    changes: Dict[str, List[str]] = {kind: [] for kind in CHANGE_KINDS}
+    pending: List[Tuple[str, int, str, Dict[str, Any]]] = []
+    moves: List[Tuple[int, str]] = []
+    seen = set()
+    occurrences: Dict[str, int] = {}
+    for position, rec in enumerate(records):
+        digest = record_hash(rec)
+        key = record_key(rec, digest)
+        # a repeated key is numbered by occurrence, not position, so inserting
+        # other records ahead of it does not re-key it
+        n = occurrences[key] = occurrences.get(key, 0) + 1
+        if n > 1:
+            key = f"{key}#{n}"
+        seen.add(key)
+        old = known.get(key)
+        if old is None:
+            changes["added"].append(key)
+            pending.append((key, position, digest, rec))
+        elif old[1] != digest:
+            changes["modified"].append(key)
+            pending.append((key, position, digest, rec))
+        elif old[0] != position:
+            changes["moved"].append(key)
+            moves.append((position, key))
+    changes["removed"] = [key for key in known if key not in seen]
+
+    rows = schools.prepare_rows([p[3] for p in pending])
+    conn.executemany(
+        "INSERT OR REPLACE INTO schools (key, position, hash, row) VALUES (?, ?, ?, ?)",
+        [(key, position, digest, json.dumps(row, ensure_ascii=False))
+         for (key, position, digest, _), row in zip(pending, rows)],
+    )
+    conn.executemany("UPDATE schools SET position = ? WHERE key = ?", moves)
+    conn.executemany("DELETE FROM schools WHERE key = ?", [(key,) for key in changes["removed"]])
+    return changes, rows
+
+
+def load_rows(conn: sqlite3.Connection) -> List[Dict[str, Any]]:
+    return [json.loads(row) for (row,) in conn.execute("SELECT row FROM schools ORDER BY position")]
+
+
+def append_change_log(changes: Dict[str, List[str]], path: str = CHANGE_LOG) -> None:
+    ts = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    with open(path, "a", encoding="utf-8") as fh:
+        for kind in CHANGE_KINDS:
+            for key in changes[kind]:
+                fh.write(json.dumps({"ts": ts, "change": kind, "key": key}, ensure_ascii=False) + "\n")
+
+
+def read_csv_header(path: str) -> Optional[List[str]]:
+    if not os.path.exists(path):
+        return None
+    with open(path, newline="", encoding="utf-8") as fh:
+        return next(csv.reader(fh), None)
+
+
+def row_schema(rows: List[Dict[str, Any]]) -> Dict[str, List[str]]:
+    return schools.stats_schema(schools.update_column_stats(schools.new_column_stats(), rows))
+
+
+def patch_outputs(conn: sqlite3.Connection, changes: Dict[str, List[str]], rows: List[Dict[str, Any]], first_run: bool) -> None:
+    if not any(changes.values()):
+        print(f"[info] No changes since last run; {schools.OUT_CSV} and {schools.OUT_XLSX} left as-is.")
+        return
+    stored = load_rows(conn)
+    header = read_csv_header(schools.OUT_CSV)
+    appendable = (
+        not first_run
+        and header is not None
+        and not changes["modified"] and not changes["removed"] and not changes["moved"]
+    )
+    if appendable:
+        # only appended: the new rows are the last ones, and must not change any column's dtype
+        schema = row_schema(stored[:len(stored) - len(rows)])
+        appendable = schema["columns"] == header and row_schema(stored) == schema
+    if not appendable:
+        schools.save_outputs(stored)
+        return
+    df = schools.build_frame(stored)
+    size = os.path.getsize(schools.OUT_CSV)
+    try:
+        df.iloc[len(df) - len(rows):].to_csv(schools.OUT_CSV, mode="a", header=False, index=False, encoding="utf-8")
+        print(f"[ok] Appended {len(rows)} row(s) -> {schools.OUT_CSV}")
+        # the XLSX and the derived outputs have no cheap append; rebuild them from the stored rows
+        schools.write_xlsx_frame(df, schools.OUT_XLSX)
+        print(f"[ok] Rebuilt {schools.OUT_XLSX}")
+        schools.save_derived(df)
+    except BaseException:
+        # the state is rolled back, so the retry appends these rows again
+        with open(schools.OUT_CSV, "r+b") as fh:
+            fh.truncate(size)
+        raise
+
+
+def run_incremental(records: Iterable[Dict[str, Any]], db_path: str = STATE_DB, log_path: str = CHANGE_LOG) -> Dict[str, List[str]]:
+    conn = open_state(db_path)
+    try:
+        first_run = conn.execute("SELECT COUNT(*) FROM schools").fetchone()[0] == 0
+        changes, rows = sync_state(conn, records)
+        summary = ", ".join(f"{len(changes[kind])} {kind}" for kind in CHANGE_KINDS)
+        print(f"[info] Delta against {db_path}: {summary}")
+        if first_run and not changes["added"]:
+            print("[warn] No records found.")
+            return changes
+        try:
+            patch_outputs(conn, changes, rows, first_run)
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+        append_change_log(changes, log_path)
+    finally:
+        conn.close()
+    return changes
@@ -0,0 +1,87 @@
+"""
+school_summary.py
+
+Small precomputed summary of the export for the quick CLI answers.
+
+schools.py writes schools_summary.json after every export: the school
+count, value counts for region / type / kind / subjection and the
+adoption and contact-completeness totals of school_cube. `school_cli.py
+stats` and check_types.py read it with the json module only, so they start
+in tens of milliseconds instead of importing pandas and scanning the
+export. A summary older than schools.csv / schools.parquet is rebuilt from
+the export (the slow path) and saved again.
+
+Outputs:
+ - schools_summary.json
+"""
+
+from typing import Any, Dict, Optional, Sequence
+from datetime import datetime, timezone
+import json
+import os
+
+SUMMARY_PATH = "schools_summary.json"
+# 2: blank / placeholder contacts no longer count as present
+# 3: a contact counts only if it passes the quality format rules (school_quality.has_valid)
+SUMMARY_VERSION = 3
+SUMMARY_DIMENSIONS: Sequence[str] = ("regionName", "schoolType", "schoolKind", "subjection")
+SUMMARY_COLUMNS: Sequence[str] = (
+    *SUMMARY_DIMENSIONS, "hasJurnal", "hasMeeting", "lat", "lng", "contacts_emails", "contacts_phones", "siteUrl",
+)
+EXPORT_PATHS: Sequence[str] = ("schools.parquet", "schools.csv")
+
+
+def build_summary(df: Any) -> Dict[str, Any]:
+    """The summary of an export frame (raw prepare_frame output or a loaded export)."""
+    import school_data
+    from school_cube import MEASURES, build_cube, counts, total
+
+    typed = school_data.to_typed_frame(df[[c for c in SUMMARY_COLUMNS if c in df.columns]])
+    cube = build_cube(typed)
+    return {
+        "version": SUMMARY_VERSION,
+        "generated_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "total": total(cube),
+        "counts": {dim: [[str(k), int(v)] for k, v in counts(cube, dim).items()]
+                   for dim in SUMMARY_DIMENSIONS if dim in cube.columns},
+        "totals": {
+            "hasJurnal": total(cube, hasJurnal=True),
+            "hasMeeting": total(cube, hasMeeting=True),
+            **{m: total(cube, m) for m in MEASURES if m != "n"},
+        },
+    }
+
+
+def write_summary(df: Any, path: str = SUMMARY_PATH) -> Dict[str, Any]:
+    summary = build_summary(df)
+    with open(f"{path}.tmp", "w", encoding="utf-8") as fh:
+        json.dump(summary, fh, ensure_ascii=False, indent=1)
+    os.replace(f"{path}.tmp", path)
+    return summary
+
+
+def is_stale(path: str = SUMMARY_PATH, sources: Sequence[str] = EXPORT_PATHS) -> bool:
+    if not os.path.exists(path):
+        return True
+    newest = max((os.path.getmtime(p) for p in sources if os.path.exists(p)), default=0)
+    return os.path.getmtime(path) < newest
+
+
+def read_summary(path: str = SUMMARY_PATH) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, encoding="utf-8") as fh:
+            summary = json.load(fh)
+    except (OSError, ValueError):
+        return None
+    return summary if summary.get("version") == SUMMARY_VERSION else None
+
+
+def load_summary(path: str = SUMMARY_PATH) -> Dict[str, Any]:
+    """The summary, rebuilt from the export when missing or older than it."""
+    summary = None if is_stale(path) else read_summary(path)
+    if summary is None:
+        from school_data import load_schools
+
+        print(f"[info] {path} is missing or older than the export; rebuilding it...")
+        summary = write_summary(load_schools(columns=list(SUMMARY_COLUMNS)), path)
+    return summary
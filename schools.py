@@ -10,28 +10,82 @@ and writes CSV + XLSX + raw JSON.
 Outputs:
  - raw_response.json
  - schools.csv
- - schools.xlsx
+ - schools.xlsx (streamed with xlsxwriter when installed, else openpyxl write-only)
+ - schools.parquet (typed, when pyarrow is installed)
+ - schools_contacts.csv (one row per contact, with --batch-contacts)
+ - schools_schema.json (column list, with --chunk-size)
+ - schools_search.pkl (name/address search index; see school_search.py)
+ - schools_summary.json (counts for `school_cli.py stats`; see school_summary.py)
+ - schools_quality.csv / schools_quality.json (data-quality rule violations; see school_quality.py)
+ - snapshots/ (history of exports, with --snapshot; see school_snapshots.py)
+ - schools.sqlite (typed tables, contacts and chart summaries, with --db; see school_db.py)
+ - images/ (school photos and thumbnails, with --images; see school_images.py)
+ - run_report.json (per-stage wall/CPU time and peak memory; see pipeline_metrics.py)
 
 Requires:
- pip install requests pandas openpyxl
+ pip install requests pandas openpyxl pyarrow
+ (optional: xlsxwriter)
 """
 
-from typing import Any, Dict, List, Sequence, Tuple
+from typing import TYPE_CHECKING, Any, Callable, Collection, Dict, FrozenSet, Iterable, Iterator, List, Optional, Sequence, Tuple
+from collections import Counter
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import chain, islice
+import argparse
+import codecs
+import math
+import os
+import queue
+import random
 import requests
+from requests.adapters import HTTPAdapter
 import json
 import time
 import sys
 import urllib3
-import pandas as pd
+
+import pipeline_metrics
+import response_cache
+import school_data
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 API_URL = "https://digital.edu.az/backend-api/schools"
 OUT_CSV = "schools.csv"
 OUT_XLSX = "schools.xlsx"
+OUT_PARQUET = school_data.OUT_PARQUET
 RAW_JSON = "raw_response.json"
 
 TIMEOUT = 10
 MAX_RETRIES = 4
 RETRY_BACKOFF = 2.0
+PLAN_SAMPLE_SIZE = 100
+XLSX_WIDTH_SAMPLE = 200
+XLSX_MAX_WIDTH = 60
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Chunked export (save_outputs_chunked)
+CHUNK_SIZE = 5000
+SCHEMA_PATH = "schools_schema.json"
+
+# Pagination (fetch_pages). Parameter names are sent as query arguments.
+FETCH_WORKERS = 8
+PAGE_SIZE = 500
+PAGE_START = 1
+PAGE_PARAM = "page"
+PAGE_SIZE_PARAM = "pageSize"
+OFFSET_PARAM = "offset"
+LIMIT_PARAM = "limit"
+# Statuses a listing may answer a page past its end with; any other error is raised.
+END_STATUSES: FrozenSet[int] = frozenset({404, 416})
+TOTAL_KEYS: Sequence[str] = ("total", "totalCount", "totalElements", "count", "recordsTotal")
+
+RECORD_KEYS: Sequence[str] = ("data", "items", "results", "schools", "rows")
+JSON_DECODER = json.JSONDecoder()
+JSON_WHITESPACE = " \t\r\n"
+JSON_DELIMITERS = ",]}" + JSON_WHITESPACE
 
 REQUESTED_COLUMNS: Sequence[str] = [
     "address",
@@ -58,6 +112,9 @@ REQUESTED_COLUMNS: Sequence[str] = [
     "utisCode",
 ]
 
+CONTACT_COLUMNS: Sequence[str] = ("contacts", "contacts_phones", "contacts_emails", "contacts_json")
+REQUESTED_COLUMN_SET: FrozenSet[str] = frozenset(REQUESTED_COLUMNS)
+
 CANDIDATE_PATHS: Dict[str, List[str]] = {
     "address": ["address", "addressText", "location.address", "location", "adress"],
     "contacts": ["contacts", "contact", "contactsList", "phones", "emails"],
@@ -80,28 +137,248 @@ CANDIDATE_PATHS: Dict[str, List[str]] = {
     "utisCode": ["utisCode", "utis_code", "utis", "utisId"],
 }
 
-def fetch_json(url: str) -> Any:
-    urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+def with_retries(url: str, attempt_fn: Callable[[], Any]) -> Any:
     last_exc = None
     for attempt in range(1, MAX_RETRIES + 1):
         try:
-            resp = requests.get(url, timeout=TIMEOUT, verify=False)
-            resp.raise_for_status()
-            return resp.json()
+            return attempt_fn()
         except Exception as e:
             last_exc = e
+            pipeline_metrics.count("retries")
             wait = RETRY_BACKOFF ** attempt
             print(f"[warn] fetch attempt {attempt}/{MAX_RETRIES} failed: {e}. retrying in {wait:.1f}s", file=sys.stderr)
             time.sleep(wait)
     raise RuntimeError(f"Failed to fetch {url} after {MAX_RETRIES} attempts: {last_exc}")
 
+def fetch_json(url: str, cache_dir: Optional[str] = None, ttl: float = response_cache.CACHE_TTL,
+               offline: bool = False) -> Any:
+    root, _, save_cache = fetch_json_conditional(url, cache_dir, ttl, offline)
+    save_cache()
+    return root
+
+def keep_cache() -> None:
+    pass
+
+def fetch_json_conditional(url: str, cache_dir: Optional[str] = None, ttl: float = response_cache.CACHE_TTL,
+                           offline: bool = False) -> Tuple[Any, bool, Callable[[], None]]:
+    """
+    Fetch and decode `url`. Returns (json, changed, save_cache).
+
+    Without a cache_dir every call is a plain GET and changed is True. With
+    one, a fresh entry is served without a request and a stale one is
+    revalidated; changed is False for both and for a 304. offline=True only
+    replays the cache (changed=True, so the payload is processed).
+
+    The cache is not written here: save_cache() stores the new body (or
+    restarts the TTL after a 304), and the caller runs it once the payload
+    has been exported, so a failed export is fetched again next time.
+    """
+    entry = response_cache.load_entry(cache_dir, url) if cache_dir else None
+    if offline:
+        if entry is None:
+            raise RuntimeError(f"No cached response for {url} in {cache_dir}")
+        return json.loads(entry[1]), True, keep_cache
+    if entry is not None and response_cache.is_fresh(entry[0], ttl):
+        pipeline_metrics.count("cache_hits")
+        return json.loads(entry[1]), False, keep_cache
+    urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+    headers = response_cache.conditional_headers(entry[0]) if entry is not None else {}
+
+    def attempt() -> Tuple[Any, bool, Callable[[], None]]:
+        resp = requests.get(url, timeout=TIMEOUT, verify=False, headers=headers)
+        pipeline_metrics.count("requests")
+        pipeline_metrics.count("latency_seconds", resp.elapsed.total_seconds())
+        pipeline_metrics.count("bytes", len(resp.content))
+        if resp.status_code == 304 and entry is not None:
+            pipeline_metrics.count("not_modified")
+            return json.loads(entry[1]), False, lambda: response_cache.touch_entry(cache_dir, url, entry[0])
+        resp.raise_for_status()
+        root = resp.json()
+        if not cache_dir:
+            return root, True, keep_cache
+        return root, True, lambda: response_cache.store_entry(cache_dir, url, resp.content, resp.headers)
+
+    return with_retries(url, attempt)
+
+def open_stream(url: str) -> requests.Response:
+    urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+    def attempt() -> requests.Response:
+        resp = requests.get(url, timeout=TIMEOUT, verify=False, stream=True)
+        pipeline_metrics.count("requests")
+        pipeline_metrics.count("latency_seconds", resp.elapsed.total_seconds())
+        resp.raise_for_status()
+        return resp
+
+    return with_retries(url, attempt)
+
+def stream_chunks(url: str, raw_path: Optional[str] = RAW_JSON) -> Iterator[bytes]:
+    """
+    Yield the response body in STREAM_CHUNK_SIZE pieces, writing each piece to
+    `raw_path` as-is. Only the connection is retried: once bytes have been
+    handed out a failure propagates to the caller.
+    """
+    resp = open_stream(url)
+    with resp, (open(raw_path, "wb") if raw_path else nullcontext()) as fh:
+        for chunk in resp.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+            pipeline_metrics.count("bytes", len(chunk))
+            if fh is not None:
+                fh.write(chunk)
+            yield chunk
+
+def fetch_stream(url: str, raw_path: Optional[str] = RAW_JSON) -> Iterator[Dict[str, Any]]:
+    return iter_json_records(stream_chunks(url, raw_path))
+
+def make_session(pool_size: int = FETCH_WORKERS) -> requests.Session:
+    """Session with keep-alive and a connection pool sized for `pool_size` workers."""
+    urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+    session = requests.Session()
+    session.verify = False
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+def page_params(index: int, page_size: int, mode: str = "page") -> Dict[str, int]:
+    if mode == "offset":
+        return {OFFSET_PARAM: index * page_size, LIMIT_PARAM: page_size}
+    return {PAGE_PARAM: PAGE_START + index, PAGE_SIZE_PARAM: page_size}
+
+def is_client_error(exc: Exception) -> bool:
+    response = getattr(exc, "response", None)
+    return (isinstance(exc, requests.HTTPError) and response is not None
+            and 400 <= response.status_code < 500 and response.status_code not in (408, 429))
+
+def is_past_end(exc: requests.HTTPError) -> bool:
+    return exc.response is not None and exc.response.status_code in END_STATUSES
+
+def fetch_page(session: requests.Session, url: str, params: Dict[str, int],
+               backoff: float = RETRY_BACKOFF) -> Tuple[Any, int]:
+    """
+    Fetch one page, retrying with full-jitter backoff. Only the calling worker
+    sleeps, so other pages keep downloading. A client error (4xx other than
+    408/429) is raised as the HTTPError on the spot: asking again won't
+    change it. Returns (json, retries used).
+    """
+    last_exc = None
+    for attempt in range(1, MAX_RETRIES + 1):
+        try:
+            resp = session.get(url, params=params, timeout=TIMEOUT)
+            pipeline_metrics.count("requests")
+            pipeline_metrics.count("latency_seconds", resp.elapsed.total_seconds())
+            pipeline_metrics.count("bytes", len(resp.content))
+            resp.raise_for_status()
+            return resp.json(), attempt - 1
+        except Exception as e:
+            last_exc = e
+            if is_client_error(e):
+                raise
+            if attempt == MAX_RETRIES:
+                break
+            pipeline_metrics.count("retries")
+            wait = random.uniform(0, backoff ** attempt)
+            print(f"[warn] page {params} attempt {attempt}/{MAX_RETRIES} failed: {e}. retrying in {wait:.1f}s", file=sys.stderr)
+            time.sleep(wait)
+    raise RuntimeError(f"Failed to fetch {url} {params} after {MAX_RETRIES} attempts: {last_exc}")
+
+def total_from(root_json: Any) -> Optional[int]:
+    if isinstance(root_json, dict):
+        for key in TOTAL_KEYS:
+            if isinstance(root_json.get(key), int):
+                return root_json[key]
+    return None
+
+def fetch_pages(url: str, page_size: int = PAGE_SIZE, workers: int = FETCH_WORKERS, mode: str = "page",
+                backoff: float = RETRY_BACKOFF, session: Optional[requests.Session] = None) -> List[Dict[str, Any]]:
+    """
+    Download a paginated listing with up to `workers` pages in flight.
+
+    The first page is fetched alone. A short first page is either the whole
+    listing or a server that caps the page size: the reported total (or,
+    without one, a probe of the next page at the first page's length)
+    decides, and a cap becomes the page size for the rest. If a total is
+    reported every remaining page is scheduled at once; otherwise pages are
+    requested in windows of `workers` until a short page, or a 404/416 after
+    a full one, marks the end; pages past it are dropped, errors included.
+    Any other client error (401, 403, ...) is raised rather than read as the
+    end, so a refused page never truncates the export; 429 is retried like a
+    server error. Records are returned in page order.
+    """
+    session = session or make_session(workers)
+    start = time.perf_counter()
+    first, retries = fetch_page(session, url, page_params(0, page_size, mode), backoff)
+    pages: Dict[int, List[Dict[str, Any]]] = {0: extract_records(first)}
+    total = total_from(first)
+    size = len(pages[0])
+    if 0 < size < page_size and (total is None or total > size):
+        capped = total is not None
+        if not capped:
+            try:
+                probe, used = fetch_page(session, url, page_params(1, size, mode), backoff)
+            except requests.HTTPError as e:
+                if not is_past_end(e):
+                    raise
+                print(f"[info] page 1 answered {e.response.status_code}; taking page 0 as the last")
+            except RuntimeError as e:
+                print(f"[warn] probe past the short first page failed, taking it as the last: {e}", file=sys.stderr)
+            else:
+                retries += used
+                pages[1] = extract_records(probe)
+                capped = bool(pages[1])
+        if capped:
+            print(f"[info] Server caps pages at {size} records (asked for {page_size})")
+            page_size = size
+        else:
+            pages.pop(1, None)
+    last_page = next((i for i in sorted(pages) if len(pages[i]) < page_size), None)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        if total is not None:
+            last_page = max(0, math.ceil(total / page_size) - 1)
+            futures = {pool.submit(fetch_page, session, url, page_params(i, page_size, mode), backoff): i
+                       for i in range(len(pages), last_page + 1)}
+            for fut in as_completed(futures):
+                root, used = fut.result()
+                pages[futures[fut]] = extract_records(root)
+                retries += used
+        next_index = len(pages)
+        while last_page is None:
+            window = range(next_index, next_index + workers)
+            futures_in_order = [pool.submit(fetch_page, session, url, page_params(i, page_size, mode), backoff)
+                                for i in window]
+            for i, fut in zip(window, futures_in_order):
+                if last_page is not None:
+                    # past the end: out-of-range pages may be empty or errors, neither matters
+                    fut.cancel()
+                    continue
+                try:
+                    root, used = fut.result()
+                except requests.HTTPError as e:
+                    # some listings answer an out-of-range page with 404/416 instead of an empty one
+                    if not is_past_end(e):
+                        raise
+                    print(f"[info] page {i} answered {e.response.status_code}; taking page {i - 1} as the last")
+                    last_page = i - 1
+                    continue
+                pages[i] = extract_records(root)
+                retries += used
+                if len(pages[i]) < page_size:
+                    last_page = i
+            next_index += workers
+
+    elapsed = time.perf_counter() - start
+    n_pages = last_page + 1
+    print(f"[info] Fetched {n_pages} page(s) with {retries} retry(ies) in {elapsed:.2f}s "
+          f"({n_pages / elapsed if elapsed > 0 else 0:.1f} pages/s)")
+    return [rec for i in range(n_pages) for rec in pages[i]]
+
 def extract_records(root_json: Any) -> List[Dict[str, Any]]:
     if root_json is None:
         return []
     if isinstance(root_json, list):
         return root_json
     if isinstance(root_json, dict):
-        for key in ("data", "items", "results", "schools", "rows"):
+        for key in RECORD_KEYS:
             if key in root_json:
                 if isinstance(root_json[key], list):
                     return root_json[key]
@@ -112,6 +389,117 @@ def extract_records(root_json: Any) -> List[Dict[str, Any]]:
         return [root_json]
     return []
 
+def iter_json_records(chunks: Iterable[bytes]) -> Iterator[Any]:
+    """
+    Incremental counterpart of extract_records(json.loads(body)).
+
+    Records are decoded one at a time from `chunks`, so only the current
+    record and one chunk are held in memory. A top-level array is streamed
+    directly. In a top-level object the records come from the same
+    RECORD_KEYS entry extract_records would pick (by priority, not document
+    order): an array is streamed once every higher-priority key has been seen
+    and ruled out, so "data" always streams, while e.g. an "items" array read
+    before a possible "data" is buffered. Any other shape is buffered and
+    handed to extract_records. The source is always drained to the end so a
+    tee in `chunks` sees the whole body.
+    """
+    source = iter(chunks)
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    buf = ""
+    pos = 0
+    eof = False
+
+    def fill() -> None:
+        nonlocal buf, pos, eof
+        for chunk in source:
+            text = decoder.decode(chunk)
+            if text:
+                buf = buf[pos:] + text
+                pos = 0
+                return
+        buf = buf[pos:] + decoder.decode(b"", final=True)
+        pos = 0
+        eof = True
+
+    def peek() -> str:
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in JSON_WHITESPACE:
+                pos += 1
+            if pos < len(buf):
+                return buf[pos]
+            if eof:
+                return ""
+            fill()
+
+    def value() -> Any:
+        nonlocal pos
+        # objects, arrays and strings only decode once complete, but a number
+        # cut at a chunk boundary still decodes, so it needs a delimiter after it
+        self_delimiting = peek() in '{["'
+        while True:
+            try:
+                obj, end = JSON_DECODER.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            else:
+                if self_delimiting or eof or (end < len(buf) and buf[end] in JSON_DELIMITERS):
+                    pos = end
+                    return obj
+            fill()
+
+    def array_items() -> Iterator[Any]:
+        nonlocal pos
+        while True:
+            c = peek()
+            if c == "]":
+                pos += 1
+                return
+            if c == ",":
+                pos += 1
+                continue
+            if c == "":
+                raise ValueError("Unexpected end of JSON stream inside array")
+            yield value()
+
+    first = peek()
+    if first == "[":
+        pos += 1
+        yield from array_items()
+    elif first == "{":
+        pos += 1
+        other: Dict[str, Any] = {}
+        streamed = False
+        while True:
+            c = peek()
+            if c == "}":
+                pos += 1
+                break
+            if c == ",":
+                pos += 1
+                continue
+            if c == "":
+                raise ValueError("Unexpected end of JSON stream inside object")
+            key = value()
+            if peek() != ":":
+                raise ValueError(f"Expected ':' after key {key!r} in JSON stream")
+            pos += 1
+            if key in RECORD_KEYS and peek() == "[" and all(
+                    h in other and not isinstance(other[h], (list, dict))
+                    for h in RECORD_KEYS[:RECORD_KEYS.index(key)]):
+                pos += 1
+                yield from array_items()
+                streamed = True
+                break
+            other[key] = value()
+        if not streamed:
+            yield from extract_records(other)
+    elif first:
+        yield from extract_records(value())
+    for _ in source:
+        pass
+
 def get_by_path(obj: Dict[str, Any], path: str) -> Any:
     node = obj
     for part in path.split("."):
@@ -228,120 +616,612 @@ def normalize_contacts_field(raw_val: Any) -> Tuple[str, str, str, str]:
         contacts_json = str(items)
     return (contacts_all, contacts_phones, contacts_emails, contacts_json)
 
+def coerce_generic(val: Any) -> Any:
+    if isinstance(val, (dict, list)):
+        return json.dumps(val, ensure_ascii=False)
+    return val
+
+def coerce_image_token(val: Any) -> Any:
+    if isinstance(val, dict):
+        for k in ("token", "fileName", "file", "name", "imageToken"):
+            if k in val and val[k]:
+                return val[k]
+        return json.dumps(val, ensure_ascii=False)
+    return coerce_generic(val)
+
+def coerce_coordinate(val: Any) -> Any:
+    try:
+        return float(str(val).replace(",", "."))
+    except Exception:
+        return val
+
+def coerce_flag(val: Any) -> Any:
+    if isinstance(val, bool):
+        return val
+    if str(val).lower() in ("1", "true", "yes"):
+        return True
+    if str(val).lower() in ("0", "false", "no", ""):
+        return False
+    return coerce_generic(val)
+
+def coerce_raw(val: Any) -> Any:
+    # contacts are handled separately in prepare_rows
+    return val
+
+COERCERS: Dict[str, Callable[[Any], Any]] = {
+    "contacts": coerce_raw,
+    "contacts_phones": coerce_raw,
+    "contacts_emails": coerce_raw,
+    "contacts_json": coerce_raw,
+    "imageToken": coerce_image_token,
+    "lat": coerce_coordinate,
+    "lng": coerce_coordinate,
+    "hasJurnal": coerce_flag,
+    "hasMeeting": coerce_flag,
+}
+
+def coerce_field(field_name: str, val: Any) -> Any:
+    return COERCERS.get(field_name, coerce_generic)(val)
+
 def resolve_field(record: Dict[str, Any], field_name: str) -> Any:
     candidates = CANDIDATE_PATHS.get(field_name, [field_name])
     for p in candidates:
         val = get_by_path(record, p)
         if val is None:
             continue
-        if field_name.startswith("contacts"):
-            # we handle contacts separately in prepare_rows
-            return val
-        if field_name == "imageToken" and isinstance(val, dict):
-            for k in ("token", "fileName", "file", "name", "imageToken"):
-                if k in val and val[k]:
-                    return val[k]
-            return json.dumps(val, ensure_ascii=False)
-        if field_name in ("lat", "lng"):
-            try:
-                return float(str(val).replace(",", "."))
-            except Exception:
-                return val
-        if field_name in ("hasJurnal", "hasMeeting"):
-            if isinstance(val, bool):
-                return val
-            if str(val).lower() in ("1", "true", "yes"):
-                return True
-            if str(val).lower() in ("0", "false", "no", ""):
-                return False
-        if isinstance(val, (dict, list)):
-            return json.dumps(val, ensure_ascii=False)
-        return val
+        return coerce_field(field_name, val)
     return ""
 
-def flatten(obj: Any, parent_key: str = "", sep: str = ".") -> Dict[str, Any]:
-    items: Dict[str, Any] = {}
+def get_by_keys(obj: Dict[str, Any], keys: Tuple[str, ...]) -> Any:
+    node = obj
+    for part in keys:
+        if isinstance(node, dict) and part in node:
+            node = node[part]
+        else:
+            return None
+    return node
+
+def infer_key_signature(records: Sequence[Dict[str, Any]], sample_size: int = PLAN_SAMPLE_SIZE) -> Optional[FrozenSet[str]]:
+    """
+    Sample the first `sample_size` records and return the most common set of
+    top-level keys, or None if the sample holds no dict records.
+    """
+    counts: Counter = Counter()
+    for rec in records[:sample_size]:
+        if isinstance(rec, dict):
+            counts[frozenset(rec.keys())] += 1
+    if not counts:
+        return None
+    return counts.most_common(1)[0][0]
+
+def compile_plan(signature: FrozenSet[str]) -> Dict[str, Tuple[List[Tuple[str, ...]], Callable[[Any], Any]]]:
+    """
+    Build a resolver plan for records whose top-level keys equal `signature`.
+
+    For every column the candidate paths are pre-split into key tuples, and
+    candidates whose first key is not in the signature are dropped: they can
+    never resolve on a matching record, so probing them is wasted work.
+    Candidate order is kept, so the plan returns exactly what resolve_field
+    would for the same record. Each column also carries its coercer.
+    """
+    plan: Dict[str, Tuple[List[Tuple[str, ...]], Callable[[Any], Any]]] = {}
+    for col in REQUESTED_COLUMNS:
+        if col in CONTACT_COLUMNS and col != "contacts":
+            continue
+        paths = []
+        for p in CANDIDATE_PATHS.get(col, [col]):
+            keys = tuple(p.split("."))
+            if keys[0] in signature and keys not in paths:
+                paths.append(keys)
+        plan[col] = (paths, COERCERS.get(col, coerce_generic))
+    return plan
+
+def resolve_planned(record: Dict[str, Any], paths: List[Tuple[str, ...]], coerce: Callable[[Any], Any]) -> Any:
+    for keys in paths:
+        val = record.get(keys[0]) if len(keys) == 1 else get_by_keys(record, keys)
+        if val is None:
+            continue
+        return coerce(val)
+    return ""
+
+def flatten_into(obj: Any, out: Dict[str, Any], skip: Collection[str] = (), parent_key: str = "", sep: str = ".") -> Dict[str, Any]:
+    """
+    Flatten `obj` straight into `out` (no intermediate dict per nesting
+    level), leaving keys in `skip` untouched.
+    """
     if isinstance(obj, dict):
         for k, v in obj.items():
             new_key = f"{parent_key}{sep}{k}" if parent_key else k
             if isinstance(v, dict):
-                items.update(flatten(v, new_key, sep))
+                flatten_into(v, out, skip, new_key, sep)
+            elif new_key in skip:
+                continue
             elif isinstance(v, list):
                 try:
-                    items[new_key] = json.dumps(v, ensure_ascii=False)
+                    out[new_key] = json.dumps(v, ensure_ascii=False)
                 except Exception:
-                    items[new_key] = str(v)
+                    out[new_key] = str(v)
             else:
-                items[new_key] = v
-    else:
-        items[parent_key or "value"] = obj
-    return items
-
-def prepare_rows(records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-    rows = []
-    for rec in records:
-        row: Dict[str, Any] = {}
-        # Resolve requested non-contacts columns first
-        for col in REQUESTED_COLUMNS:
-            if col in ("contacts", "contacts_phones", "contacts_emails", "contacts_json"):
-                # we'll compute these below
-                row[col] = ""
-                continue
-            row[col] = resolve_field(rec, col)
-        # Extract raw contacts raw value from the record using candidate paths
-        raw_contacts_val = None
-        # try canonical 'contacts' resolution paths
-        for p in CANDIDATE_PATHS.get("contacts", ["contacts"]):
-            candidate = get_by_path(rec, p)
-            if candidate is not None:
-                raw_contacts_val = candidate
-                break
-        # fallback: top-level 'contacts' key
-        if raw_contacts_val is None and "contacts" in rec:
-            raw_contacts_val = rec["contacts"]
+                out[new_key] = v
+    elif (parent_key or "value") not in skip:
+        out[parent_key or "value"] = obj
+    return out
 
-        # normalize contacts
+def flatten(obj: Any, parent_key: str = "", sep: str = ".") -> Dict[str, Any]:
+    return flatten_into(obj, {}, (), parent_key, sep)
+
+def finish_row(row: Dict[str, Any], rec: Dict[str, Any], raw_contacts_val: Any,
+               normalize_contacts: bool = True, raw_contacts: Optional[List[Any]] = None) -> Dict[str, Any]:
+    # normalize contacts (left blank, with the raw value collected into
+    # raw_contacts, for prepare_rows_batch to fill in)
+    if raw_contacts is not None:
+        raw_contacts.append(raw_contacts_val)
+    if normalize_contacts:
+        started = pipeline_metrics.clock() if pipeline_metrics.CURRENT is not None else None
         contacts_all, contacts_phones, contacts_emails, contacts_json = normalize_contacts_field(raw_contacts_val)
+        if started is not None:
+            pipeline_metrics.add_elapsed("contacts", started)
         row["contacts"] = contacts_all
         row["contacts_phones"] = contacts_phones
         row["contacts_emails"] = contacts_emails
         row["contacts_json"] = contacts_json
 
-        # Flatten and add extra fields without overwriting
-        flat = flatten(rec)
-        for k, v in flat.items():
-            if k in row:
-                continue
-            row[k] = v
-        rows.append(row)
-    return rows
+    # Flatten and add extra fields without overwriting
+    return flatten_into(rec, row, REQUESTED_COLUMN_SET)
+
+def raw_contacts_value(rec: Dict[str, Any]) -> Any:
+    # Extract raw contacts raw value from the record using candidate paths
+    # try canonical 'contacts' resolution paths
+    for p in CANDIDATE_PATHS.get("contacts", ["contacts"]):
+        candidate = get_by_path(rec, p)
+        if candidate is not None:
+            return candidate
+    # fallback: top-level 'contacts' key
+    return rec.get("contacts")
+
+def prepare_row(rec: Dict[str, Any], normalize_contacts: bool = True,
+                raw_contacts: Optional[List[Any]] = None) -> Dict[str, Any]:
+    row: Dict[str, Any] = {}
+    # Resolve requested non-contacts columns first
+    for col in REQUESTED_COLUMNS:
+        if col in CONTACT_COLUMNS:
+            # we'll compute these below
+            row[col] = ""
+            continue
+        row[col] = resolve_field(rec, col)
+    return finish_row(row, rec, raw_contacts_value(rec), normalize_contacts, raw_contacts)
+
+def prepare_row_planned(rec: Dict[str, Any], plan: Dict[str, Tuple[List[Tuple[str, ...]], Callable[[Any], Any]]],
+                        normalize_contacts: bool = True, raw_contacts: Optional[List[Any]] = None) -> Dict[str, Any]:
+    row: Dict[str, Any] = {}
+    for col in REQUESTED_COLUMNS:
+        if col in CONTACT_COLUMNS:
+            row[col] = ""
+            continue
+        paths, coerce = plan[col]
+        row[col] = resolve_planned(rec, paths, coerce)
+    raw_contacts_val = None
+    for keys in plan["contacts"][0]:
+        candidate = get_by_keys(rec, keys)
+        if candidate is not None:
+            raw_contacts_val = candidate
+            break
+    return finish_row(row, rec, raw_contacts_val, normalize_contacts, raw_contacts)
+
+def iter_prepare_rows(records: Iterable[Dict[str, Any]], use_plan: bool = True,
+                      normalize_contacts: bool = True, raw_contacts: Optional[List[Any]] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Normalize records into rows, lazily.
+
+    With use_plan=True a key signature is inferred from the first
+    PLAN_SAMPLE_SIZE records and compiled into a resolver plan; records with
+    that exact top-level key set take the planned path, anything else falls
+    back to the full CANDIDATE_PATHS probe. Output is identical either way.
+    """
+    records = iter(records)
+    sample = list(islice(records, PLAN_SAMPLE_SIZE))
+    signature = infer_key_signature(sample) if use_plan else None
+    plan = compile_plan(signature) if signature is not None else None
+    for rec in chain(sample, records):
+        if plan is not None and isinstance(rec, dict) and rec.keys() == signature:
+            yield prepare_row_planned(rec, plan, normalize_contacts, raw_contacts)
+        else:
+            yield prepare_row(rec, normalize_contacts, raw_contacts)
+
+def prepare_rows(records: Iterable[Dict[str, Any]], use_plan: bool = True) -> List[Dict[str, Any]]:
+    return list(iter_prepare_rows(records, use_plan))
+
+def prepare_rows_batch(records: Iterable[Dict[str, Any]], use_plan: bool = True) -> Tuple[List[Dict[str, Any]], "pd.DataFrame"]:
+    """
+    prepare_rows with the contacts columns filled by the batch normalizer
+    (school_contacts): values are exploded into one long table, split,
+    classified and deduped per school. Returns (rows, contacts table).
+    """
+    import school_contacts
+
+    raw_values: List[Any] = []
+    rows = list(iter_prepare_rows(records, use_plan, normalize_contacts=False, raw_contacts=raw_values))
+    with pipeline_metrics.stage("contacts", records=len(rows)) as counters:
+        table, columns = school_contacts.normalize_batch([r.get("id") for r in rows], raw_values)
+        counters["contacts"] = len(table)
+    for col, values in columns.items():
+        for row, value in zip(rows, values):
+            row[col] = value
+    return rows, table
+
+def prepare_frame(records: Iterable[Dict[str, Any]], use_plan: bool = True) -> "pd.DataFrame":
+    """
+    build_frame(prepare_rows(records)) without holding the rows: each row is
+    folded into a compact column builder (school_columns) as it is produced.
+    The region/type/kind/subjection columns come back categorical.
+    """
+    import school_columns
+
+    builder = school_columns.build(iter_prepare_rows(records, use_plan), REQUESTED_COLUMNS)
+    with pipeline_metrics.stage("build_frame", rows=builder["n"]):
+        return school_columns.builder_frame(builder)
+
+def build_frame(rows: List[Dict[str, Any]]) -> "pd.DataFrame":
+    import pandas as pd
 
-def save_outputs(rows: List[Dict[str, Any]]):
-    if not rows:
-        raise RuntimeError("No rows to save.")
     extra_keys = sorted({k for r in rows for k in r.keys()} - set(REQUESTED_COLUMNS))
     columns = list(REQUESTED_COLUMNS) + extra_keys
-    df = pd.DataFrame(rows, columns=columns)
-    # Save CSV and XLSX
-    df.to_csv(OUT_CSV, index=False, encoding="utf-8")
-    df.to_excel(OUT_XLSX, index=False, engine="openpyxl")
-    print(f"[ok] Saved {len(df)} rows -> {OUT_CSV} and {OUT_XLSX}")
-
-def main():
-    print(f"[info] Fetching {API_URL}")
-    root = fetch_json(API_URL)
-    with open(RAW_JSON, "w", encoding="utf-8") as fh:
-        json.dump(root, fh, ensure_ascii=False, indent=2)
-    print(f"[info] Raw JSON saved to {RAW_JSON}")
-    records = extract_records(root)
-    if not records:
-        print("[warn] No records found.")
-        sys.exit(3)
-    print(f"[info] Found {len(records)} record(s). Preparing rows...")
-    rows = prepare_rows(records)
+    return pd.DataFrame(rows, columns=columns)
+
+def xlsx_cell(val: Any) -> Any:
+    if val is None:
+        return None
+    if isinstance(val, (str, bool, int)):
+        return val
+    if hasattr(val, "item"):
+        # numpy scalars from DataFrame iteration
+        val = val.item()
+        if not isinstance(val, float):
+            return val
+    if isinstance(val, float):
+        return None if math.isnan(val) or math.isinf(val) else val
+    # only frames hold pd.NA, so pandas is already loaded when we get here
+    import pandas as pd
+    return None if val is pd.NA else str(val)
+
+def column_widths(columns: Sequence[str], sample: Sequence[Sequence[Any]]) -> List[int]:
+    widths = [len(str(c)) for c in columns]
+    for values in sample:
+        for i, v in enumerate(values):
+            if v is not None and len(str(v)) > widths[i]:
+                widths[i] = len(str(v))
+    return [min(w, XLSX_MAX_WIDTH) + 2 for w in widths]
+
+def write_xlsx_rows(values: Iterable[Sequence[Any]], columns: Sequence[str], path: str = OUT_XLSX) -> int:
+    """
+    Write rows of cell values to `path` one row at a time.
+
+    Uses xlsxwriter in constant_memory mode when installed, otherwise
+    openpyxl's write-only workbook; neither keeps the sheet in memory.
+    Column widths come from the header and the first XLSX_WIDTH_SAMPLE rows.
+    Returns the number of data rows written.
+    """
+    values = iter(values)
+    sample = [[xlsx_cell(v) for v in row] for row in islice(values, XLSX_WIDTH_SAMPLE)]
+    widths = column_widths(columns, sample)
+    rows = chain(sample, ([xlsx_cell(v) for v in row] for row in values))
+    count = 0
+    try:
+        import xlsxwriter
+    except ImportError:
+        xlsxwriter = None
+    if xlsxwriter is not None:
+        wb = xlsxwriter.Workbook(path, {
+            "constant_memory": True,
+            "strings_to_numbers": False,
+            "strings_to_formulas": False,
+            "strings_to_urls": False,
+        })
+        ws = wb.add_worksheet("Sheet1")
+        header_fmt = wb.add_format({"bold": True, "border": 1, "align": "center", "valign": "top"})
+        for i, w in enumerate(widths):
+            ws.set_column(i, i, w)
+        ws.write_row(0, 0, columns, header_fmt)
+        for count, row in enumerate(rows, 1):
+            ws.write_row(count, 0, row)
+        wb.close()
+        return count
+
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Alignment, Border, Font, Side
+    from openpyxl.utils import get_column_letter
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Sheet1")
+    for i, w in enumerate(widths, 1):
+        ws.column_dimensions[get_column_letter(i)].width = w
+    thin = Side(style="thin")
+    header = []
+    for c in columns:
+        cell = WriteOnlyCell(ws, value=c)
+        cell.font = Font(bold=True)
+        cell.border = Border(left=thin, right=thin, top=thin, bottom=thin)
+        cell.alignment = Alignment(horizontal="center", vertical="top")
+        header.append(cell)
+    ws.append(header)
+    for count, row in enumerate(rows, 1):
+        ws.append(row)
+    wb.save(path)
+    return count
+
+def write_xlsx_frame(df: "pd.DataFrame", path: str = OUT_XLSX) -> int:
+    return write_xlsx_rows(df.itertuples(index=False, name=None), list(df.columns), path)
+
+def export_xlsx(csv_path: str = OUT_CSV, xlsx_path: str = OUT_XLSX) -> int:
+    """Build the XLSX on demand from an existing CSV export."""
+    import pandas as pd
+
+    df = pd.read_csv(csv_path, encoding="utf-8")
+    count = write_xlsx_frame(df, xlsx_path)
+    print(f"[ok] Saved {count} rows -> {xlsx_path} (from {csv_path})")
+    return count
+
+def write_xlsx_stage(values: Iterable[Sequence[Any]], columns: Sequence[str], path: str = OUT_XLSX) -> int:
+    # write_xlsx_rows on the XLSX worker thread, measured as its own stage
+    with pipeline_metrics.stage("xlsx", per_thread=True) as counters:
+        counters["rows"] = write_xlsx_rows(values, columns, path)
+    return counters["rows"]
+
+def save_outputs(rows: List[Dict[str, Any]], write_xlsx: bool = True):
+    """
+    Write CSV, XLSX and Parquet. The XLSX is streamed from `rows` on a worker
+    thread while the CSV is written; write_xlsx=False skips it (see
+    export_xlsx to build it later).
+    """
+    if not rows:
+        raise RuntimeError("No rows to save.")
+    with pipeline_metrics.stage("build_frame", rows=len(rows)):
+        df = build_frame(rows)
+    save_frame(df, write_xlsx, rows)
+
+def save_frame(df: "pd.DataFrame", write_xlsx: bool = True, rows: Optional[List[Dict[str, Any]]] = None):
+    """save_outputs for an already built frame; the XLSX is fed from `rows` when given, else from `df`."""
+    columns = list(df.columns)
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        xlsx_job = None
+        if write_xlsx:
+            values = ([r.get(c) for c in columns] for r in rows) if rows is not None else df.itertuples(index=False, name=None)
+            xlsx_job = pool.submit(write_xlsx_stage, values, columns, OUT_XLSX)
+        with pipeline_metrics.stage("csv", per_thread=True, rows=len(df)):
+            df.to_csv(OUT_CSV, index=False, encoding="utf-8")
+        if xlsx_job is not None:
+            xlsx_job.result()
+    if write_xlsx:
+        print(f"[ok] Saved {len(df)} rows -> {OUT_CSV} and {OUT_XLSX}")
+    else:
+        print(f"[ok] Saved {len(df)} rows -> {OUT_CSV} (XLSX skipped)")
+    save_derived(df)
+
+def save_derived(df: "pd.DataFrame"):
+    """
+    The outputs rebuilt from the whole frame: Parquet copy, search index,
+    summary and quality report. Shared by full exports and the incremental
+    path (school_state), so both run the quality rules.
+    """
+    import school_quality
+
+    with pipeline_metrics.stage("parquet", rows=len(df)):
+        saved = school_data.write_parquet(df, OUT_PARQUET)
+    if saved:
+        print(f"[ok] Saved typed copy -> {OUT_PARQUET}")
+    save_search_index(df["id"].tolist(), df["name"].tolist(), df["address"].tolist())
+    save_summary(df)
+    validator = school_quality.new_validator()
+    with pipeline_metrics.stage("quality", rows=len(df)):
+        school_quality.validate_frame(validator, df)
+    save_quality(validator)
+
+def save_search_index(ids: List[Any], names: List[Any], addresses: List[Any]):
+    import school_search
+
+    path = school_search.index_path_for(OUT_CSV)
+    with pipeline_metrics.stage("search_index", rows=len(ids)) as counters:
+        counters["terms"] = school_search.write_index(ids, names, addresses, path)
+    print(f"[ok] Saved search index ({counters['terms']} terms) -> {path}")
+
+def save_summary(df: Optional["pd.DataFrame"] = None):
+    """schools_summary.json for `df`, or for the export on disk (see school_summary.py)."""
+    import school_summary
+
+    path = os.path.join(os.path.dirname(OUT_CSV), school_summary.SUMMARY_PATH)
+    with pipeline_metrics.stage("summary"):
+        if df is None:
+            df = school_data.load_schools(list(school_summary.SUMMARY_COLUMNS), OUT_PARQUET, OUT_CSV)
+        school_summary.write_summary(df, path)
+    print(f"[ok] Saved summary -> {path}")
+
+def save_quality(validator: Dict[str, Any]):
+    """Resolve the rules checked batch by batch and write the violation table and summary."""
+    import school_quality
+
+    paths = school_quality.quality_paths(OUT_CSV)
+    with pipeline_metrics.stage("quality_report", rows=validator["rows"]) as counters:
+        result = school_quality.finish_validation(validator)
+        school_quality.write_report(result, paths["csv"], paths["json"])
+        counters["violations"] = sum(item["violations"] for item in result["summary"])
+    school_quality.print_summary(result)
+    print(f"[ok] Saved {counters['violations']} rule violations -> {paths['csv']}, {paths['json']}")
+
+def iter_chunks(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    items = iter(items)
+    while True:
+        chunk = list(islice(items, size))
+        if not chunk:
+            return
+        yield chunk
+
+def new_column_stats() -> Dict[str, Any]:
+    # per column: [numeric values, other values, float values]; None counts as missing
+    return {"rows": 0, "columns": {}}
+
+def update_column_stats(stats: Dict[str, Any], rows: Sequence[Dict[str, Any]]) -> Dict[str, Any]:
+    columns = stats["columns"]
+    stats["rows"] += len(rows)
+    for row in rows:
+        for k, v in row.items():
+            counts = columns.get(k)
+            if counts is None:
+                counts = columns[k] = [0, 0, 0]
+            if v is None:
+                continue
+            t = type(v)
+            if t is int:
+                counts[0] += 1
+            elif t is float:
+                counts[0] += 1
+                counts[2] += 1
+            else:
+                counts[1] += 1
+    return stats
+
+def stats_schema(stats: Dict[str, Any]) -> Dict[str, List[str]]:
+    """
+    Columns in build_frame order, plus the columns pandas would infer as
+    float64 over the whole dataset (numbers only, with a float or a gap).
+    Chunks cast those explicitly so an all-int chunk still prints 1.0.
+    """
+    columns = list(REQUESTED_COLUMNS) + sorted(set(stats["columns"]) - REQUESTED_COLUMN_SET)
+    float_columns = []
+    for col in columns:
+        numeric, other, floats = stats["columns"].get(col, (0, 0, 0))
+        if numeric and not other and (floats or numeric < stats["rows"]):
+            float_columns.append(col)
+    return {"columns": columns, "float_columns": float_columns}
+
+def discover_schema(records: Iterable[Dict[str, Any]], chunk_size: int = CHUNK_SIZE) -> Dict[str, List[str]]:
+    """First pass for save_outputs_chunked: normalize without contacts, keep only column stats."""
+    stats = new_column_stats()
+    for chunk in iter_chunks(iter_prepare_rows(records, normalize_contacts=False), chunk_size):
+        update_column_stats(stats, chunk)
+    return stats_schema(stats)
+
+def load_schema(path: str) -> Optional[Dict[str, List[str]]]:
+    try:
+        with open(path, "r", encoding="utf-8") as fh:
+            schema = json.load(fh)
+    except (OSError, ValueError):
+        return None
+    return schema if isinstance(schema, dict) and "columns" in schema else None
+
+def save_schema(schema: Dict[str, List[str]], path: str) -> None:
+    with open(path, "w", encoding="utf-8") as fh:
+        json.dump(schema, fh, ensure_ascii=False, indent=2)
+
+def put_chunk(q: "queue.Queue", item: Any, job: Any) -> None:
+    # don't block forever on a full queue if the XLSX writer has died
+    while True:
+        try:
+            q.put(item, timeout=0.5)
+            return
+        except queue.Full:
+            if job.done():
+                job.result()
+                return
+
+def drain(q: "queue.Queue") -> Iterator[Sequence[Any]]:
+    while True:
+        chunk = q.get()
+        if chunk is None:
+            return
+        yield from chunk
+
+def save_outputs_chunked(records: Iterable[Dict[str, Any]], chunk_size: int = CHUNK_SIZE,
+                         schema_path: Optional[str] = SCHEMA_PATH, write_xlsx: bool = True) -> int:
+    """
+    Bounded-memory export: records are normalized CHUNK_SIZE at a time and
+    each chunk is appended to the CSV, the Parquet file (one row group per
+    chunk) and the streamed XLSX, so only one chunk of rows is held at once.
+    Each chunk frame is also run through the school_quality rules.
+
+    The column set comes from `schema_path` when it exists, otherwise from
+    a first pass over `records` (a one-shot stream is held in memory for
+    that first run only). The CSV is byte-identical to save_outputs. The
+    chunks go to "<output>.tmp" files that replace the outputs only once
+    the run is over and the schema seen during it (written back to
+    `schema_path`) matches the one used; otherwise the temp files are
+    dropped, the old outputs are left alone and RuntimeError is raised.
+    Returns the number of rows written.
+    """
+    import pandas as pd
+    import school_quality
+
+    schema = load_schema(schema_path) if schema_path else None
+    if schema is None:
+        if not isinstance(records, Sequence):
+            print("[warn] No schema file; holding the records in memory to discover the columns first")
+            records = list(records)
+        print("[info] Discovering columns...")
+        schema = discover_schema(records, chunk_size)
+    else:
+        print(f"[info] Using columns from {schema_path}")
+    columns = schema["columns"]
+    float_columns = [c for c in schema.get("float_columns", []) if c in columns]
+
+    stats = new_column_stats()
+    search_fields: Tuple[List[Any], List[Any], List[Any]] = ([], [], [])
+    validator = school_quality.new_validator()
+    parquet = school_data.open_parquet_writer(columns, f"{OUT_PARQUET}.tmp")
+    outputs = [OUT_CSV] + ([OUT_XLSX] if write_xlsx else []) + ([OUT_PARQUET] if parquet is not None else [])
+    xlsx_queue: "queue.Queue" = queue.Queue(maxsize=2)
+    try:
+        try:
+            with ThreadPoolExecutor(max_workers=1) as pool, open(f"{OUT_CSV}.tmp", "w", encoding="utf-8", newline="") as fh:
+                xlsx_job = pool.submit(write_xlsx_rows, drain(xlsx_queue), columns, f"{OUT_XLSX}.tmp") if write_xlsx else None
+                try:
+                    for chunk in iter_chunks(iter_prepare_rows(records), chunk_size):
+                        if not stats["rows"]:
+                            print_contacts_sample(chunk[0])
+                        update_column_stats(stats, chunk)
+                        for values, field in zip(search_fields, ("id", "name", "address")):
+                            values.extend(r.get(field) for r in chunk)
+                        df = pd.DataFrame(chunk, columns=columns)
+                        for col in float_columns:
+                            df[col] = df[col].astype("float64")
+                        df.to_csv(fh, header=stats["rows"] == len(chunk), index=False)
+                        school_quality.validate_batch(validator, df)
+                        if parquet is not None:
+                            school_data.append_parquet(parquet, df)
+                        if xlsx_job is not None:
+                            put_chunk(xlsx_queue, [[r.get(c) for c in columns] for r in chunk], xlsx_job)
+                finally:
+                    if xlsx_job is not None:
+                        put_chunk(xlsx_queue, None, xlsx_job)
+                if xlsx_job is not None:
+                    xlsx_job.result()
+        finally:
+            # after the CSV, so load_schools does not take the Parquet copy for a stale one
+            if parquet is not None:
+                parquet.close()
+        written = stats["rows"]
+        seen = stats_schema(stats)
+        if schema_path:
+            save_schema(seen, schema_path)
+        if written and seen != {"columns": columns, "float_columns": float_columns}:
+            raise RuntimeError(f"Columns changed since {schema_path} was written; it has been updated and "
+                               f"{', '.join(outputs)} left as they were, rerun the export.")
+    except BaseException:
+        for path in outputs:
+            if os.path.exists(f"{path}.tmp"):
+                os.remove(f"{path}.tmp")
+        raise
+    for path in outputs:
+        os.replace(f"{path}.tmp", path)
+
+    print(f"[ok] Saved {written} rows in chunks of {chunk_size} -> {', '.join(outputs)}")
+    if written:
+        save_search_index(*search_fields)
+        save_summary()
+        save_quality(validator)
+    return written
+
+def print_contacts_sample(first: Dict[str, Any]):
     # Print sample of contacts transformation for visual verification
     print("[info] Sample contacts (first record):")
-    first = rows[0]
     sample_contacts = {
         "contacts": first.get("contacts"),
         "contacts_phones": first.get("contacts_phones"),
@@ -349,7 +1229,183 @@ def main():
         "contacts_json": first.get("contacts_json")[:200] + ("..." if len(first.get("contacts_json",""))>200 else "")
     }
     print(json.dumps(sample_contacts, ensure_ascii=False, indent=2))
-    save_outputs(rows)
+
+def fetch_records(args: argparse.Namespace) -> Tuple[Optional[Iterable[Dict[str, Any]]], Callable[[], None]]:
+    """
+    Fetch per the CLI flags. Returns (records, save_cache); records is None
+    when the cached response is still current, and save_cache is to be run
+    once the records are exported (see fetch_json_conditional).
+    """
+    print(f"[info] Fetching {API_URL}" + (" (offline, from cache)" if args.offline else ""))
+    if args.stream:
+        # fetching and decoding happen lazily, inside the prepare_rows stage
+        print(f"[info] Streaming raw response to {RAW_JSON}")
+        return fetch_stream(API_URL, RAW_JSON), keep_cache
+    save_cache = keep_cache
+    with pipeline_metrics.stage("fetch"):
+        if args.paginate:
+            root = fetch_pages(API_URL, page_size=args.page_size, workers=args.workers, mode=args.paginate)
+        else:
+            cache_dir = args.cache_dir if (args.cache or args.offline) else None
+            root, changed, save_cache = fetch_json_conditional(API_URL, cache_dir, args.cache_ttl, args.offline)
+    if not args.paginate and not changed and os.path.exists(OUT_CSV):
+        print(f"[info] {API_URL} not modified since the cached copy; nothing to do.")
+        save_cache()
+        return None, keep_cache
+    with pipeline_metrics.stage("raw_json_dump"):
+        with open(RAW_JSON, "w", encoding="utf-8") as fh:
+            json.dump(root, fh, ensure_ascii=False, indent=2)
+    print(f"[info] Raw JSON saved to {RAW_JSON}")
+    with pipeline_metrics.stage("extract_records") as counters:
+        records = extract_records(root)
+        counters["records"] = len(records)
+    print(f"[info] Found {len(records)} record(s).")
+    return records, save_cache
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description=f"Fetch {API_URL} and export {OUT_CSV} / {OUT_XLSX}")
+    parser.add_argument("--stream", action="store_true",
+                        help="decode records incrementally from the HTTP stream and write the raw body to disk as received")
+    parser.add_argument("--paginate", choices=("page", "offset"),
+                        help="fetch the listing page by page with a pooled session and concurrent workers")
+    parser.add_argument("--page-size", type=int, default=PAGE_SIZE, help="records per page with --paginate")
+    parser.add_argument("--workers", type=int, default=FETCH_WORKERS, help="concurrent page requests with --paginate")
+    parser.add_argument("--cache", action="store_true",
+                        help="keep a compressed copy of the response and revalidate it with ETag/Last-Modified")
+    parser.add_argument("--offline", action="store_true", help="replay the cached response instead of fetching")
+    parser.add_argument("--cache-dir", default=response_cache.CACHE_DIR, help="response cache directory")
+    parser.add_argument("--cache-ttl", type=float, default=response_cache.CACHE_TTL,
+                        help="seconds a cached response is used without revalidation")
+    parser.add_argument("--no-xlsx", action="store_true", help=f"skip {OUT_XLSX}; build it later with --xlsx-only")
+    parser.add_argument("--xlsx-only", action="store_true", help=f"build {OUT_XLSX} from the existing {OUT_CSV} and exit")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only normalize new/changed schools (state store); the CSV is appended to when "
+                             "schools were only added, the other outputs are rebuilt from the stored rows")
+    parser.add_argument("--state-db", default=None, help="state store for --incremental (default: schools_state.sqlite)")
+    parser.add_argument("--chunk-size", type=int, default=0,
+                        help=f"normalize and append rows to the outputs this many at a time (bounded memory; "
+                             f"e.g. {CHUNK_SIZE})")
+    parser.add_argument("--schema", default=SCHEMA_PATH,
+                        help="column list for --chunk-size; skips the column discovery pass when present")
+    parser.add_argument("--batch-contacts", action="store_true",
+                        help="split, classify and dedupe contacts per school in one batch and write the "
+                             "long contacts table to schools_contacts.csv (a little slower than the default)")
+    parser.add_argument("--processes", type=int, default=0, metavar="N",
+                        help="normalize records in N worker processes (0: in this process); ignored below "
+                             "40,000 records or on a single CPU, where the pool is slower")
+    parser.add_argument("--snapshot", nargs="?", const="snapshots", metavar="DIR",
+                        help="append the export to the snapshot store (default dir: snapshots)")
+    parser.add_argument("--db", nargs="?", const="schools.sqlite", metavar="PATH",
+                        help="also load the export into an indexed SQLite database (default: schools.sqlite)")
+    parser.add_argument("--images", action="store_true",
+                        help="download the imageToken photos and thumbnails after the export (see school_images.py)")
+    parser.add_argument("--report", default=pipeline_metrics.RUN_REPORT,
+                        help="per-stage timing/memory report (JSON); empty string to skip")
+    parser.add_argument("--prometheus", metavar="PATH", help="also write the run metrics in Prometheus text format")
+    parser.add_argument("--profile", nargs="?", const=pipeline_metrics.PROFILE_DIR, metavar="DIR",
+                        help=f"dump cProfile stats and tracemalloc snapshots of the hot stages "
+                             f"(default dir: {pipeline_metrics.PROFILE_DIR})")
+    args = parser.parse_args(argv)
+    if args.stream and args.paginate:
+        parser.error("--stream and --paginate cannot be combined")
+    if (args.cache or args.offline) and (args.stream or args.paginate):
+        parser.error("--cache/--offline only apply to the single-request fetch")
+    if args.chunk_size and (args.incremental or args.batch_contacts):
+        parser.error("--chunk-size cannot be combined with --incremental or --batch-contacts")
+    if args.processes and (args.chunk_size or args.incremental or args.batch_contacts):
+        parser.error("--processes cannot be combined with --chunk-size, --incremental or --batch-contacts")
+    pipeline_metrics.start_run(args.profile)
+    status = "failed"
+    try:
+        exported = run_pipeline(args)
+        if args.snapshot and exported:
+            import school_snapshots
+
+            with pipeline_metrics.stage("snapshot"):
+                school_snapshots.snapshot_export(args.snapshot)
+        if args.db and exported:
+            import school_db
+
+            with pipeline_metrics.stage("database"):
+                school_db.export_database(args.db, OUT_CSV)
+        if args.images and exported:
+            import school_images
+
+            school_images.sync_export()
+        status = "ok"
+    finally:
+        pipeline_metrics.finish_run(args.report, args.prometheus, status)
+
+def run_pipeline(args: argparse.Namespace) -> bool:
+    """Run the requested export; True when a new export was written."""
+    if args.xlsx_only:
+        with pipeline_metrics.stage("xlsx"):
+            export_xlsx()
+        return False
+
+    records, save_cache = fetch_records(args)
+    if records is None:
+        return False
+    export_records(args, records)
+    save_cache()
+    return True
+
+def export_records(args: argparse.Namespace, records: Iterable[Dict[str, Any]]) -> None:
+    """Normalize `records` and write the outputs the flags ask for."""
+    if args.incremental:
+        import school_state
+        with pipeline_metrics.stage("incremental"):
+            school_state.run_incremental(records, args.state_db or school_state.STATE_DB)
+        return
+    if args.chunk_size:
+        print(f"[info] Preparing and saving rows in chunks of {args.chunk_size}...")
+        with pipeline_metrics.stage("export_chunked") as counters:
+            counters["records"] = save_outputs_chunked(records, args.chunk_size, args.schema,
+                                                       write_xlsx=not args.no_xlsx)
+        if not counters["records"]:
+            print("[warn] No records found.")
+            sys.exit(3)
+        return
+    if args.processes:
+        import school_parallel
+        records = list(records)
+        if not school_parallel.use_processes(len(records), args.processes):
+            print(f"[info] {len(records)} records on {os.cpu_count()} CPU(s): worker processes would be "
+                  f"slower here, preparing rows in this process")
+            args.processes = 0
+    if args.processes:
+        print(f"[info] Preparing rows in {args.processes} processes...")
+        with pipeline_metrics.stage("prepare_rows", processes=args.processes) as counters:
+            df = school_parallel.prepare_frame_parallel(records, args.processes)
+            counters["records"] = len(df)
+        if df.empty:
+            print("[warn] No records found.")
+            sys.exit(3)
+        print_contacts_sample(df.iloc[0].to_dict())
+        save_frame(df, write_xlsx=not args.no_xlsx)
+        return
+    print("[info] Preparing rows...")
+    if not args.batch_contacts:
+        with pipeline_metrics.stage("prepare_rows") as counters:
+            df = prepare_frame(records)
+            counters["records"] = len(df)
+        if df.empty:
+            print("[warn] No records found.")
+            sys.exit(3)
+        print_contacts_sample(df.iloc[0].to_dict())
+        save_frame(df, write_xlsx=not args.no_xlsx)
+        return
+    with pipeline_metrics.stage("prepare_rows") as counters:
+        rows, contacts_table = prepare_rows_batch(records)
+        counters["records"] = len(rows)
+    if not rows:
+        print("[warn] No records found.")
+        sys.exit(3)
+    import school_contacts
+    school_contacts.write_contacts_table(contacts_table)
+    print(f"[ok] Saved {len(contacts_table)} contacts -> {school_contacts.OUT_CONTACTS}")
+    print_contacts_sample(rows[0])
+    save_outputs(rows, write_xlsx=not args.no_xlsx)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+server_load_test.py
+
+Load test for school_server.py: concurrent clients issue a mix of lookups,
+filtered pages and counts (built from the server's own /counts, so filters
+hit real values) and the script reports throughput and p50/p95/p99 latency
+per request kind. A share of requests revalidate with If-None-Match, as a
+caching client would.
+
+Usage:
+ python server_load_test.py --url http://127.0.0.1:8000 --requests 5000 --concurrency 8
+ python server_load_test.py --serve      (start the server in-process on the local export)
+
+Requires:
+ pip install requests numpy
+"""
+
+from typing import Any, Dict, List, Tuple
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import random
+import threading
+import time
+
+import numpy as np
+import requests
+
+REVALIDATE_SHARE = 0.3
+PERCENTILES = (50, 95, 99)
+
+
+def request_mix(base: str, rng: random.Random, n: int) -> List[Tuple[str, str]]:
+    """n (kind, url) pairs drawn from the values the server reports in /counts."""
+    counts = requests.get(f"{base}/counts", timeout=30).json()
+    values = {field: list(by_value) for field, by_value in counts.items() if by_value}
+    ids = values.get("id", [])
+    filter_fields = [f for f in values if f not in ("id", "utisCode")]
+    out = []
+    for _ in range(n):
+        roll = rng.random()
+        if roll < 0.4 and ids:
+            out.append(("by_id", f"{base}/schools/{rng.choice(ids)}"))
+        elif roll < 0.8 and filter_fields:
+            fields = rng.sample(filter_fields, k=min(len(filter_fields), rng.choice((1, 1, 2))))
+            query = "&".join(f"{f}={rng.choice(values[f])}" for f in fields)
+            out.append(("filter", f"{base}/schools?{query}&limit=50&offset={rng.choice((0, 0, 50))}"))
+        elif roll < 0.9:
+            out.append(("page", f"{base}/schools?limit=100&offset={rng.randrange(0, 1000, 100)}"))
+        else:
+            out.append(("counts", f"{base}/counts"))
+    return out
+
+
+def run_load(plan: List[Tuple[str, str]], concurrency: int, seed: int = 0) -> Dict[str, Any]:
+    """Issue `plan` from `concurrency` keep-alive clients; returns latencies per kind."""
+    local = threading.local()
+    etags: Dict[str, str] = {}
+    rng = random.Random(seed)
+    revalidate = [rng.random() < REVALIDATE_SHARE for _ in plan]
+    latencies: Dict[str, List[float]] = {}
+    statuses: Dict[int, int] = {}
+    lock = threading.Lock()
+
+    def one(i: int) -> None:
+        kind, url = plan[i]
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+        headers = {"If-None-Match": etags[url]} if revalidate[i] and url in etags else {}
+        started = time.perf_counter()
+        resp = session.get(url, headers=headers, timeout=30)
+        _ = resp.content
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.setdefault(kind, []).append(elapsed)
+            statuses[resp.status_code] = statuses.get(resp.status_code, 0) + 1
+            if "ETag" in resp.headers:
+                etags[url] = resp.headers["ETag"]
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(len(plan))))
+    return {"seconds": time.perf_counter() - started, "latencies": latencies, "statuses": statuses}
+
+
+def print_report(result: Dict[str, Any]) -> None:
+    every = [t for times in result["latencies"].values() for t in times]
+    print(f"[ok] {len(every)} requests in {result['seconds']:.2f}s ({len(every) / result['seconds']:,.0f} req/s); "
+          f"status codes: {dict(sorted(result['statuses'].items()))}")
+    for kind, times in sorted(result["latencies"].items()) + [("all", every)]:
+        ms = np.percentile(np.asarray(times) * 1000, PERCENTILES)
+        print(f"[info] {kind:<8} n={len(times):<6} " + "  ".join(f"p{p}={v:7.2f}ms" for p, v in zip(PERCENTILES, ms)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency/throughput test for school_server.py")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="server base URL")
+    parser.add_argument("--serve", action="store_true", help="start school_server in-process on a free port")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    base = args.url.rstrip("/")
+    server = None
+    if args.serve:
+        import school_server
+
+        server, stop = school_server.serve(port=0, reload_interval=0)
+        base = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        plan = request_mix(base, random.Random(args.seed), args.requests)
+        print(f"[info] {len(plan)} requests against {base} with {args.concurrency} clients...")
+        print_report(run_load(plan, args.concurrency, args.seed))
+    finally:
+        if server is not None:
+            stop.set()
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+spatial_index.py
+
+Nearest-school and radius queries over the exported lat/lng.
+
+Schools with usable coordinates are projected onto the unit sphere and
+indexed with scipy's cKDTree; straight-line (chord) distance on the sphere is
+monotonic in great-circle distance, so k-nearest and radius results match a
+haversine scan exactly. Queries take arrays of points and answer thousands
+per call. Without scipy the same API falls back to a chunked NumPy
+brute-force scan.
+
+The built index is pickled to schools_spatial.pkl and reused while it is
+newer than the export it was built from.
+
+Usage:
+ python spatial_index.py --lat 40.41 --lng 49.87 -k 5
+ python spatial_index.py --lat 40.41 --lng 49.87 --radius 2
+
+Requires:
+ pip install numpy pandas (optional: scipy)
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+import argparse
+import os
+import pickle
+
+import numpy as np
+
+from school_data import CSV_PATH, OUT_PARQUET, load_schools
+
+INDEX_PATH = "schools_spatial.pkl"
+INDEX_VERSION = 1
+EARTH_RADIUS_KM = 6371.0088
+BRUTE_FORCE_CELLS = 4_000_000  # query x point distances held at once by the brute-force scan
+
+
+def to_xyz(lat: Any, lng: Any) -> np.ndarray:
+    lat = np.radians(np.asarray(lat, dtype=np.float64))
+    lng = np.radians(np.asarray(lng, dtype=np.float64))
+    cos_lat = np.cos(lat)
+    return np.stack([cos_lat * np.cos(lng), cos_lat * np.sin(lng), np.sin(lat)], axis=-1)
+
+
+def chord_to_km(chord: np.ndarray) -> np.ndarray:
+    return 2.0 * EARTH_RADIUS_KM * np.arcsin(np.clip(chord / 2.0, 0.0, 1.0))
+
+
+def km_to_chord(km: float) -> float:
+    return 2.0 * np.sin(min(km / EARTH_RADIUS_KM, np.pi) / 2.0)
+
+
+def make_tree(xyz: np.ndarray) -> Any:
+    try:
+        from scipy.spatial import cKDTree
+    except ImportError:
+        return None
+    return cKDTree(xyz)
+
+
+def build_index(ids: Any, lat: Any, lng: Any) -> Dict[str, Any]:
+    """Index the points whose coordinates are present and non-zero."""
+    ids = np.asarray(ids)
+    lat = np.asarray(lat, dtype=np.float64)
+    lng = np.asarray(lng, dtype=np.float64)
+    valid = np.isfinite(lat) & np.isfinite(lng) & (lat != 0) & (lng != 0)
+    xyz = to_xyz(lat[valid], lng[valid])
+    return {
+        "version": INDEX_VERSION,
+        "ids": ids[valid],
+        "lat": lat[valid],
+        "lng": lng[valid],
+        "xyz": xyz,
+        "tree": make_tree(xyz),
+    }
+
+
+def build_index_from_export() -> Dict[str, Any]:
+    df = load_schools(columns=["id", "lat", "lng"])
+    return build_index(df["id"].to_numpy(), df["lat"].to_numpy(dtype="float64", na_value=np.nan),
+                       df["lng"].to_numpy(dtype="float64", na_value=np.nan))
+
+
+def save_index(index: Dict[str, Any], path: str = INDEX_PATH) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as fh:
+        pickle.dump(index, fh, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+
+
+def load_index(path: str = INDEX_PATH) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, "rb") as fh:
+            index = pickle.load(fh)
+    except (OSError, pickle.UnpicklingError, EOFError, ImportError, AttributeError, ValueError):
+        # unreadable, or pickled against classes that have since moved: rebuild
+        return None
+    return index if isinstance(index, dict) and index.get("version") == INDEX_VERSION else None
+
+
+def load_or_build(path: str = INDEX_PATH) -> Dict[str, Any]:
+    """Load the persisted index, rebuilding it when the export is newer."""
+    sources = [p for p in (OUT_PARQUET, CSV_PATH) if os.path.exists(p)]
+    newest = max((os.path.getmtime(p) for p in sources), default=0)
+    if os.path.exists(path) and os.path.getmtime(path) >= newest:
+        index = load_index(path)
+        if index is not None:
+            return index
+    index = build_index_from_export()
+    save_index(index, path)
+    return index
+
+
+def brute_force_nearest(index: Dict[str, Any], lat: Any, lng: Any, k: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+    """Chunked haversine scan; the baseline and the no-scipy fallback."""
+    q_lat = np.radians(np.atleast_1d(np.asarray(lat, dtype=np.float64)))
+    q_lng = np.radians(np.atleast_1d(np.asarray(lng, dtype=np.float64)))
+    p_lat = np.radians(index["lat"])
+    p_lng = np.radians(index["lng"])
+    k = min(k, len(p_lat))
+    dist = np.empty((len(q_lat), k))
+    pos = np.empty((len(q_lat), k), dtype=np.int64)
+    chunk = max(1, BRUTE_FORCE_CELLS // max(1, len(p_lat)))
+    for start in range(0, len(q_lat), chunk):
+        ql = q_lat[start:start + chunk, None]
+        qg = q_lng[start:start + chunk, None]
+        a = np.sin((p_lat - ql) / 2) ** 2 + np.cos(ql) * np.cos(p_lat) * np.sin((p_lng - qg) / 2) ** 2
+        km = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+        part = np.argpartition(km, k - 1, axis=1)[:, :k] if k < km.shape[1] else np.tile(np.arange(k), (len(km), 1))
+        part_km = np.take_along_axis(km, part, axis=1)
+        order = np.argsort(part_km, axis=1)
+        pos[start:start + len(km)] = np.take_along_axis(part, order, axis=1)
+        dist[start:start + len(km)] = np.take_along_axis(part_km, order, axis=1)
+    return dist, pos
+
+
+def nearest(index: Dict[str, Any], lat: Any, lng: Any, k: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    k nearest schools for each query point.
+    Returns (distances_km, ids), both shaped (n_queries, k); k is capped at
+    the number of indexed schools, so an empty index gives (n_queries, 0).
+    """
+    k = min(k, len(index["ids"]))
+    if k <= 0:
+        n = len(np.atleast_1d(lat))
+        return np.empty((n, 0)), index["ids"][np.empty((n, 0), dtype=np.int64)]
+    if index["tree"] is None:
+        dist, pos = brute_force_nearest(index, lat, lng, k)
+    else:
+        chord, pos = index["tree"].query(to_xyz(np.atleast_1d(lat), np.atleast_1d(lng)), k=k)
+        dist = chord_to_km(chord)
+        if k == 1:
+            dist, pos = dist[:, None], pos[:, None]
+    return dist, index["ids"][pos]
+
+
+def within(index: Dict[str, Any], lat: Any, lng: Any, radius_km: float) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Schools within `radius_km` of each query point, nearest first.
+    Returns one (distances_km, ids) pair per query point.
+    """
+    q_xyz = to_xyz(np.atleast_1d(lat), np.atleast_1d(lng))
+    if index["tree"] is not None:
+        hits = index["tree"].query_ball_point(q_xyz, r=km_to_chord(radius_km))
+    else:
+        # |q - p|^2 = 2 - 2 q.p on the unit sphere
+        min_dot = 1.0 - km_to_chord(radius_km) ** 2 / 2.0
+        hits = []
+        chunk = max(1, BRUTE_FORCE_CELLS // max(1, len(index["xyz"])))
+        for start in range(0, len(q_xyz), chunk):
+            dots = q_xyz[start:start + chunk] @ index["xyz"].T
+            hits.extend(np.nonzero(row >= min_dot)[0] for row in dots)
+    out = []
+    for q, pos in zip(q_xyz, hits):
+        pos = np.asarray(pos, dtype=np.int64)
+        km = chord_to_km(np.linalg.norm(index["xyz"][pos] - q, axis=-1))
+        order = np.argsort(km)
+        out.append((km[order], index["ids"][pos[order]]))
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Nearest-school queries over the exported coordinates")
+    parser.add_argument("--lat", type=float, required=True)
+    parser.add_argument("--lng", type=float, required=True)
+    parser.add_argument("-k", type=int, default=5, help="number of nearest schools")
+    parser.add_argument("--radius", type=float, help="return all schools within this many km instead")
+    parser.add_argument("--index", default=INDEX_PATH, help="persisted index file")
+    args = parser.parse_args()
+
+    index = load_or_build(args.index)
+    if args.radius is not None:
+        dist, ids = within(index, args.lat, args.lng, args.radius)[0]
+    else:
+        dist, ids = nearest(index, args.lat, args.lng, args.k)
+        dist, ids = dist[0], ids[0]
+    for d, i in zip(dist, ids):
+        print(f"{i}\t{d:.3f} km")
+
+
+if __name__ == "__main__":
+    main()